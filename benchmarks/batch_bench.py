@@ -0,0 +1,66 @@
+"""
+throughput of rendering many small files with a vectdraw process per
+file, as a shell loop would, against vectdraw --batch with increasing
+numbers of jobs.
+
+usage: python -m benchmarks.batch_bench [files] [max jobs]
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from vectdraw.streamwriter import CommandStreamWriter
+
+
+def MakeInputs(directory, count):
+   """
+   writes count short renders of a few hundred commands to directory
+   """
+   for index in range(count):
+      path = os.path.join(directory, 'render{}.txt'.format(index))
+      with open(path, 'wb') as f, CommandStreamWriter(f) as writer:
+         writer.clear()
+         for i in range(100):
+            writer.pen(i % 2)
+            writer.colour((i + index) % 256, 0, 255, 255)
+            writer.move([(5, -5) if j % 2 else (-5, 5) for j in range(8)])
+
+
+def main(count=200, maxJobs=os.cpu_count()):
+   directory = tempfile.mkdtemp()
+   try:
+      MakeInputs(directory, count)
+      vectdraw = [sys.executable, '-c', 'from vectdraw.scripts import main; '
+                  'main()']
+
+      start = time.perf_counter()
+      for index in range(count):
+         name = os.path.join(directory, 'render{}'.format(index))
+         subprocess.run(vectdraw + ['-f', name + '.txt', '-o', name + '.ref'],
+                        check=True)
+      elapsed = time.perf_counter() - start
+      print("process per file  {:8.1f} files/s".format(count / elapsed))
+
+      jobs = 1
+      while jobs <= maxJobs:
+         print("--batch {:>2} jobs   ".format(jobs), end='', flush=True)
+         subprocess.run(vectdraw + [
+            '--batch', os.path.join(directory, '*.txt'), '--jobs', str(jobs)],
+            check=True)
+
+         for index in range(count):
+            name = os.path.join(directory, 'render{}'.format(index))
+            with open(name + '.ref') as ref, open(name + '.txt.out') as out:
+               if ref.read() != out.read():
+                  raise RuntimeError("the output of {} differs".format(name))
+         jobs *= 2
+   finally:
+      shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+   main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,39 @@
+"""
+micro benchmarks comparing the Sixteen14Codec hex string API with the
+decode_bytes/encode_bytes fast paths
+
+usage: python -m benchmarks.codec_bench [number of words]
+"""
+
+import sys
+import timeit
+
+from sixteen14encoding.codec.sixteen14hex import Sixteen14Codec
+
+
+def main(words=100000):
+   integers = [(i % 16384) - 8192 for i in range(words)]
+   encoded = b''.join(Sixteen14Codec.encode_bytes(i) for i in integers)
+   hexWords = [encoded[i:i + 2].hex() for i in range(0, len(encoded), 2)]
+   pairs = [(encoded[i], encoded[i + 1]) for i in range(0, len(encoded), 2)]
+
+   decode = Sixteen14Codec.decode
+   decodeBytes = Sixteen14Codec.decode_bytes
+   encode = Sixteen14Codec.encode
+   encodeBytes = Sixteen14Codec.encode_bytes
+
+   cases = (
+      ("decode(hex string)", lambda: [decode(w) for w in hexWords]),
+      ("decode_bytes(high, low)",
+       lambda: [decodeBytes(h, l) for h, l in pairs]),
+      ("encode(int) -> hex", lambda: [encode(i) for i in integers]),
+      ("encode_bytes(int)", lambda: [encodeBytes(i) for i in integers]),
+   )
+
+   for name, case in cases:
+      elapsed = min(timeit.repeat(case, number=1, repeat=3))
+      print("{:<25} {:8.1f} ns/word".format(name, elapsed / words * 1e9))
+
+
+if __name__ == '__main__':
+   main(*[int(a) for a in sys.argv[1:]])
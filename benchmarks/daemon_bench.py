@@ -0,0 +1,127 @@
+"""
+load test of the vectdraw daemon: sustained requests per second and
+latency percentiles of short renders run as
+
+- cold CLI runs: a vectdraw process per render
+- client runs: a vectdraw-client process per render, forwarding it to a
+  warm daemon (vectdraw --serve)
+- in process requests: renders sent to the daemon without starting a
+  process, the daemon's own throughput
+
+each with a number of renders in flight at once.
+
+usage: python -m benchmarks.daemon_bench [renders] [concurrency]
+"""
+
+import io
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from vectdraw.client import Request
+from vectdraw.streamwriter import CommandStreamWriter
+
+
+def MakeInput(path):
+   """
+   writes a short render of a few hundred commands to path
+   """
+   with open(path, 'wb') as f, CommandStreamWriter(f) as writer:
+      writer.clear()
+      for i in range(100):
+         writer.pen(i % 2)
+         writer.colour(i, 0, 255, 255)
+         writer.move([(5, -5) if j % 2 else (-5, 5) for j in range(8)])
+
+
+def Percentile(values, fraction):
+   values = sorted(values)
+   return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def Load(render, renders, concurrency):
+   """
+   runs render(index) renders times, concurrency at a time
+   :return: tuple of the requests per second and the latencies
+   """
+   latencies = []
+   lock = threading.Lock()
+   indices = iter(range(renders))
+
+   def Worker():
+      while True:
+         with lock:
+            index = next(indices, None)
+         if index is None:
+            return
+
+         start = time.perf_counter()
+         render(index)
+         elapsed = time.perf_counter() - start
+         with lock:
+            latencies.append(elapsed)
+
+   start = time.perf_counter()
+   workers = [threading.Thread(target=Worker) for _ in range(concurrency)]
+   for worker in workers:
+      worker.start()
+   for worker in workers:
+      worker.join()
+
+   return renders / (time.perf_counter() - start), latencies
+
+
+def main(renders=200, concurrency=4):
+   directory = tempfile.mkdtemp()
+   inputPath = os.path.join(directory, 'render.txt')
+   socketPath = os.path.join(directory, 'vectdraw.sock')
+   MakeInput(inputPath)
+
+   vectdraw = [sys.executable, '-c', 'from vectdraw.scripts import main; '
+               'main()']
+   client = [sys.executable, '-m', 'vectdraw.client', '--socket',
+             socketPath]
+
+   def Output(index):
+      return os.path.join(directory, 'out{}.txt'.format(index))
+
+   def Cold(index):
+      subprocess.run(vectdraw + ['-f', inputPath, '-o', Output(index)],
+                     check=True)
+
+   def Client(index):
+      subprocess.run(client + ['-f', inputPath, '-o', Output(index)],
+                     check=True)
+
+   def InProcess(index):
+      sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+      sock.connect(socketPath)
+      with open(inputPath, 'rb') as f:
+         if Request(sock, f, io.BytesIO(), {}) != 0:
+            raise RuntimeError("request failed")
+
+   daemon = subprocess.Popen(vectdraw + ['--serve', socketPath])
+   try:
+      while not os.path.exists(socketPath):
+         time.sleep(0.01)
+
+      for name, render in (("cold CLI", Cold), ("client", Client),
+                           ("in process", InProcess)):
+         rate, latencies = Load(render, renders, concurrency)
+         print("{:<11} {:8.1f} req/s   p50 {:7.1f}ms   p90 {:7.1f}ms   "
+               "p99 {:7.1f}ms".format(
+                  name, rate, *(1000 * Percentile(latencies, fraction)
+                                for fraction in (0.5, 0.9, 0.99))))
+   finally:
+      daemon.terminate()
+      daemon.wait()
+      shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+   main(*[int(a) for a in sys.argv[1:]])
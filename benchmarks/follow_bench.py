@@ -0,0 +1,135 @@
+"""
+latency of drawing a small update appended to command files of growing
+sizes, with --follow against re-running vectdraw over the whole file.
+
+usage: python -m benchmarks.follow_bench [max size in MB]
+"""
+
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from sixteen14encoding.codec.sixteen14hex import Sixteen14Codec
+from vectdraw.draw.board import Board, Pen
+from vectdraw.follow import FollowedStream
+from vectdraw.hexstreamreader import BufferedHexStreamReader
+from vectdraw.process import VectorCommandStreamProcessor
+from vectdraw.settings import REGISTERED_COMMANDS
+from vectdraw.streamwriter import CommandStreamWriter
+
+
+def Commands(write):
+   stream = io.BytesIO()
+   with CommandStreamWriter(stream) as writer:
+      write(writer)
+   return stream.getvalue()
+
+
+def Page(writer):
+   writer.clear()
+   for i in range(100):
+      writer.pen(i % 2)
+      writer.move([(5, -5) if j % 2 else (-5, 5) for j in range(16)])
+
+
+def Update(index):
+   """
+   returns a short update, drawn once its last colour command is followed
+   by the CLR of the next update
+   """
+   def Write(writer):
+      writer.clear()
+      writer.pen(True)
+      writer.move([(5, -5), (-5, 5)] * 10)
+      writer.colour(index % 256, 1, 2, 3)
+
+   return Commands(Write)
+
+
+class WatchedOutput(object):
+   """
+   output keeping the colour lines written, for WaitFor
+   """
+
+   def __init__(self):
+      self.colours = set()
+      self.written = threading.Condition()
+
+   def write(self, text):
+      if text.startswith("CO "):
+         with self.written:
+            self.colours.add(text.strip())
+            self.written.notify_all()
+
+   def flush(self):
+      pass
+
+   def WaitFor(self, line):
+      with self.written:
+         self.written.wait_for(lambda: line in self.colours)
+
+
+def Draw(path):
+   with open(path) as f:
+      VectorCommandStreamProcessor(
+         BufferedHexStreamReader(f), Sixteen14Codec,
+         Board(Pen(), io.StringIO()), REGISTERED_COMMANDS).run()
+
+
+def main(maxMegabytes=16):
+   page = Commands(Page)
+   descriptor, path = tempfile.mkstemp()
+   os.close(descriptor)
+   with open(path, 'wb') as f:
+      f.write(Update(0))
+
+   followedFile = open(path)
+   try:
+      stream = FollowedStream(followedFile, poll=0.01)
+      output = WatchedOutput()
+      processor = VectorCommandStreamProcessor(
+         BufferedHexStreamReader(stream), Sixteen14Codec,
+         Board(Pen(), output), REGISTERED_COMMANDS)
+      follower = threading.Thread(target=processor.run)
+      follower.start()
+
+      megabytes = 1
+      update = 1
+      while megabytes <= maxMegabytes:
+         with open(path, 'ab') as f:
+            while f.tell() < megabytes << 20:
+               f.write(page)
+            f.write(Update(update))
+            f.write(Update(update + 1))
+
+         # caught up once the colour of the first update is drawn
+         output.WaitFor("CO {} 1 2 3;".format(update % 256))
+
+         # the colour of the second update is drawn by the next update
+         start = time.perf_counter()
+         with open(path, 'ab') as f:
+            f.write(Update(update + 2))
+         output.WaitFor("CO {} 1 2 3;".format((update + 1) % 256))
+         followed = time.perf_counter() - start
+         update += 3
+
+         start = time.perf_counter()
+         Draw(path)
+         rerun = time.perf_counter() - start
+
+         print("{:>4} MB   follow {:8.1f}ms   re-run {:8.1f}ms".format(
+            megabytes, 1000 * followed, 1000 * rerun))
+         megabytes *= 2
+
+      stream.close()
+      follower.join()
+   finally:
+      followedFile.close()
+      os.remove(path)
+
+
+if __name__ == '__main__':
+   main(*[int(a) for a in sys.argv[1:]])
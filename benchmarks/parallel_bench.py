@@ -0,0 +1,74 @@
+"""
+run time of VectorCommandStreamProcessor.run against RunParallel with
+increasing numbers of jobs, on a multi-page stream of CLR delimited pages.
+The board draws for real, to an in memory output.
+
+usage: python -m benchmarks.parallel_bench [size in MB] [max jobs]
+"""
+
+import io
+import os
+import sys
+import time
+
+from sixteen14encoding.codec.sixteen14hex import Sixteen14Codec
+from vectdraw.draw.board import Board, Pen
+from vectdraw.hexstreamreader import BufferedHexStreamReader
+from vectdraw.parallel import RunParallel
+from vectdraw.process import VectorCommandStreamProcessor
+from vectdraw.settings import REGISTERED_COMMANDS
+from vectdraw.streamwriter import CommandStreamWriter
+
+
+def MakeInput(megabytes):
+   """
+   returns a hex encoded stream of roughly megabytes MB of pages of about
+   16 KB each
+   """
+   stream = io.BytesIO()
+   with CommandStreamWriter(stream) as writer:
+      page = 0
+      while stream.tell() + len(writer.buffer) * 2 < megabytes << 20:
+         writer.clear()
+         writer.colour(page % 256, 0, 255, 255)
+         for i in range(100):
+            writer.pen(i % 2)
+            writer.move([(5, -5) if j % 2 else (-5, 5) for j in range(16)])
+         page += 1
+
+   return stream.getvalue()
+
+
+def Time(data, jobs):
+   processor = VectorCommandStreamProcessor(
+      BufferedHexStreamReader(io.BytesIO(data)), Sixteen14Codec,
+      Board(Pen(), io.StringIO()), REGISTERED_COMMANDS)
+
+   start = time.perf_counter()
+   if jobs:
+      RunParallel(processor, jobs)
+   else:
+      processor.run()
+   elapsed = time.perf_counter() - start
+
+   return elapsed, processor.vectorBoard.outputStream.getvalue()
+
+
+def main(megabytes=8, maxJobs=os.cpu_count()):
+   data = MakeInput(megabytes)
+   serial, expected = Time(data, 0)
+   print("serial   {:8.3f}s".format(serial))
+
+   jobs = 1
+   while jobs <= maxJobs:
+      elapsed, output = Time(data, jobs)
+      if output != expected:
+         raise RuntimeError("the output of {} jobs differs".format(jobs))
+
+      print("{:>2} jobs  {:8.3f}s  {:5.2f}x".format(
+         jobs, elapsed, serial / elapsed))
+      jobs *= 2
+
+
+if __name__ == '__main__':
+   main(*[int(a) for a in sys.argv[1:]])
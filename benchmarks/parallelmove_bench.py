@@ -0,0 +1,60 @@
+"""
+run time of a single very long pen down move drawn by the board itself
+against ParallelMoveExecutor with increasing numbers of jobs. The stroke
+leaves the board and comes back in every few thousand points.
+
+usage: python -m benchmarks.parallelmove_bench [points] [max jobs]
+"""
+
+import io
+import os
+import sys
+import time
+
+from vectdraw.draw.board import Board, Pen
+from vectdraw.draw.plane import Point
+from vectdraw.parallelmove import ParallelMoveExecutor
+
+
+def MakePoints(count):
+   """
+   returns count relative moves sweeping past the right boundary and back
+   """
+   return [Point(7 if i // 3000 % 2 == 0 else -7, 1 if i % 2 else -1)
+           for i in range(count)]
+
+
+def Time(points, jobs):
+   executor = ParallelMoveExecutor(jobs) if jobs else None
+   board = Board(Pen(), io.StringIO(), moveExecutor=executor)
+   board.pen.down()
+
+   start = time.perf_counter()
+   try:
+      board.MovePen(points)
+   finally:
+      if executor is not None:
+         executor.Close()
+   elapsed = time.perf_counter() - start
+
+   return elapsed, board.outputStream.getvalue()
+
+
+def main(count=1000000, maxJobs=os.cpu_count()):
+   points = MakePoints(count)
+   serial, expected = Time(points, 0)
+   print("serial   {:8.3f}s".format(serial))
+
+   jobs = 1
+   while jobs <= maxJobs:
+      elapsed, output = Time(points, jobs)
+      if output != expected:
+         raise RuntimeError("the output of {} jobs differs".format(jobs))
+
+      print("{:>2} jobs  {:8.3f}s  {:5.2f}x".format(
+         jobs, elapsed, serial / elapsed))
+      jobs *= 2
+
+
+if __name__ == '__main__':
+   main(*[int(a) for a in sys.argv[1:]])
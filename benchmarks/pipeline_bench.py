@@ -0,0 +1,99 @@
+"""
+run time of the serial VectorCommandStreamProcessor.run against RunPipelined
+(reader and writer threads) with a slow source, a slow sink and both.
+
+The slow source sleeps for every read, like a network stream or a slow
+disk; the slow sink sleeps for every flush and in proportion to what is
+written, like a pipe to a slower consumer. The board draws for real, so
+the output is produced and flushed after every command.
+
+usage: python -m benchmarks.pipeline_bench [size in MB]
+"""
+
+import io
+import sys
+import time
+
+from sixteen14encoding.codec.sixteen14hex import Sixteen14Codec
+from vectdraw.draw.board import Board, Pen
+from vectdraw.hexstreamreader import BufferedHexStreamReader
+from vectdraw.pipeline import RunPipelined
+from vectdraw.process import VectorCommandStreamProcessor
+from vectdraw.streamwriter import CommandStreamWriter
+from vectdraw.settings import REGISTERED_COMMANDS
+
+# blocks read at a time, and seconds per read of the slow source
+kBlockSize = 1 << 16
+kReadLatency = 0.01
+
+# seconds per flush and per MB written of the slow sink
+kFlushLatency = 0.0001
+kWriteSeconds = 0.2
+
+
+class SlowSource(io.BytesIO):
+
+   def read(self, size=-1):
+      time.sleep(kReadLatency)
+      return super().read(size)
+
+   def readinto(self, buffer):
+      time.sleep(kReadLatency)
+      return super().readinto(buffer)
+
+
+class SlowSink(io.StringIO):
+
+   def write(self, text):
+      time.sleep(len(text) * kWriteSeconds / (1 << 20))
+      return super().write(text)
+
+   def flush(self):
+      time.sleep(kFlushLatency)
+
+
+def MakeInput(megabytes):
+   """
+   returns a hex encoded stream of roughly megabytes MB of moves, pen and
+   colour commands
+   """
+   stream = io.BytesIO()
+   with CommandStreamWriter(stream) as writer:
+      i = 0
+      while stream.tell() + len(writer.buffer) * 2 < megabytes << 20:
+         writer.pen(i % 3 != 0)
+         writer.colour(i % 256, 0, 255, 255)
+         writer.move([(5, -5) if j % 2 else (-5, 5)
+                      for j in range(i % 20 * 2)])
+         i += 1
+
+   return stream.getvalue()
+
+
+def Time(run, data, sourceClass, sinkClass):
+   processor = VectorCommandStreamProcessor(
+      BufferedHexStreamReader(sourceClass(data), blockSize=kBlockSize),
+      Sixteen14Codec, Board(Pen(), sinkClass()), REGISTERED_COMMANDS)
+
+   start = time.perf_counter()
+   run(processor)
+   return time.perf_counter() - start
+
+
+def main(megabytes=2):
+   data = MakeInput(megabytes)
+   for name, sourceClass, sinkClass in (
+         ("fast io", io.BytesIO, io.StringIO),
+         ("slow source", SlowSource, io.StringIO),
+         ("slow sink", io.BytesIO, SlowSink),
+         ("slow both", SlowSource, SlowSink)):
+
+      serial = Time(VectorCommandStreamProcessor.run, data, sourceClass,
+                    sinkClass)
+      pipelined = Time(RunPipelined, data, sourceClass, sinkClass)
+      print("{:<12} serial {:8.3f}s   pipelined {:8.3f}s   {:5.2f}x".format(
+         name, serial, pipelined, serial / pipelined))
+
+
+if __name__ == '__main__':
+   main(*[int(a) for a in sys.argv[1:]])
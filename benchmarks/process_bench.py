@@ -0,0 +1,114 @@
+"""
+parse throughput of VectorCommandStreamProcessor.run (single pass tokenizer)
+against the previous per byte run()/GetArgs() lookahead loop and, with numpy
+installed, the vectorized engine (VectorizedCommandStreamProcessor).
+
+Board methods are replaced with no-ops so only reading, tokenizing and
+decoding are measured.
+
+usage: python -m benchmarks.process_bench [size in MB]
+"""
+
+import io
+import sys
+import time
+
+from sixteen14encoding.codec.sixteen14hex import Sixteen14Codec
+from vectdraw.draw.board import Board, Pen
+from vectdraw.hexstreamreader import BufferedHexStreamReader
+from vectdraw.process import VectorCommandStreamProcessor
+from vectdraw.vectorprocess import VectorizedCommandStreamProcessor, numpy
+from vectdraw.settings import REGISTERED_COMMANDS
+from vectdraw.streamwriter import CommandStreamWriter
+
+
+class NullBoard(Board):
+
+   def clear(self):
+      pass
+
+   def ChangePenPosition(self, position):
+      pass
+
+   def SetColour(self, r, g, b, a):
+      pass
+
+   def MovePen(self, points):
+      pass
+
+
+def LegacyRun(processor):
+   """
+   the run() loop used before the tokenizer, sharing the reader's
+   currentByte as lookahead with GetArgs()
+   """
+   reader = processor.streamreader
+   try:
+      next(reader)
+      while not reader.closed:
+         byte = reader.currentByte
+         if processor.IsCommandByte(byte):
+            command = processor.commandTable[int(byte, 16)]
+            if command is None:
+               next(reader)
+            else:
+               args = processor.GetArgs()
+               getattr(processor.vectorBoard, command.method)(
+                  *command.PrepareParameters(*args))
+         else:
+            next(reader)
+   except StopIteration:
+      return
+
+
+def MakeInputs(megabytes):
+   """
+   returns hex encoded streams of roughly megabytes MB: one made of long
+   moves and one made of short pen and colour commands
+   """
+   moves = io.BytesIO()
+   with CommandStreamWriter(moves) as writer:
+      while moves.tell() + len(writer.buffer) * 2 < megabytes << 20:
+         writer.pen(True)
+         writer.move([(i % 50 - 25, 25 - i % 50) for i in range(5000)])
+         writer.pen(False)
+
+   toggles = io.BytesIO()
+   with CommandStreamWriter(toggles) as writer:
+      while toggles.tell() + len(writer.buffer) * 2 < megabytes << 20:
+         for i in range(1000):
+            writer.pen(i % 2)
+            writer.colour(i % 256, 0, 255, 255)
+
+   return (("long moves", moves.getvalue()),
+           ("short commands", toggles.getvalue()))
+
+
+def Time(run, data, processorClass=VectorCommandStreamProcessor):
+   processor = processorClass(
+      BufferedHexStreamReader(io.BytesIO(data)), Sixteen14Codec,
+      NullBoard(Pen(), io.StringIO()), REGISTERED_COMMANDS)
+
+   start = time.perf_counter()
+   run(processor)
+   return time.perf_counter() - start
+
+
+def main(megabytes=4):
+   for name, data in MakeInputs(megabytes):
+      size = len(data) / (1 << 20)
+      engines = [("legacy loop", LegacyRun, VectorCommandStreamProcessor),
+                 ("tokenizer", VectorCommandStreamProcessor.run,
+                  VectorCommandStreamProcessor)]
+      if numpy is not None:
+         engines.append(("vectorized", VectorizedCommandStreamProcessor.run,
+                         VectorizedCommandStreamProcessor))
+
+      for engine, run, processorClass in engines:
+         elapsed = Time(run, data, processorClass)
+         print("{:<15} {:<12} {:8.3f}s {:8.2f} MB/s".format(
+            name, engine, elapsed, size / elapsed))
+
+
+if __name__ == '__main__':
+   main(*[int(a) for a in sys.argv[1:]])
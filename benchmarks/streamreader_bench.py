@@ -0,0 +1,60 @@
+"""
+throughput comparison between HexStreamReader and BufferedHexStreamReader
+
+usage: python -m benchmarks.streamreader_bench [size in MB]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from vectdraw.hexstreamreader import HexStreamReader, BufferedHexStreamReader
+
+
+kLine = "F0A04000417F4000417FC040004000804001C05F205F20804000\n"
+
+
+def MakeInput(path, megabytes):
+   """
+   writes roughly megabytes MB of newline separated hex commands to path
+   :param path: file to write
+   :param megabytes: approximate size of the file
+   """
+   lines = (megabytes * (1 << 20)) // len(kLine)
+   with open(path, 'w') as f:
+      f.write(kLine * lines)
+
+
+def Time(readerFactory, path):
+   """
+   returns seconds taken to iterate every byte of path using readerFactory
+   """
+   with open(path) as f:
+      reader = readerFactory(f)
+      start = time.perf_counter()
+      for _ in reader:
+         pass
+      return time.perf_counter() - start
+
+
+def main(megabytes=8):
+   fd, path = tempfile.mkstemp(suffix='.hex')
+   os.close(fd)
+
+   try:
+      MakeInput(path, megabytes)
+      size = os.path.getsize(path) / (1 << 20)
+
+      for name, factory in (
+            ("HexStreamReader", HexStreamReader),
+            ("BufferedHexStreamReader", BufferedHexStreamReader)):
+         elapsed = Time(factory, path)
+         print("{:<25} {:8.3f}s {:8.2f} MB/s".format(
+            name, elapsed, size / elapsed))
+   finally:
+      os.remove(path)
+
+
+if __name__ == '__main__':
+   main(*[int(a) for a in sys.argv[1:]])
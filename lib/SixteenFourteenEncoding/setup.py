@@ -10,6 +10,10 @@ setuptools.setup(
 
     packages=setuptools.find_packages(),
 
+    # vectorized decode_many/encode_many, a pure python fallback is used
+    # when numpy is not installed
+    extras_require={"numpy": ["numpy"]},
+
     entry_points={
         "console_scripts": {
             "{0} = sixteen14encoding.scripts:encode".format(__script_names["encode"]),
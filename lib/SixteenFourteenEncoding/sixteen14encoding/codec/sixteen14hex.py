@@ -3,9 +3,37 @@
 codec class for Sixteen Fourteen Hex Encoding
 """
 
+import array
+import functools
+
 from sixteen14encoding.codec.basicbit import BaseBitCodec
 
 
+@functools.lru_cache(maxsize=None)
+def _numpy():
+    """
+    returns the numpy module, or None if numpy is not installed. numpy is
+    imported on first use so importing the codec stays cheap
+    """
+    try:
+        import numpy
+    except ImportError:
+        return None
+
+    return numpy
+
+
+class DomainError(ValueError):
+    """
+    Raised by the bulk encode/decode methods when a value is outside the
+    supported domain. offset is the index of the first invalid value
+    """
+
+    def __init__(self, message, offset):
+        super(DomainError, self).__init__(message)
+        self.offset = offset
+
+
 class Sixteen14Codec(BaseBitCodec):
     """
     Implements Sixteen Fourteen Hex encoding
@@ -28,6 +56,9 @@ class Sixteen14Codec(BaseBitCodec):
 
     _ENCODING_DOMAIN = [-8192, 8191]
 
+    # largest 14bit integer after shifting it to an unsigned integer
+    _MAX_UNSIGNED = 16383
+
     _DECODING_DOMAIN = [0x0000, 0x7f7f]
 
     @classmethod
@@ -70,7 +101,192 @@ class Sixteen14Codec(BaseBitCodec):
             raise ValueError("Argument {0} is outside supported domain {1}"
                              .format(hexadecimal, cls._DECODING_DOMAIN))
 
-        return cls._decode(converted_int)
+        return cls.decode_bytes(*divmod(converted_int, 256))
+
+    @classmethod
+    def decode_bytes(cls, high, low=None):
+        """
+        decodes the two bytes of a 16 bit value encoded with Sixteen Fourteen
+        Encoding into a 14bit signed integer.
+
+        This is the fast path for callers that already hold the bytes as
+        integers: no hex parsing, and the mask/shift/merge steps of _decode
+        are fused into a single expression
+
+        :param high: most significant byte (0-255), or a 2 byte sequence
+                     (bytes, bytearray, memoryview slice) if low is omitted
+        :param low: least significant byte (0-255)
+        :return: a 14bit decoded int
+        """
+        if low is None:
+            high, low = high
+
+        if low >> 8 or not 0 <= (high << 8 | low) <= cls._DECODING_DOMAIN[1]:
+            raise ValueError("Expected two bytes within the supported "
+                             "domain {0}, got {1} {2}"
+                             .format(cls._DECODING_DOMAIN, high, low))
+
+        return (high << 7 | low & cls._LEAST_SIGNIFICANT_BIT_TO_7TH_MASK) - \
+            cls._SIGNED_UNSIGNED_CONVERTER
+
+    @classmethod
+    def encode_bytes(cls, integer):
+        """
+        encodes a 14bit signed integer using Sixteen Fourteen Encoding into
+        its two bytes, without building an intermediate hex string
+
+        :param integer: 14bit int
+        :return: 2 byte bytes object, most significant byte first
+        """
+        unsigned = integer + cls._SIGNED_UNSIGNED_CONVERTER
+
+        if not 0 <= unsigned <= cls._MAX_UNSIGNED:
+            raise ValueError("Argument {0} is outside supported domain {1}"
+                             .format(integer, cls._ENCODING_DOMAIN))
+
+        return bytes((unsigned >> 7,
+                      unsigned & cls._LEAST_SIGNIFICANT_BIT_TO_7TH_MASK))
+
+    @classmethod
+    def decode_many(cls, buffer):
+        """
+        decodes a whole block of 16 bit values encoded with Sixteen Fourteen
+        Encoding in one call.
+
+        With numpy installed, the block is decoded with vectorized array
+        operations and a numpy int16 array is returned. Otherwise a pure
+        python fallback returns an array.array of type 'h'
+
+        :param buffer: uint8 array or bytes-like object holding the encoded
+                       bytes (most significant byte first), or a uint16
+                       array (numpy or array.array('H')) holding whole words
+        :return: int16 array of decoded 14bit integers
+        :raises DomainError: with the offset of the first invalid word
+        """
+        numpy = _numpy()
+        if numpy is not None:
+            return cls._decode_many_numpy(numpy, buffer)
+
+        return cls._decode_many_python(buffer)
+
+    @classmethod
+    def encode_many(cls, integers):
+        """
+        encodes a whole array of 14bit signed integers using Sixteen Fourteen
+        Encoding in one call.
+
+        With numpy installed, the array is encoded with vectorized array
+        operations and a numpy uint8 array is returned. Otherwise a pure
+        python fallback returns bytes
+
+        :param integers: sequence or numpy array of 14bit integers
+        :return: encoded bytes, 2 per integer, most significant byte first
+        :raises DomainError: with the offset of the first invalid integer
+        """
+        numpy = _numpy()
+        if numpy is not None:
+            return cls._encode_many_numpy(numpy, integers)
+
+        return cls._encode_many_python(integers)
+
+    @classmethod
+    def _decode_many_numpy(cls, numpy, buffer):
+        words = numpy.asarray(buffer) if isinstance(
+            buffer, (numpy.ndarray, array.array)) else None
+
+        if words is None or words.dtype.itemsize == 1:
+            data = numpy.frombuffer(buffer, dtype=numpy.uint8) \
+                if words is None else words.astype(numpy.uint8, copy=False)
+
+            if len(data) % 2:
+                raise ValueError("Expected an even number of bytes, got {0}"
+                                 .format(len(data)))
+
+            words = data.reshape(-1, 2).astype(numpy.uint16)
+            words = (words[:, 0] << 8) | words[:, 1]
+
+        invalid = numpy.flatnonzero(
+            (words < 0) | (words > cls._DECODING_DOMAIN[1]))
+        if len(invalid):
+            raise DomainError(
+                "Word {0} at offset {1} is outside supported domain {2}"
+                .format(hex(int(words[invalid[0]])), int(invalid[0]),
+                        cls._DECODING_DOMAIN),
+                int(invalid[0]))
+
+        words = words.astype(numpy.int32)
+        decoded = ((words >> 8) << 7 |
+                   words & cls._LEAST_SIGNIFICANT_BIT_TO_7TH_MASK)
+        return (decoded - cls._SIGNED_UNSIGNED_CONVERTER).astype(numpy.int16)
+
+    @classmethod
+    def _decode_many_python(cls, buffer):
+        if isinstance(buffer, array.array) and buffer.itemsize > 1:
+            highs = [word >> 8 for word in buffer]
+            lows = [word & 0xff for word in buffer]
+        else:
+            data = memoryview(buffer).cast('B')
+            if len(data) % 2:
+                raise ValueError("Expected an even number of bytes, got {0}"
+                                 .format(len(data)))
+
+            highs, lows = data[0::2], data[1::2]
+
+        maximum = cls._DECODING_DOMAIN[1]
+        if highs and (max(highs) >= maximum >> 8 or min(highs) < 0):
+            for offset, (high, low) in enumerate(zip(highs, lows)):
+                if not 0 <= (high << 8 | low) <= maximum:
+                    raise DomainError(
+                        "Word {0} at offset {1} is outside supported domain "
+                        "{2}".format(hex(high << 8 | low), offset,
+                                     cls._DECODING_DOMAIN),
+                        offset)
+
+        mask = cls._LEAST_SIGNIFICANT_BIT_TO_7TH_MASK
+        converter = cls._SIGNED_UNSIGNED_CONVERTER
+        return array.array('h', [(high << 7 | low & mask) - converter
+                                 for high, low in zip(highs, lows)])
+
+    @classmethod
+    def _encode_many_numpy(cls, numpy, integers):
+        unsigned = numpy.asarray(integers).astype(numpy.int64) + \
+            cls._SIGNED_UNSIGNED_CONVERTER
+
+        invalid = numpy.flatnonzero(
+            (unsigned < 0) | (unsigned > cls._MAX_UNSIGNED))
+        if len(invalid):
+            raise DomainError(
+                "Argument {0} at offset {1} is outside supported domain {2}"
+                .format(int(unsigned[invalid[0]]) -
+                        cls._SIGNED_UNSIGNED_CONVERTER,
+                        int(invalid[0]), cls._ENCODING_DOMAIN),
+                int(invalid[0]))
+
+        encoded = numpy.empty(len(unsigned) * 2, dtype=numpy.uint8)
+        encoded[0::2] = unsigned >> 7
+        encoded[1::2] = unsigned & cls._LEAST_SIGNIFICANT_BIT_TO_7TH_MASK
+        return encoded
+
+    @classmethod
+    def _encode_many_python(cls, integers):
+        mask = cls._LEAST_SIGNIFICANT_BIT_TO_7TH_MASK
+        unsigned = [integer + cls._SIGNED_UNSIGNED_CONVERTER
+                    for integer in integers]
+
+        if unsigned and (min(unsigned) < 0 or
+                         max(unsigned) > cls._MAX_UNSIGNED):
+            for offset, integer in enumerate(integers):
+                if not 0 <= unsigned[offset] <= cls._MAX_UNSIGNED:
+                    raise DomainError(
+                        "Argument {0} at offset {1} is outside supported "
+                        "domain {2}".format(integer, offset,
+                                            cls._ENCODING_DOMAIN),
+                        offset)
+
+        encoded = bytearray(len(unsigned) * 2)
+        encoded[0::2] = bytes([value >> 7 for value in unsigned])
+        encoded[1::2] = bytes([value & mask for value in unsigned])
+        return bytes(encoded)
 
     @staticmethod
     def is_within_domain(arg, domain):
@@ -130,4 +346,5 @@ class Sixteen14Codec(BaseBitCodec):
         partially_decoded = cls.mergebits(
             partially_decoded, masked_first_seven_bits)
 
-        return partially_decoded - cls._SIGNED_UNSIGNED_CONVERTER
\ No newline at end of file
+        return partially_decoded - cls._SIGNED_UNSIGNED_CONVERTER
+
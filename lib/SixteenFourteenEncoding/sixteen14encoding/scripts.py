@@ -1,4 +1,3 @@
-
 """
 script methods for encoding/decoding
 """
@@ -8,17 +7,32 @@ from sixteen14encoding import __script_names
 from sixteen14encoding.codec.sixteen14hex import Sixteen14Codec
 
 
+# arguments selecting batch mode: "-" reads stdin, "-f"/"--file" a file
+_STDIN_ARG = "-"
+_FILE_ARGS = ("-f", "--file")
+
+# number of results buffered before they are written out
+_WRITE_BATCH_SIZE = 8192
+
+
 def encode():
     """
     parses command line arguments and attempts to encode
     the parsed argument. Meant to be used with setuptools'
     entrypoint. The returned value/exception is printed to
     stderr
+
+    Given "-" or "-f path", values are read from stdin or the file
+    instead, one per line or whitespace separated, and the results are
+    written to stdout, one per line
     """
     arg = sys.argv[1] if len(sys.argv) > 1 else None
     if arg is None:
         return "Usage:{0} Integer".format(__script_names["encode"])
 
+    if arg == _STDIN_ARG or arg in _FILE_ARGS:
+        return _run_batch(Sixteen14Codec.encode, __script_names["encode"])
+
     try:
         return Sixteen14Codec.encode(arg)
     except (TypeError, ValueError) as e:
@@ -31,12 +45,97 @@ def decode():
     the parsed argument. Meant to be used with setuptools'
     entrypoint. The returned value/exception is printed to
     stderr
+
+    Given "-" or "-f path", values are read from stdin or the file
+    instead, one per line or whitespace separated, and the results are
+    written to stdout, one per line
     """
     arg = sys.argv[1] if len(sys.argv) > 1 else None
     if arg is None:
         return "Usage:{0} Integer".format(__script_names["decode"])
 
+    if arg == _STDIN_ARG or arg in _FILE_ARGS:
+        return _run_batch(
+            lambda value: str(Sixteen14Codec.decode(value)),
+            __script_names["decode"])
+
     try:
         return str(Sixteen14Codec.decode(arg))
     except (TypeError, ValueError) as e:
-        return str(e)
\ No newline at end of file
+        return str(e)
+
+
+def _run_batch(convert, script_name):
+    """
+    opens the input selected by sys.argv and converts every value in it
+
+    :param convert: function converting a single value to its result string
+    :param script_name: name of the script, used in the usage message
+    :return: None if every value was converted, else an error summary
+    """
+    if sys.argv[1] == _STDIN_ARG:
+        return convert_stream(sys.stdin, convert)
+
+    if len(sys.argv) < 3:
+        return "Usage:{0} {1} path".format(script_name, sys.argv[1])
+
+    try:
+        with open(sys.argv[2]) as stream:
+            return convert_stream(stream, convert)
+    except OSError as e:
+        return str(e)
+
+
+def convert_stream(stream, convert, output=None, errors=None):
+    """
+    converts every whitespace separated value of stream, writing the
+    results to output one per line in batches. Values that fail to convert
+    are reported to errors with their line number and skipped
+
+    :param stream: iterable of lines (e.g. an open text file)
+    :param convert: function converting a single value to its result string
+    :param output: text stream for results, defaults to sys.stdout
+    :param errors: text stream for error reports, defaults to sys.stderr
+    :return: None if every value was converted, else an error summary
+    """
+    output = sys.stdout if output is None else output
+    errors = sys.stderr if errors is None else errors
+    write = getattr(output, 'buffer', None)
+
+    results = []
+    failures = 0
+    for line_number, line in enumerate(stream, 1):
+        for value in line.split():
+            try:
+                results.append(convert(value))
+            except (TypeError, ValueError) as e:
+                failures += 1
+                errors.write("line {0}: {1}\n".format(line_number, e))
+
+        if len(results) >= _WRITE_BATCH_SIZE:
+            _write_results(output, write, results)
+            results = []
+
+    _write_results(output, write, results)
+    output.flush()
+
+    if failures:
+        return "{0} value(s) could not be converted".format(failures)
+
+    return None
+
+
+def _write_results(output, binary_output, results):
+    """
+    writes results to output in a single call, through its binary layer
+    when it has one
+    """
+    if not results:
+        return
+
+    text = "\n".join(results) + "\n"
+    if binary_output is not None:
+        output.flush()
+        binary_output.write(text.encode('ascii'))
+    else:
+        output.write(text)
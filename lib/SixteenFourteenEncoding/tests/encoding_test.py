@@ -1,8 +1,17 @@
 
+import array
+import os
+import tempfile
 import unittest
 
+from io import StringIO
 from unittest.mock import patch
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 class TestEncoderFunctions(unittest.TestCase):
     def setUp(self):
@@ -35,6 +44,24 @@ class TestEncoderFunctions(unittest.TestCase):
             with patch("sys.argv", new=["prog", unencoded_int]):
                 self.assertEqual(encode(), encoded_hex)
 
+    def test_encode_bytes(self):
+        from sixteen14encoding.codec.sixteen14hex import Sixteen14Codec
+
+        for unencoded_int, encoded_hex in self.encoding_samples.items():
+            self.assertEqual(Sixteen14Codec.encode_bytes(int(unencoded_int)),
+                             int(encoded_hex, 16).to_bytes(2, 'big'))
+
+        for integer in range(-8192, 8192):
+            self.assertEqual(
+                Sixteen14Codec.decode_bytes(
+                    Sixteen14Codec.encode_bytes(integer)), integer)
+
+        with self.assertRaises(ValueError):
+            Sixteen14Codec.encode_bytes(8192)
+
+        with self.assertRaises(ValueError):
+            Sixteen14Codec.encode_bytes(-8193)
+
 
 class TestDecoderFunctions(unittest.TestCase):
     def setUp(self):
@@ -63,3 +90,149 @@ class TestDecoderFunctions(unittest.TestCase):
 
             with patch("sys.argv", new=["prog", encoded_hex]):
                 self.assertEqual(decode(), decoded_int)
+
+    def test_decode_bytes(self):
+        from sixteen14encoding.codec.sixteen14hex import Sixteen14Codec
+
+        for encoded_hex, decoded_int in self.decoding_samples.items():
+            high, low = divmod(int(encoded_hex, 16), 256)
+            self.assertEqual(
+                Sixteen14Codec.decode_bytes(high, low), int(decoded_int))
+            self.assertEqual(
+                Sixteen14Codec.decode_bytes(bytes((high, low))),
+                int(decoded_int))
+
+        # the fast path matches the reference implementation on the domain
+        for word in range(0x7f80):
+            self.assertEqual(Sixteen14Codec.decode_bytes(*divmod(word, 256)),
+                             Sixteen14Codec._decode(word))
+
+        with self.assertRaises(ValueError):
+            Sixteen14Codec.decode_bytes(0x80, 0x00)
+
+        with self.assertRaises(ValueError):
+            Sixteen14Codec.decode_bytes(0x7f, 0x80)
+
+        with self.assertRaises(ValueError):
+            Sixteen14Codec.decode_bytes(0x00, 0x100)
+
+        with self.assertRaises(ValueError):
+            Sixteen14Codec.decode_bytes(-1, 0x00)
+
+
+class TestBulkFunctions(unittest.TestCase):
+    def setUp(self):
+        from sixteen14encoding.codec.sixteen14hex import Sixteen14Codec
+
+        self.integers = [0, -8192, 8191, 2048, -4096, 5000]
+        self.encoded = b''.join(
+            Sixteen14Codec.encode_bytes(i) for i in self.integers)
+
+    def check_roundtrip(self):
+        from sixteen14encoding.codec.sixteen14hex import Sixteen14Codec
+
+        self.assertEqual(
+            list(Sixteen14Codec.decode_many(self.encoded)), self.integers)
+        self.assertEqual(
+            bytes(Sixteen14Codec.encode_many(self.integers)), self.encoded)
+
+        words = array.array('H', [int.from_bytes(self.encoded[i:i + 2], 'big')
+                                  for i in range(0, len(self.encoded), 2)])
+        self.assertEqual(list(Sixteen14Codec.decode_many(words)), self.integers)
+
+    def check_domains(self):
+        from sixteen14encoding.codec.sixteen14hex import Sixteen14Codec
+        from sixteen14encoding.codec.sixteen14hex import DomainError
+
+        with self.assertRaises(DomainError) as context:
+            Sixteen14Codec.decode_many(self.encoded + b'\x40\x00\x7f\x80')
+        self.assertEqual(context.exception.offset, len(self.integers) + 1)
+
+        with self.assertRaises(DomainError) as context:
+            Sixteen14Codec.encode_many(self.integers + [8192])
+        self.assertEqual(context.exception.offset, len(self.integers))
+
+        with self.assertRaises(ValueError):
+            Sixteen14Codec.decode_many(b'\x40')
+
+    def test_python_fallback(self):
+        with patch("sixteen14encoding.codec.sixteen14hex._numpy",
+                   return_value=None):
+            self.check_roundtrip()
+            self.check_domains()
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_numpy(self):
+        from sixteen14encoding.codec.sixteen14hex import Sixteen14Codec
+
+        self.check_roundtrip()
+        self.check_domains()
+
+        decoded = Sixteen14Codec.decode_many(
+            numpy.frombuffer(self.encoded, dtype=numpy.uint8))
+        self.assertEqual(decoded.dtype, numpy.int16)
+        self.assertEqual(decoded.tolist(), self.integers)
+
+        words = numpy.frombuffer(self.encoded, dtype='>u2').astype(numpy.uint16)
+        self.assertEqual(Sixteen14Codec.decode_many(words).tolist(),
+                         self.integers)
+
+        encoded = Sixteen14Codec.encode_many(
+            numpy.array(self.integers, dtype=numpy.int16))
+        self.assertEqual(encoded.tobytes(), self.encoded)
+
+
+class TestBatchScripts(unittest.TestCase):
+
+    def run_script(self, script, argv, stdin=""):
+        with patch("sys.argv", new=["prog"] + argv), \
+                patch("sys.stdin", new=StringIO(stdin)), \
+                patch("sys.stdout", new_callable=StringIO) as stdout, \
+                patch("sys.stderr", new_callable=StringIO) as stderr:
+            result = script()
+
+        return result, stdout.getvalue(), stderr.getvalue()
+
+    def test_encode_stdin(self):
+        from sixteen14encoding.scripts import encode
+
+        result, out, err = self.run_script(
+            encode, ["-"], "0 -8192\n8191\n\n2048  -4096\n")
+
+        self.assertIsNone(result)
+        self.assertEqual(out, "0x4000\n0x0\n0x7f7f\n0x5000\n0x2000\n")
+        self.assertEqual(err, "")
+
+    def test_decode_file(self):
+        from sixteen14encoding.scripts import decode
+
+        fd, path = tempfile.mkstemp()
+        with os.fdopen(fd, "w") as f:
+            f.write("0x4000\n0x0 0x7f7f\n")
+
+        try:
+            result, out, err = self.run_script(decode, ["-f", path])
+        finally:
+            os.remove(path)
+
+        self.assertIsNone(result)
+        self.assertEqual(out, "0\n-8192\n8191\n")
+
+    def test_errors_do_not_stop_stream(self):
+        from sixteen14encoding.scripts import decode
+
+        result, out, err = self.run_script(
+            decode, ["-"], "0x4000\nS0 0x0\n0x989680\n0x7f7f\n")
+
+        self.assertEqual(out, "0\n-8192\n8191\n")
+        self.assertEqual(len(err.splitlines()), 2)
+        self.assertTrue(err.startswith("line 2: "))
+        self.assertIn("line 3: ", err)
+        self.assertEqual(result, "2 value(s) could not be converted")
+
+    def test_missing_file_argument(self):
+        from sixteen14encoding.scripts import encode
+
+        result, out, err = self.run_script(encode, ["-f"])
+        self.assertTrue(result.startswith("Usage:"))
+
@@ -10,6 +10,7 @@ setuptools.setup(
    description="Vector based drawing system based on an encoded byte system",
    install_requires=['sixteen14encoding==0.1'],
    tests_require=['sixteen14encoding==0.1'],
+   extras_require={"numpy": ["numpy"]},
    dependency_links=[
       'file://' + os.path.join(os.getcwd(),
                                'lib', 'SixteenFourteenEncoding#egg=sixteen14encoding-0.1.0')
@@ -18,7 +19,8 @@ setuptools.setup(
    test_suite="tests",
    entry_points={
       "console_scripts": {
-         "vectdraw = vectdraw.scripts:main"
+         "vectdraw = vectdraw.scripts:main",
+         "vectdraw-client = vectdraw.client:main"
       }
    },
 )
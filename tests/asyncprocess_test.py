@@ -0,0 +1,182 @@
+import unittest
+import asyncio
+import io
+import logging
+import socket
+
+from vectdraw.asyncprocess import AsyncCommandStreamProcessor
+from vectdraw.asyncprocess import AsyncStreamOutput, AsyncStreamReader
+from vectdraw.asyncprocess import ProcessStream
+from vectdraw.diagnostics import MalformedInputError
+from vectdraw.process import VectorCommandStreamProcessor
+from vectdraw.draw.board import Board, Pen
+from vectdraw.settings import REGISTERED_COMMANDS
+from vectdraw.hexstreamreader import BufferedHexStreamReader
+from vectdraw.streamwriter import CommandStreamWriter
+
+from sixteen14encoding.codec.sixteen14hex import Sixteen14Codec
+
+
+class MemoryWriter(object):
+   """
+   asyncio.StreamWriter stand-in collecting what is written. drain() waits
+   for the drained event
+   """
+
+   def __init__(self):
+      self.data = bytearray()
+      self.writes = 0
+      self.drained = asyncio.Event()
+      self.drained.set()
+
+   def write(self, data):
+      self.data += data
+      self.writes += 1
+
+   async def drain(self):
+      await self.drained.wait()
+
+
+class TestAsyncCommandStreamProcessor(unittest.TestCase):
+
+   def setUp(self):
+      stream = io.BytesIO()
+      with CommandStreamWriter(stream) as writer:
+         writer.clear()
+         for i in range(100):
+            writer.pen(i % 3 != 0)
+            writer.colour(i % 256, 2 * i % 256, 3 * i % 256, 255)
+            writer.move([(j * 7 % 900 - 450, 300 - j * 11 % 600)
+                         for j in range(i % 17)])
+            writer.compactMove([(1, 1), (-5, 2)])
+
+      self.hex = stream.getvalue()
+
+      out = io.StringIO()
+      VectorCommandStreamProcessor(
+         BufferedHexStreamReader(io.BytesIO(self.hex)), Sixteen14Codec,
+         Board(Pen(), out), REGISTERED_COMMANDS).run()
+      self.expected = out.getvalue().encode('ascii')
+
+   def Reader(self, data, pieces=1):
+      reader = asyncio.StreamReader()
+      size = -(-len(data) // pieces)
+      for start in range(0, len(data), size):
+         reader.feed_data(data[start:start + size])
+      reader.feed_eof()
+      return reader
+
+   def test_output(self):
+      async def Run(data, binary):
+         writer = MemoryWriter()
+         await ProcessStream(self.Reader(data, 7), writer, Sixteen14Codec,
+                             binary=binary, blockSize=100)
+         return bytes(writer.data)
+
+      self.assertEqual(asyncio.run(Run(self.hex, False)), self.expected)
+      self.assertEqual(asyncio.run(Run(bytes.fromhex(self.hex.decode()),
+                                       True)), self.expected)
+
+   def test_concurrent_sessions(self):
+      order = []
+
+      async def Session(name):
+         reader = asyncio.StreamReader()
+         writer = MemoryWriter()
+         original = writer.write
+
+         def Write(data):
+            order.append(name)
+            original(data)
+
+         writer.write = Write
+         task = asyncio.ensure_future(ProcessStream(
+            reader, writer, Sixteen14Codec, blockSize=256))
+
+         for start in range(0, len(self.hex), 1000):
+            reader.feed_data(self.hex[start:start + 1000])
+            await asyncio.sleep(0)
+         reader.feed_eof()
+
+         await task
+         return bytes(writer.data)
+
+      async def Run():
+         return await asyncio.gather(*(Session(i) for i in range(10)))
+
+      for output in asyncio.run(Run()):
+         self.assertEqual(output, self.expected)
+
+      # the sessions were processed in turns, not one after the other
+      self.assertGreater(sum(a != b for a, b in zip(order, order[1:])), 10)
+
+   def test_backpressure(self):
+      async def Run():
+         writer = MemoryWriter()
+         writer.drained.clear()
+         processor = AsyncCommandStreamProcessor(
+            AsyncStreamReader(self.Reader(self.hex), blockSize=100),
+            Sixteen14Codec,
+            Board(Pen(), AsyncStreamOutput(writer), autoFlush=False),
+            REGISTERED_COMMANDS)
+
+         task = asyncio.ensure_future(processor.run())
+         for i in range(10):
+            await asyncio.sleep(0)
+
+         # the first block waits for the writer to drain
+         self.assertEqual(processor.tokenizer.offset, 50)
+         self.assertEqual(writer.writes, 1)
+
+         writer.drained.set()
+         await task
+         return bytes(writer.data)
+
+      self.assertEqual(asyncio.run(Run()), self.expected)
+
+   def test_strict(self):
+      async def Run():
+         writer = MemoryWriter()
+         data = self.hex[:1000] + b"zz" + self.hex[1000:]
+         await ProcessStream(self.Reader(data), writer, Sixteen14Codec,
+                             strict=True, blockSize=100)
+
+      logging.disable(logging.WARNING)
+      self.addCleanup(logging.disable, logging.NOTSET)
+      with self.assertRaises(MalformedInputError):
+         asyncio.run(Run())
+
+   def test_socket(self):
+      async def Run():
+         server, client = socket.socketpair()
+         serverReader, serverWriter = await asyncio.open_connection(
+            sock=server)
+         clientReader, clientWriter = await asyncio.open_connection(
+            sock=client)
+
+         async def Serve():
+            await ProcessStream(serverReader, serverWriter, Sixteen14Codec)
+            serverWriter.close()
+            await serverWriter.wait_closed()
+
+         task = asyncio.ensure_future(Serve())
+         clientWriter.write(self.hex)
+         await clientWriter.drain()
+         clientWriter.write_eof()
+
+         output = await clientReader.read()
+         await task
+         clientWriter.close()
+         await clientWriter.wait_closed()
+         return output
+
+      self.assertEqual(asyncio.run(Run()), self.expected)
+
+   def test_no_iteration(self):
+      reader = AsyncStreamReader(io.BytesIO(self.hex))
+      with self.assertRaises(TypeError):
+         next(reader)
+
+
+if __name__ == '__main__':
+   unittest.main()
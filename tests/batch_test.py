@@ -0,0 +1,129 @@
+import unittest
+import io
+import os
+import tempfile
+
+from vectdraw.batch import BatchFiles, OutputPath, RunBatch
+from vectdraw.streamwriter import CommandStreamWriter
+
+
+class TestBatch(unittest.TestCase):
+
+   def setUp(self):
+      self.directory = tempfile.TemporaryDirectory()
+      self.addCleanup(self.directory.cleanup)
+
+      self.expected = {}
+      for page in range(5):
+         stream = io.BytesIO()
+         with CommandStreamWriter(stream) as writer:
+            writer.clear()
+            writer.colour(page * 10, 0, 255, 255)
+            writer.pen(True)
+            writer.move([(page, -page), (-page, page)])
+
+         self.Write("page{}.txt".format(page),
+                    stream.getvalue().decode('ascii'))
+         self.expected["page{}.out".format(page)] = (
+            "CLR;\nCO {} 0 255 255;\nPEN DOWN;\n"
+            "MV ({}, {}) (0, 0);\n".format(page * 10, page, -page))
+
+      # an unrecognized command
+      self.Write("bad.txt", "F0E04000")
+
+   def Write(self, name, text):
+      with open(self.Path(name), 'w') as f:
+         f.write(text)
+
+   def Path(self, *names):
+      return os.path.join(self.directory.name, *names)
+
+   def Read(self, name):
+      with open(self.Path(name)) as f:
+         return f.read()
+
+   def test_output_path(self):
+      self.assertEqual(OutputPath('{dir}/{name}.out', 'a/b.txt'), 'a/b.out')
+      self.assertEqual(OutputPath('out/{name}{ext}.svg', 'b.txt'),
+                       'out/b.txt.svg')
+      self.assertEqual(OutputPath('{dir}/{name}.out', 'b.txt'), './b.out')
+
+   def test_glob(self):
+      files = BatchFiles(self.Path("page*.txt"),
+                         self.Path("out", "{name}.out"))
+      self.assertEqual([output for _, output in files],
+                       [self.Path("out", name)
+                        for name in sorted(self.expected)])
+
+      for jobs in (1, 2):
+         report = io.StringIO()
+         self.assertEqual(
+            RunBatch(files, jobs, filesPerTask=2, reportStream=report), 0)
+
+         for name, text in self.expected.items():
+            self.assertEqual(self.Read(os.path.join("out", name)), text)
+
+         self.assertTrue(report.getvalue().startswith("5 files, 0 failed"))
+         self.assertIn("files/s", report.getvalue())
+
+   def test_manifest(self):
+      self.Write("manifest.txt",
+                 "# pages\n{}\n\n{}\t{}\n{}\n{}\n".format(
+                    self.Path("page0.txt"), self.Path("page1.txt"),
+                    self.Path("one.out"), self.Path("missing.txt"),
+                    self.Path("bad.txt")))
+
+      files = BatchFiles(self.Path("manifest.txt"))
+      self.assertEqual(files[1], (self.Path("page1.txt"),
+                                  self.Path("one.out")))
+
+      with self.assertLogs('vectdraw.batch') as logs:
+         failed = RunBatch(files, 2, reportStream=io.StringIO())
+
+      # the batch goes on after the missing file
+      self.assertEqual(failed, 1)
+      self.assertEqual(self.Read("page0.txt.out"),
+                       self.expected["page0.out"])
+      self.assertEqual(self.Read("one.out"), self.expected["page1.out"])
+      self.assertEqual(self.Read("bad.txt.out"), "CLR;\n")
+
+      self.assertEqual(len(logs.records), 2)
+      self.assertIn("missing.txt: FileNotFoundError", logs.output[0])
+      self.assertIn("bad.txt: Received unrecognized command byte E0",
+                    logs.output[1])
+
+   def test_output_is_input(self):
+      # x.out would be truncated before it is read, and page0.txt would
+      # overwrite the output of page0.hex
+      self.Write("x.out", self.Read("page1.txt"))
+      self.Write("page0.hex", self.Read("page0.txt"))
+      with self.assertLogs('vectdraw.batch', 'ERROR') as logs:
+         files = BatchFiles(self.Path("*"), '{dir}/{name}.out')
+
+      self.assertNotIn((self.Path("x.out"), self.Path("x.out")), files)
+      self.assertEqual([name for name, _ in files],
+                       [self.Path(name) for name in
+                        ("bad.txt", "page0.hex", "page1.txt", "page2.txt",
+                         "page3.txt", "page4.txt")])
+      self.assertIn("page0.txt: skipped, as its output path", logs.output[0])
+      self.assertIn("x.out: skipped, as its output path is the input path",
+                    logs.output[1])
+      self.assertEqual(self.Read("x.out"), self.Read("page1.txt"))
+
+      self.Write("manifest.txt", "{}\t{}\n".format(
+         self.Path("page1.txt"), os.path.join(self.directory.name, ".",
+                                              "page1.txt")))
+      with self.assertLogs('vectdraw.batch', 'ERROR'):
+         self.assertEqual(BatchFiles(self.Path("manifest.txt")), [])
+
+   def test_strict(self):
+      files = BatchFiles(self.Path("bad.tx?"))
+      with self.assertLogs('vectdraw.batch') as logs:
+         self.assertEqual(
+            RunBatch(files, 1, strict=True, reportStream=io.StringIO()), 1)
+
+      self.assertIn("MalformedInputError", logs.output[0])
+
+
+if __name__ == '__main__':
+   unittest.main()
@@ -1,6 +1,7 @@
 import unittest
 
 from io import StringIO
+from unittest import mock
 
 from vectdraw.draw.board import Board
 from vectdraw.draw.pen import Pen
@@ -19,6 +20,16 @@ class TestBoardOutput(unittest.TestCase):
 
       self.assertEqual(self.stream.getvalue(), "CLR;\n")
 
+   def test_auto_flush(self):
+      with mock.patch.object(self.stream, 'flush') as mock_flush:
+         self.board.clear()
+         mock_flush.assert_called_once_with()
+
+      board = Board(Pen(), outputStream=self.stream, autoFlush=False)
+      with mock.patch.object(self.stream, 'flush') as mock_flush:
+         board.clear()
+         mock_flush.assert_not_called()
+
    def test_pen(self):
 
       self.board.ChangePenPosition(0)
@@ -84,4 +95,45 @@ class TestBoardOutput(unittest.TestCase):
          msg="{} != {}"
          .format(self.board.currentPenLocation, Point(50010, 10)))
 
-      self.assertEqual(self.stream.getvalue(), "MV (8191, 10);\n")
\ No newline at end of file
+      self.assertEqual(self.stream.getvalue(), "MV (8191, 10);\n")
+   def test_state(self):
+      self.board.SetColour(10, 20, 30, 40)
+      self.board.ChangePenPosition(1)
+      self.board.MovePen([Point(100, -50), Point(7, 8)])
+      state = self.board.GetState()
+
+      board = Board(Pen(), outputStream=StringIO())
+      board.SetState(state)
+      self.assertEqual(board.GetState(), state)
+      self.assertEqual(board.currentPenLocation, Point(107, -42))
+      self.assertEqual(board.lastPenLocation, Point(100, -50))
+      self.assertTrue(board.pen.IsPenDown())
+      self.assertEqual(board.pen.colour(), Colour((10, 20, 30, 40)))
+      self.assertEqual(board.outputStream.getvalue(), "")
+
+   def test_chunked_move(self):
+      # a move given in chunks prints the same as a single MovePen
+      points = [Point(10, 10), Point(5000, 5000), Point(5000, 0),
+                Point(-5000, 0), Point(-200, 0), Point(7, -7)]
+
+      for penDown in (True, False):
+         expected = StringIO()
+         board = Board(Pen(), outputStream=expected)
+         if penDown:
+            board.pen.down()
+         board.MovePen(points)
+
+         for size in range(1, len(points) + 1):
+            stream = StringIO()
+            board = Board(Pen(), outputStream=stream)
+            if penDown:
+               board.pen.down()
+
+            board.BeginMove()
+            for i in range(0, len(points), size):
+               board.ContinueMove(points[i:i + size])
+            board.EndMove()
+
+            self.assertEqual(stream.getvalue(), expected.getvalue(),
+                             msg="chunk size {}".format(size))
+            self.assertEqual(board.currentPenLocation, Point(4817, 5003))
@@ -0,0 +1,239 @@
+import unittest
+import io
+import json
+import os
+import shutil
+import tempfile
+
+from unittest import mock
+
+try:
+   import numpy
+except ImportError:
+   numpy = None
+
+from vectdraw.checkpoint import Checkpointer
+from vectdraw.process import VectorCommandStreamProcessor
+from vectdraw.vectorprocess import VectorizedCommandStreamProcessor
+from vectdraw.draw.board import Board, Pen
+from vectdraw.settings import REGISTERED_COMMANDS
+from vectdraw.hexstreamreader import BufferedHexStreamReader
+from vectdraw.hexstreamreader import BinaryStreamReader
+from vectdraw.streamwriter import CommandStreamWriter
+
+from sixteen14encoding.codec.sixteen14hex import Sixteen14Codec
+
+
+class Interrupted(Exception):
+   pass
+
+
+def InterruptedStream(streamClass, data, limit):
+   """
+   :return: stream of data raising Interrupted once limit characters
+            were read
+   """
+   class Stream(streamClass):
+      def read(self, size=-1):
+         if self.tell() >= limit:
+            raise Interrupted()
+         return super().read(size)
+
+   return Stream(data)
+
+
+class TestCheckpointer(unittest.TestCase):
+
+   def setUp(self):
+      self.directory = tempfile.mkdtemp()
+      self.path = os.path.join(self.directory, 'run.json')
+
+   def tearDown(self):
+      shutil.rmtree(self.directory)
+
+   def test_due(self):
+      checkpointer = Checkpointer(self.path, everyBytes=100,
+                                  everySeconds=None)
+      self.assertFalse(checkpointer.Due(99))
+      self.assertTrue(checkpointer.Due(100))
+
+      checkpointer = Checkpointer(self.path, everyBytes=None,
+                                  everySeconds=5)
+      self.assertFalse(checkpointer.Due(1 << 40))
+      with mock.patch('time.monotonic',
+                      return_value=checkpointer.lastTime + 5):
+         self.assertTrue(checkpointer.Due(0))
+
+   def test_write_and_load(self):
+      checkpointer = Checkpointer(self.path, everyBytes=100, source='a')
+      checkpointer.Write({"input": {"offset": 250}, "output": 12})
+      self.assertEqual(checkpointer.lastOffset, 250)
+      self.assertEqual(os.listdir(self.directory), ['run.json'])
+
+      state = Checkpointer(self.path, source='a').Load()
+      self.assertEqual(state["input"], {"offset": 250})
+      self.assertEqual(state["output"], 12)
+
+      with self.assertRaisesRegex(ValueError, "another input"):
+         Checkpointer(self.path, source='b').Load()
+
+   def test_bad_checkpoints(self):
+      with self.assertRaises(ValueError):
+         Checkpointer(self.path).Load()
+
+      for content in ('{"version"', '[]', '{"version": 0}'):
+         with open(self.path, 'w') as f:
+            f.write(content)
+         with self.assertRaises(ValueError):
+            Checkpointer(self.path).Load()
+
+
+class TestResume(unittest.TestCase):
+   """
+   a run interrupted at any point and resumed from its last checkpoint
+   must produce the output of an uninterrupted run
+   """
+
+   def setUp(self):
+      stream = io.BytesIO()
+      with CommandStreamWriter(stream) as writer:
+         writer.clear()
+         writer.colour(255, 0, 0, 255)
+         writer.move([(0, 0)])
+         for i in range(20):
+            writer.pen(i % 3 != 0)
+            writer.colour(i, 2 * i, 3 * i, 255)
+            writer.move([(j * 7 % 900 - 450, 300 - j * 11 % 600)
+                         for j in range(i * 5)])
+            writer.compactMove([(1, 1), (-5, 2)])
+
+      data = stream.getvalue().decode('ascii')
+
+      # lines of odd length, so bytes straddle the newlines
+      self.hex = '\n'.join(data[i:i + 77] for i in range(0, len(data), 77))
+      self.binary = bytes.fromhex(data)
+
+      self.directory = tempfile.mkdtemp()
+      self.checkpoint = os.path.join(self.directory, 'run.json')
+      self.output = os.path.join(self.directory, 'out.txt')
+
+   def tearDown(self):
+      shutil.rmtree(self.directory)
+
+   def Run(self, processorClass, stream, binary, blockSize, resume=False,
+           maxChunkArgs=None):
+      readerClass = BinaryStreamReader if binary else BufferedHexStreamReader
+      # a checkpoint per block
+      checkpointer = Checkpointer(self.checkpoint, everyBytes=1,
+                                  everySeconds=None)
+      with open(self.output, 'r+' if resume else 'w') as out:
+         processor = processorClass(
+            readerClass(stream, blockSize=blockSize), Sixteen14Codec,
+            Board(Pen(), outputStream=out), REGISTERED_COMMANDS,
+            checkpointer=checkpointer)
+         if maxChunkArgs is not None:
+            processor.kMaxChunkArgs = maxChunkArgs
+
+         if resume:
+            processor.Resume(checkpointer.Load())
+         try:
+            processor.run()
+         except Interrupted:
+            return False
+
+      return True
+
+   def Output(self):
+      with open(self.output) as f:
+         return f.read()
+
+   def Compare(self, processorClass, binary, blockSize, maxChunkArgs=None):
+      streamClass = io.BytesIO if binary else io.StringIO
+      data = self.binary if binary else self.hex
+
+      self.Run(processorClass, streamClass(data), binary, blockSize,
+               maxChunkArgs=maxChunkArgs)
+      expected = self.Output()
+      self.assertTrue(expected.startswith("CLR;\nCO 255 0 0 255;\n"))
+
+      for limit in range(2 * blockSize, len(data), len(data) // 7):
+         os.remove(self.checkpoint)
+         self.assertFalse(self.Run(
+            processorClass, InterruptedStream(streamClass, data, limit),
+            binary, blockSize, maxChunkArgs=maxChunkArgs))
+
+         self.assertTrue(self.Run(processorClass, streamClass(data), binary,
+                                  blockSize, resume=True,
+                                  maxChunkArgs=maxChunkArgs))
+         self.assertEqual(self.Output(), expected)
+
+   def test_hex(self):
+      for blockSize in (16, 101, 1000):
+         self.Compare(VectorCommandStreamProcessor, False, blockSize)
+
+   def test_binary(self):
+      for blockSize in (16, 101):
+         self.Compare(VectorCommandStreamProcessor, True, blockSize)
+
+   def test_chunked_commands(self):
+      self.Compare(VectorCommandStreamProcessor, False, 16, maxChunkArgs=8)
+
+   def test_open_commands(self):
+      # checkpoints are written between the chunks of long moves, drawn
+      # with the pen up and down, and the moves are resumed from them
+      stream = io.BytesIO()
+      with CommandStreamWriter(stream) as writer:
+         writer.clear()
+         writer.colour(255, 0, 0, 255)
+         for i in range(3):
+            writer.pen(i != 1)
+            writer.move([(j * 37 % 2000 - 1000, j * 53 % 1600 - 800)
+                         for j in range(300)])
+
+      data = stream.getvalue().decode('ascii')
+      self.hex = data
+      self.binary = bytes.fromhex(data)
+
+      processorClasses = [VectorCommandStreamProcessor]
+      if numpy is not None:
+         processorClasses.append(VectorizedCommandStreamProcessor)
+
+      write = Checkpointer.Write
+      for processorClass in processorClasses:
+         for binary in (False, True):
+            with mock.patch.object(Checkpointer, 'Write', autospec=True,
+                                   side_effect=write) as written:
+               self.Compare(processorClass, binary, 64, maxChunkArgs=16)
+
+            commands = [call[0][1]["command"]
+                        for call in written.call_args_list]
+            self.assertIn([True, True], [command["move"]
+                                         for command in commands
+                                         if command is not None])
+            self.assertIn([False, False], [command["move"]
+                                           for command in commands
+                                           if command is not None])
+
+   @unittest.skipIf(numpy is None, "numpy is not installed")
+   def test_vectorized(self):
+      self.Compare(VectorizedCommandStreamProcessor, False, 101)
+      self.Compare(VectorizedCommandStreamProcessor, True, 16,
+                   maxChunkArgs=8)
+
+   def test_resume_complete_run(self):
+      self.Run(VectorCommandStreamProcessor, io.StringIO(self.hex), False,
+               1000)
+      expected = self.Output()
+      with open(self.checkpoint) as f:
+         self.assertEqual(json.load(f)["output"], len(expected))
+
+      self.Run(VectorCommandStreamProcessor, io.StringIO(self.hex), False,
+               1000, resume=True)
+      self.assertEqual(self.Output(), expected)
+
+   def test_mode_mismatch(self):
+      self.Run(VectorCommandStreamProcessor, io.StringIO(self.hex), False,
+               1000)
+      with self.assertRaisesRegex(ValueError, "hex input"):
+         self.Run(VectorCommandStreamProcessor, io.BytesIO(self.binary),
+                  True, 1000, resume=True)
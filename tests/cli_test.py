@@ -1,10 +1,13 @@
 import unittest
+import argparse
+import os
 import sys
+import tempfile
 
 from unittest.mock import patch
 from io import StringIO
 
-from vectdraw.cli import ParseArgs
+from vectdraw.cli import ParseArgs, ParseIndexArgs, ParseQueueArgs, RangeType
 
 
 class TestCLIParser(unittest.TestCase):
@@ -42,6 +45,174 @@ class TestCLIParser(unittest.TestCase):
          args = ParseArgs()
       self.assertEqual(args["f"].name, "<stdin>")
       self.assertEqual(args["o"].name, "<stdout>")
+      self.assertFalse(args["binary"])
+      self.assertEqual(args["engine"], "stream")
+      self.assertFalse(args["strict"])
+
+   def test_binary_flag(self):
+      with patch('sys.argv', new=[sys.argv[0], '--binary']):
+         args = ParseArgs()
+      self.assertTrue(args["binary"])
+
+   def test_strict_flag(self):
+      with patch('sys.argv', new=[sys.argv[0], '--strict']):
+         args = ParseArgs()
+      self.assertTrue(args["strict"])
+
+   def test_checkpoint(self):
+      directory = tempfile.TemporaryDirectory()
+      self.addCleanup(directory.cleanup)
+      checkpoint = os.path.join(directory.name, 'run.json')
+      output = os.path.join(directory.name, 'out.txt')
+      with open(output, 'w') as f:
+         f.write("CLR;\n")
+
+      argv = ['-f', 'tests/box.txt', '-o', output, '--checkpoint',
+              checkpoint, '--checkpoint-bytes', '4096', '--resume']
+
+      # without a checkpoint file, the run starts over
+      with patch('sys.argv', new=[sys.argv[0]] + argv):
+         args = ParseArgs()
+      self.assertFalse(args["resume"])
+      self.assertEqual(args["o"].mode, "w")
+      args["f"].close()
+      args["o"].close()
+
+      with open(checkpoint, 'w') as f:
+         f.write("{}")
+      with patch('sys.argv', new=[sys.argv[0]] + argv):
+         args = ParseArgs()
+      self.assertEqual(args["checkpoint"], checkpoint)
+      self.assertEqual(args["checkpoint_bytes"], 4096)
+      self.assertTrue(args["resume"])
+      self.assertEqual(args["o"].mode, "r+")
+      args["f"].close()
+      args["o"].close()
+
+   @patch('sys.stderr', new_callable=StringIO)
+   def test_bad_checkpoint(self, mock_stderr):
+      for argv in (['--resume'], ['--checkpoint', 'run.json'],
+                   ['-f', 'tests/box.txt', '-o', 'out.txt.gz',
+                    '--checkpoint', 'run.json']):
+         with self.assertRaises(SystemExit):
+            with patch('sys.argv', new=[sys.argv[0]] + argv):
+               ParseArgs()
+
+   def test_range(self):
+      argv = ['-f', 'tests/box.txt', '--range', '10:20']
+      with patch('sys.argv', new=[sys.argv[0]] + argv):
+         args = ParseArgs()
+      self.assertEqual(args["range"], (10, 20))
+      args["f"].close()
+
+      self.assertEqual(RangeType(":5"), (0, 5))
+      self.assertEqual(RangeType("7:"), (7, None))
+      for value in ("5", "a:b", "5:2", "-1:2"):
+         with self.assertRaises(argparse.ArgumentTypeError):
+            RangeType(value)
+
+   @patch('sys.stderr', new_callable=StringIO)
+   def test_pipeline(self, mock_stderr):
+      with patch('sys.argv', new=[sys.argv[0], '--pipeline']):
+         args = ParseArgs()
+      self.assertTrue(args["pipeline"])
+
+      argv = ['-f', 'tests/box.txt', '--pipeline', '--range', '10:20']
+      with self.assertRaises(SystemExit):
+         with patch('sys.argv', new=[sys.argv[0]] + argv):
+            ParseArgs()
+
+   @patch('sys.stderr', new_callable=StringIO)
+   def test_jobs(self, mock_stderr):
+      with patch('sys.argv', new=[sys.argv[0], '--jobs', '4']):
+         args = ParseArgs()
+      self.assertEqual(args["jobs"], 4)
+
+      for argv in (['--jobs', '0'], ['--jobs', '2', '--pipeline']):
+         with self.assertRaises(SystemExit):
+            with patch('sys.argv', new=[sys.argv[0]] + argv):
+               ParseArgs()
+
+   @patch('sys.stderr', new_callable=StringIO)
+   def test_move_jobs(self, mock_stderr):
+      with patch('sys.argv', new=[sys.argv[0], '--move-jobs', '4']):
+         args = ParseArgs()
+      self.assertEqual(args["move_jobs"], 4)
+
+      for argv in (['--move-jobs', '0'],
+                   ['--move-jobs', '2', '--jobs', '2']):
+         with self.assertRaises(SystemExit):
+            with patch('sys.argv', new=[sys.argv[0]] + argv):
+               ParseArgs()
+
+   @patch('sys.stderr', new_callable=StringIO)
+   def test_follow(self, mock_stderr):
+      with patch('sys.argv', new=[sys.argv[0], '-f', 'tests/box.txt',
+                                  '--follow', '--follow-timeout', '2']):
+         args = ParseArgs()
+      self.assertTrue(args["follow"])
+      self.assertEqual(args["follow_timeout"], 2.0)
+      args["f"].close()
+
+      for argv in (['--follow'], ['--follow-timeout', '2'],
+                   ['-f', 'tests/box.txt', '--follow', '--pipeline']):
+         with self.assertRaises(SystemExit):
+            with patch('sys.argv', new=[sys.argv[0]] + argv):
+               ParseArgs()
+
+   @patch('sys.stderr', new_callable=StringIO)
+   def test_batch(self, mock_stderr):
+      with patch('sys.argv', new=[sys.argv[0], '--batch', 'tests/*.txt',
+                                  '--jobs', '4']):
+         args = ParseArgs()
+      self.assertEqual(args["batch"], "tests/*.txt")
+      self.assertEqual(args["batch_output"], "{dir}/{name}{ext}.out")
+
+      for argv in (['--batch', 'tests/*.txt', '-o', 'out.txt'],
+                   ['--batch', 'tests/*.txt', '--move-jobs', '2']):
+         with self.assertRaises(SystemExit):
+            with patch('sys.argv', new=[sys.argv[0]] + argv):
+               ParseArgs()
+
+   @patch('sys.stderr', new_callable=StringIO)
+   def test_index_arguments(self, mock_stderr):
+      args = ParseIndexArgs(['-f', 'tests/box.txt', '--every', '100'])
+      self.assertEqual(args["every"], 100)
+      self.assertFalse(args["binary"])
+      args["f"].close()
+
+      for argv in ([], ['-f', 'tests/box.txt', '--every', '0']):
+         with self.assertRaises(SystemExit):
+            ParseIndexArgs(argv)
+
+   @patch('sys.stderr', new_callable=StringIO)
+   def test_queue_arguments(self, mock_stderr):
+      args = ParseQueueArgs(['submit', 'tests/*.txt', '--db', 'q.db',
+                             '--binary', '--attempts', '5'])
+      self.assertEqual((args["action"], args["source"], args["db"]),
+                       ("submit", "tests/*.txt", "q.db"))
+      self.assertTrue(args["binary"])
+      self.assertEqual(args["attempts"], 5)
+
+      args = ParseQueueArgs(['work', '--lease', '10'])
+      self.assertEqual((args["action"], args["lease"], args["wait"]),
+                       ("work", 10.0, False))
+
+      for argv in ([], ['submit'], ['submit', 'x', '--attempts', '0'],
+                   ['work', '--lease', '0'], ['status', 'x']):
+         with self.assertRaises(SystemExit):
+            ParseQueueArgs(argv)
+
+   def test_engine(self):
+      with patch('sys.argv', new=[sys.argv[0], '--engine', 'vectorized']):
+         args = ParseArgs()
+      self.assertEqual(args["engine"], "vectorized")
+
+   @patch('sys.stderr', new_callable=StringIO)
+   def test_bad_engine(self, mock_stderr):
+      with self.assertRaises(SystemExit):
+         with patch('sys.argv', new=[sys.argv[0], '--engine', 'fast']):
+            ParseArgs()
 
    def test_good_arguments(self):
       with patch('sys.argv', new=[sys.argv[0]] + self.good_path_param):
@@ -50,4 +221,5 @@ class TestCLIParser(unittest.TestCase):
          self.assertEqual(self.args["o"].name, "tests/__init__.py")
 
       for k, v in self.args.items():
-         v.close()
+         if hasattr(v, 'close'):
+            v.close()
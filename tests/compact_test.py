@@ -0,0 +1,185 @@
+import unittest
+import io
+import random
+
+from unittest import mock
+
+from vectdraw.compact import EncodeMoves, DecodeMoves, MovesDecoder
+from vectdraw.compact import ZigZag, UnZigZag, kMaxRunLength
+from vectdraw.diagnostics import MalformedInputError, StreamDiagnostics
+from vectdraw.streamwriter import CommandStreamWriter
+from vectdraw.process import VectorCommandStreamProcessor
+from vectdraw.hexstreamreader import BufferedHexStreamReader
+from vectdraw.hexstreamreader import BinaryStreamReader
+from vectdraw.draw.board import Board, Pen
+from vectdraw.draw.plane import Point
+from vectdraw.commands.default import CompactMovePen
+from vectdraw.settings import REGISTERED_COMMANDS
+
+from sixteen14encoding.codec.sixteen14hex import Sixteen14Codec
+
+
+def Run(dx, dy, count):
+   """
+   :return: run length record of count moves by (dx, dy), of any count
+   """
+   record = bytearray()
+   for number in (ZigZag(dx) << 1 | 1, ZigZag(dy), count - 2):
+      while number > 0x3F:
+         record.append(number & 0x3F | 0x40)
+         number >>= 6
+      record.append(number)
+
+   return bytes(record)
+
+
+class TestCompactFormat(unittest.TestCase):
+
+   def test_zigzag(self):
+      for number, expected in ((0, 0), (-1, 1), (1, 2), (-2, 3), (2, 4)):
+         self.assertEqual(ZigZag(number), expected)
+         self.assertEqual(UnZigZag(expected), number)
+
+   def test_roundtrip(self):
+      rng = random.Random(7)
+      moves = [(rng.randint(-20, 20), rng.randint(-20, 20))
+               for _ in range(500)]
+      moves += [(3, -3)] * 40 + [(-70000, 123456), (0, 0)]
+
+      encoded = EncodeMoves(moves)
+      self.assertTrue(all(byte < 0x80 for byte in encoded))
+      self.assertEqual(list(DecodeMoves(encoded)), moves)
+
+   def test_points(self):
+      self.assertEqual(list(DecodeMoves(EncodeMoves([Point(5, -5)]))),
+                       [(5, -5)])
+
+   def test_runs(self):
+      encoded = EncodeMoves([(1, 1)] * 1000)
+      self.assertEqual(len(encoded), 4)
+      self.assertEqual(list(DecodeMoves(encoded)), [(1, 1)] * 1000)
+
+   def test_malformed(self):
+      encoded = EncodeMoves([(1, 2), (300, 4)])
+
+      with self.assertRaises(ValueError):
+         list(DecodeMoves(encoded[:-1]))
+
+      decoded = []
+      with self.assertRaises(ValueError):
+         for move in DecodeMoves(encoded[:-1]):
+            decoded.append(move)
+      self.assertEqual(decoded, [(1, 2)])
+
+      with self.assertRaises(ValueError):
+         list(DecodeMoves(b'\x80'))
+
+   def test_max_run(self):
+      moves = [(1, -1)] * (2 * kMaxRunLength + 5)
+      encoded = EncodeMoves(moves)
+      self.assertEqual(encoded, 2 * Run(1, -1, kMaxRunLength) +
+                       Run(1, -1, 5))
+      self.assertEqual(list(DecodeMoves(encoded)), moves)
+
+      with self.assertRaisesRegex(ValueError, "more than"):
+         list(DecodeMoves(Run(1, -1, kMaxRunLength + 1)))
+
+   def test_chunks(self):
+      encoded = EncodeMoves([(300, -2), (1, 1), (1, 1), (-70000, 5)])
+      expected = list(MovesDecoder().Runs(encoded))
+      self.assertEqual(expected, [((300, -2), 1), ((1, 1), 2),
+                                  ((-70000, 5), 1)])
+
+      for cut in range(len(encoded)):
+         decoder = MovesDecoder()
+         runs = list(decoder.Runs(encoded[:cut]))
+         runs += decoder.Runs(encoded[cut:])
+         decoder.Close()
+         self.assertEqual(runs, expected)
+
+      decoder = MovesDecoder()
+      list(decoder.Runs(encoded[:-1]))
+      with self.assertRaises(ValueError):
+         decoder.Close()
+
+
+class TestCompactMoveCommand(unittest.TestCase):
+
+   def Render(self, compact, binary):
+      moves = [(10, 10)] * 20 + [(-3, 7), (4000, 0), (-6, -1)]
+
+      stream = io.BytesIO()
+      with CommandStreamWriter(stream, binary=binary) as writer:
+         writer.clear()
+         writer.pen(True)
+         if compact:
+            writer.compactMove(moves)
+         else:
+            writer.move(moves)
+         writer.pen(False)
+         writer.compactMove([(-100, -100)])
+
+      size = len(stream.getvalue())
+      stream.seek(0)
+      readerClass = BinaryStreamReader if binary else BufferedHexStreamReader
+      out = io.StringIO()
+      VectorCommandStreamProcessor(
+         readerClass(stream), Sixteen14Codec, Board(Pen(), out),
+         REGISTERED_COMMANDS).run()
+
+      return out.getvalue(), size
+
+   def test_matches_move_command(self):
+      for binary in (False, True):
+         expected, size = self.Render(False, binary)
+         output, compactSize = self.Render(True, binary)
+
+         self.assertEqual(output, expected)
+         self.assertLess(compactSize * 2, size)
+
+   def Draw(self, data, diagnostics=None, maxChunkArgs=None):
+      out = io.StringIO()
+      processor = VectorCommandStreamProcessor(
+         BinaryStreamReader(io.BytesIO(data)), Sixteen14Codec,
+         Board(Pen(), out), REGISTERED_COMMANDS, diagnostics=diagnostics)
+      if maxChunkArgs is not None:
+         processor.kMaxChunkArgs = maxChunkArgs
+
+      processor.run()
+      return out.getvalue()
+
+   def test_long_run(self):
+      # a run of 2**40 moves in 10 bytes is skipped, not expanded
+      data = (b'\xf0\x80\x40\x01\xd0' + EncodeMoves([(1, 2)]) +
+              Run(1, 1, 1 << 40) + EncodeMoves([(3, 4)]))
+      diagnostics = StreamDiagnostics()
+      self.assertEqual(self.Draw(data, diagnostics),
+                       self.Draw(b'\xf0\x80\x40\x01\xd0' +
+                                 EncodeMoves([(1, 2), (3, 4)])))
+      self.assertEqual(diagnostics.Summary(),
+                       ["Skipped compact move run of more than {} moves x1"
+                        .format(kMaxRunLength)])
+
+      with self.assertRaises(MalformedInputError):
+         self.Draw(data, StreamDiagnostics(strict=True))
+
+   def test_chunked(self):
+      # commands executed in chunks draw as they are decoded, with records
+      # cut off between chunks
+      rng = random.Random(3)
+      moves = [(rng.randint(-30, 30), rng.randint(-30, 30))
+               for _ in range(500)]
+      moves[100:100] = [(1, 0)] * 5000 + [(-1, 0)] * 5000
+      for penDown in (b'\x80\x40\x00', b'\x80\x40\x01'):
+         data = b'\xf0' + penDown + b'\xd0' + EncodeMoves(moves)
+         expected = self.Draw(data)
+         self.assertEqual(self.Draw(data, maxChunkArgs=8), expected)
+         self.assertEqual(self.Draw(data, maxChunkArgs=12), expected)
+
+      board = mock.Mock()
+      feed, end = CompactMovePen().StartChunks(board)
+      feed(*EncodeMoves([(1, 1)] * (3 * CompactMovePen.kBatchPoints)))
+      end()
+      self.assertEqual([len(call[0][0]) for call in
+                        board.ContinueMove.call_args_list],
+                       [CompactMovePen.kBatchPoints] * 3)
@@ -0,0 +1,165 @@
+import unittest
+import io
+import os
+import shutil
+import sys
+import tempfile
+
+from unittest.mock import patch
+
+from vectdraw.compiled import CompiledStream, HashFile, LoadSidecar
+from vectdraw.compiled import SidecarPath
+from vectdraw.diagnostics import MalformedInputError
+from vectdraw.process import VectorCommandStreamProcessor
+from vectdraw.draw.board import Board, Pen
+from vectdraw.settings import REGISTERED_COMMANDS
+from vectdraw.hexstreamreader import BufferedHexStreamReader
+from vectdraw.scripts import main
+from vectdraw.streamwriter import CommandStreamWriter
+
+from sixteen14encoding.codec.sixteen14hex import Sixteen14Codec
+
+
+class TestCompiledStream(unittest.TestCase):
+
+   def setUp(self):
+      stream = io.BytesIO()
+      with CommandStreamWriter(stream) as writer:
+         writer.clear()
+         writer.colour(0, 0, 255, 255)
+         writer.move([(0, 0)])
+         writer.pen(True)
+         writer.move([(4000, 0), (4000, -8000), (-4000, -8000)])
+         writer.compactMove([(1, 1), (1, 1), (1, 1)])
+         writer.pen(False)
+
+      self.hex = stream.getvalue().decode('ascii') + "E04000"
+      self.directory = tempfile.mkdtemp()
+      self.path = os.path.join(self.directory, 'drawing.txt')
+
+   def tearDown(self):
+      shutil.rmtree(self.directory)
+
+   def Compile(self):
+      out = io.StringIO()
+      processor = VectorCommandStreamProcessor(
+         BufferedHexStreamReader(io.StringIO(self.hex)), Sixteen14Codec,
+         Board(Pen(), outputStream=out), REGISTERED_COMMANDS)
+
+      # long commands are recorded from several chunks
+      processor.kMaxChunkArgs = 4
+
+      with self.assertLogs(level='WARNING'):
+         compiled = CompiledStream.Compile(processor, bytes(range(32)))
+
+      return compiled, out.getvalue()
+
+   def Replay(self, compiled):
+      out = io.StringIO()
+      compiled.Replay(Board(Pen(), outputStream=out), REGISTERED_COMMANDS)
+      return out.getvalue()
+
+   def test_compile(self):
+      compiled, output = self.Compile()
+
+      # the unrecognized E0 command is dropped
+      self.assertEqual(list(compiled.opcodes),
+                       [0xF0, 0xA0, 0xC0, 0x80, 0xC0, 0xD0, 0x80])
+      self.assertEqual(list(compiled.offsets), [0, 0, 4, 6, 7, 13, 16, 17])
+      self.assertEqual(list(compiled.pool[:4]), [0, 0, 255, 255])
+      self.assertEqual(self.Replay(compiled), output)
+
+   def test_chunked_replay(self):
+      compiled, output = self.Compile()
+      compiled.kReplayChunkArgs = 2
+      self.assertEqual(self.Replay(compiled), output)
+
+   def test_save_load(self):
+      compiled, output = self.Compile()
+      compiled.Save(self.path)
+      loaded = CompiledStream.Load(self.path)
+
+      self.assertFalse(loaded.binary)
+      self.assertEqual(loaded.sourceHash, bytes(range(32)))
+      self.assertEqual(loaded.opcodes, compiled.opcodes)
+      self.assertEqual(loaded.offsets, compiled.offsets)
+      self.assertEqual(loaded.pool, compiled.pool)
+      self.assertEqual(self.Replay(loaded), output)
+      self.assertEqual(os.listdir(self.directory), ['drawing.txt'])
+
+   def test_bad_files(self):
+      with open(self.path, 'wb') as f:
+         f.write(b'not a compiled stream at all, long enough for a header')
+      with self.assertRaises(ValueError):
+         CompiledStream.Load(self.path)
+
+      compiled, output = self.Compile()
+      compiled.Save(self.path)
+      with open(self.path, 'r+b') as f:
+         f.truncate(os.path.getsize(self.path) - 1)
+      with self.assertRaises(ValueError):
+         CompiledStream.Load(self.path)
+
+   def test_load_sidecar(self):
+      with open(self.path, 'w') as f:
+         f.write(self.hex)
+
+      self.assertIsNone(LoadSidecar(self.path, False))
+
+      compiled, output = self.Compile()
+      compiled.sourceHash = HashFile(self.path)
+      compiled.Save(SidecarPath(self.path))
+      self.assertIsNotNone(LoadSidecar(self.path, False))
+
+      # compiled from hex, so not valid for reading the file as binary
+      self.assertIsNone(LoadSidecar(self.path, True))
+
+      with open(self.path, 'a') as f:
+         f.write("F0")
+      self.assertIsNone(LoadSidecar(self.path, False))
+
+   def test_main(self):
+      with open(self.path, 'w') as f:
+         f.write(self.hex)
+
+      outputPath = os.path.join(self.directory, 'out.txt')
+      argv = sys.argv[:1] + ['-f', self.path, '-o', outputPath]
+
+      with patch('sys.argv', new=argv + ['--compile']):
+         with self.assertLogs(level='WARNING'):
+            main()
+      with open(outputPath) as f:
+         expected = f.read()
+
+      self.assertTrue(os.path.exists(SidecarPath(self.path)))
+
+      # the sidecar is replayed: the file isn't read by a stream reader
+      with patch('sys.argv', new=argv):
+         with patch('vectdraw.scripts.RunProcessor') as runProcessor:
+            main()
+      runProcessor.assert_not_called()
+
+      with open(outputPath) as f:
+         self.assertEqual(f.read(), expected)
+
+   def test_main_diagnostics(self):
+      with open(self.path, 'w') as f:
+         f.write(self.hex)
+
+      argv = sys.argv[:1] + ['-f', self.path, '-o', os.devnull]
+      with patch('sys.argv', new=argv + ['--compile']):
+         with self.assertLogs(level='WARNING') as compiling:
+            main()
+
+      # the replay reports the malformed input found when compiling
+      with patch('sys.argv', new=argv):
+         with self.assertLogs(level='WARNING') as replaying:
+            main()
+      self.assertEqual([record.getMessage() for record in replaying.records],
+                       [record.getMessage() for record in compiling.records])
+      self.assertIn("unrecognized command byte E0", replaying.output[0])
+
+      # strict runs parse the stream instead, and stop at the E0 command
+      with patch('sys.argv', new=argv + ['--strict']):
+         with self.assertRaises(MalformedInputError):
+            main()
@@ -0,0 +1,84 @@
+import unittest
+import bz2
+import gzip
+import io
+import lzma
+import os
+import sys
+import tempfile
+
+from unittest.mock import patch
+
+from vectdraw.compression import OpenDecompressedStream, OpenOutputFile
+from vectdraw.compression import IsCompressedStream
+from vectdraw.compression import IncrementalDecompressor, kMagicLength
+from vectdraw.scripts import main
+
+
+class TestCompression(unittest.TestCase):
+
+   def setUp(self):
+      self.data = b"F0A04000417F4000417FC040004000804001C05F205F20804000\n"
+      self.tempdir = tempfile.TemporaryDirectory()
+
+   def tearDown(self):
+      self.tempdir.cleanup()
+
+   def test_detect_by_magic_bytes(self):
+      for module in (gzip, bz2, lzma):
+         stream = io.BufferedReader(io.BytesIO(module.compress(self.data)))
+         decompressed = OpenDecompressedStream(stream)
+
+         self.assertIsNotNone(decompressed, msg=module.__name__)
+         self.assertEqual(decompressed.read(), self.data)
+
+   def test_incremental_members(self):
+      for module in (gzip, bz2, lzma):
+         data = module.compress(self.data[:20]) + module.compress(
+            self.data[20:])
+         for size in (1, 7, len(data)):
+            decompressor = IncrementalDecompressor(data[:kMagicLength])
+            decompressed = b''.join(decompressor.decompress(data[i:i + size])
+                                    for i in range(0, len(data), size))
+            self.assertEqual(decompressed + decompressor.flush(), self.data,
+                             msg=module.__name__)
+
+      self.assertIsNone(IncrementalDecompressor(self.data[:kMagicLength]))
+
+   def test_uncompressed_stream_untouched(self):
+      stream = io.BufferedReader(io.BytesIO(self.data))
+      self.assertIsNone(OpenDecompressedStream(stream))
+      self.assertEqual(stream.read(), self.data)
+
+      text = io.StringIO(self.data.decode())
+      self.assertIsNone(OpenDecompressedStream(text))
+      self.assertEqual(text.read(), self.data.decode())
+
+   def test_output_file(self):
+      for extension, module in (('.gz', gzip), ('.bz2', bz2), ('.xz', lzma)):
+         path = os.path.join(self.tempdir.name, 'out.txt' + extension)
+
+         with OpenOutputFile(path) as f:
+            self.assertTrue(IsCompressedStream(f))
+            f.write("CLR;\n")
+
+         with open(path, 'rb') as f:
+            self.assertEqual(module.decompress(f.read()), b"CLR;\n")
+
+      with OpenOutputFile(os.path.join(self.tempdir.name, 'out.txt')) as f:
+         self.assertFalse(IsCompressedStream(f))
+
+   def test_e2e_compressed_file(self):
+      inputPath = os.path.join(self.tempdir.name, 'line.hex.xz')
+      outputPath = os.path.join(self.tempdir.name, 'line.txt.gz')
+
+      with open(inputPath, 'wb') as f:
+         f.write(lzma.compress(self.data))
+
+      with patch('sys.argv', new=sys.argv[:1] + ['-f', inputPath,
+                                                 '-o', outputPath]):
+         main()
+
+      with gzip.open(outputPath, 'rt') as f:
+         self.assertEqual(f.read(), "CLR;\nCO 0 255 0 255;\nMV (0, 0);\n"
+                                    "PEN DOWN;\nMV (4000, 4000);\nPEN UP;\n")
@@ -0,0 +1,214 @@
+import unittest
+import asyncio
+import bz2
+import gzip
+import io
+import logging
+import os
+import shutil
+import socket
+import tempfile
+import threading
+
+from unittest.mock import patch
+
+from vectdraw.client import ParseClientArgs, Request, UsageError, main
+from vectdraw.daemon import Daemon
+from vectdraw.process import VectorCommandStreamProcessor
+from vectdraw.protocol import DecodeHeader, EncodeHeader, kSocketVariable
+from vectdraw.draw.board import Board, Pen
+from vectdraw.settings import REGISTERED_COMMANDS
+from vectdraw.hexstreamreader import BufferedHexStreamReader
+from vectdraw.streamwriter import CommandStreamWriter
+
+from sixteen14encoding.codec.sixteen14hex import Sixteen14Codec
+
+
+class TestDaemon(unittest.TestCase):
+
+   def setUp(self):
+      stream = io.BytesIO()
+      with CommandStreamWriter(stream) as writer:
+         writer.clear()
+         for i in range(300):
+            writer.pen(i % 3 != 0)
+            writer.colour(i % 256, 2 * i % 256, 3 * i % 256, 255)
+            writer.move([(j * 7 % 900 - 450, 300 - j * 11 % 600)
+                         for j in range(i % 17)])
+
+      self.hex = stream.getvalue()
+
+      out = io.StringIO()
+      VectorCommandStreamProcessor(
+         BufferedHexStreamReader(io.BytesIO(self.hex)), Sixteen14Codec,
+         Board(Pen(), out), REGISTERED_COMMANDS).run()
+      self.expected = out.getvalue().encode('ascii')
+
+      self.directory = tempfile.mkdtemp()
+      self.path = os.path.join(self.directory, 'vectdraw.sock')
+      self.daemon = Daemon(self.path, Sixteen14Codec, REGISTERED_COMMANDS)
+
+      ready = threading.Event()
+      self.loop = asyncio.new_event_loop()
+
+      def Serve():
+         asyncio.set_event_loop(self.loop)
+         self.loop.call_soon(ready.set)
+         self.loop.run_until_complete(self.daemon.Serve())
+         self.loop.close()
+
+      self.thread = threading.Thread(target=Serve, daemon=True)
+      self.thread.start()
+      ready.wait()
+      while not os.path.exists(self.path):
+         self.thread.join(0.01)
+
+   def tearDown(self):
+      self.loop.call_soon_threadsafe(self.daemon.Close)
+      self.thread.join()
+      shutil.rmtree(self.directory)
+
+   def Request(self, data, **options):
+      sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+      sock.connect(self.path)
+      output = io.BytesIO()
+      errors = io.StringIO()
+      status = Request(sock, io.BytesIO(data), output, options, errors)
+      return status, output.getvalue(), errors.getvalue()
+
+   def test_request(self):
+      self.assertEqual(self.Request(self.hex), (0, self.expected, ''))
+      self.assertEqual(
+         self.Request(bytes.fromhex(self.hex.decode()), binary=True),
+         (0, self.expected, ''))
+      self.assertEqual(self.Request(gzip.compress(self.hex)),
+                       (0, self.expected, ''))
+
+   def test_multi_member_request(self):
+      # concatenated members, cut inside a command, as written by
+      # appending to a compressed file
+      half = len(self.hex) // 2 + 1
+      for module in (gzip, bz2):
+         data = (module.compress(self.hex[:half]) +
+                 module.compress(self.hex[half:]))
+         self.assertEqual(self.Request(data), (0, self.expected, ''),
+                          msg=module.__name__)
+
+   def test_warnings(self):
+      status, output, errors = self.Request(self.hex[:2] + b"E0" +
+                                            self.hex[2:])
+      self.assertEqual(status, 0)
+      self.assertEqual(output, self.expected)
+      self.assertEqual(errors, "Received unrecognized command byte E0 x1 "
+                               "at offset 1\n")
+
+   def test_module_warnings(self):
+      # warnings of the command and reader modules are sent to the client,
+      # not logged by the daemon
+      loggers = [logging.getLogger(name) for name in
+                 ('vectdraw.commands.default', 'vectdraw.hexstreamreader')]
+      with patch.object(loggers[0], 'callHandlers') as commands:
+         with patch.object(loggers[1], 'callHandlers') as reader:
+            status, output, errors = self.Request(
+               self.hex + b"C0400040004000" + b"8")
+
+      self.assertEqual(status, 0)
+      self.assertTrue(output.startswith(self.expected))
+      self.assertEqual(errors.splitlines(), [
+         "Discarded dangling half byte '8' at the end of the input",
+         "Bytes passed to MovePen are of odd length: (0, 0, 0)"])
+      commands.assert_not_called()
+      reader.assert_not_called()
+
+   def test_error(self):
+      status, output, errors = self.Request(
+         self.hex[:1000] + b"zz" + self.hex[1000:], strict=True)
+      self.assertEqual(status, 1)
+      self.assertTrue(self.expected.startswith(output))
+      self.assertIn("MalformedInputError", errors)
+
+   def test_concurrent_requests(self):
+      results = [None] * 8
+
+      def Run(index):
+         results[index] = self.Request(self.hex)
+
+      threads = [threading.Thread(target=Run, args=(i,)) for i in range(8)]
+      for thread in threads:
+         thread.start()
+      for thread in threads:
+         thread.join()
+
+      self.assertEqual(results, [(0, self.expected, '')] * 8)
+
+   def test_client(self):
+      inputPath = os.path.join(self.directory, 'in.txt')
+      outputPath = os.path.join(self.directory, 'out.txt.gz')
+      with open(inputPath, 'wb') as f:
+         f.write(self.hex)
+
+      argv = ['vectdraw-client', '-f', inputPath, '-o', outputPath]
+      with patch.dict(os.environ, {kSocketVariable: self.path}):
+         with patch('sys.argv', new=argv):
+            with self.assertRaises(SystemExit) as exit:
+               main()
+
+      self.assertEqual(exit.exception.code, 0)
+      with gzip.open(outputPath) as f:
+         self.assertEqual(f.read(), self.expected)
+
+   def test_stale_socket(self):
+      with self.assertRaises(OSError):
+         asyncio.run(Daemon(self.path, Sixteen14Codec, []).Serve())
+
+      stale = os.path.join(self.directory, 'stale.sock')
+      sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+      sock.bind(stale)
+      sock.close()
+
+      daemon = Daemon(stale, Sixteen14Codec, [])
+
+      async def Serve():
+         asyncio.get_running_loop().call_later(0.05, daemon.Close)
+         await daemon.Serve()
+
+      asyncio.run(Serve())
+      self.assertFalse(os.path.exists(stale))
+
+
+class TestClient(unittest.TestCase):
+
+   def test_arguments(self):
+      args = ParseClientArgs(['-f', 'in.txt', '--binary', '--socket=s'])
+      self.assertEqual(args["f"], "in.txt")
+      self.assertEqual(args["o"], "-")
+      self.assertTrue(args["binary"])
+      self.assertFalse(args["strict"])
+      self.assertEqual(args["socket"], "s")
+
+      for argv in (['--engine', 'vectorized'], ['--socket']):
+         with self.assertRaises(UsageError):
+            ParseClientArgs(argv)
+
+   def test_header(self):
+      options = DecodeHeader(EncodeHeader({"strict": 1}))
+      self.assertEqual(options, {"binary": False, "strict": True})
+      with self.assertRaises(ValueError):
+         DecodeHeader(b'F0A0\n')
+
+   def test_local_fallback(self):
+      output = 'test_output.txt'
+      self.addCleanup(os.remove, output)
+
+      argv = ['vectdraw-client', '--socket', 'no-such.sock',
+              '-f', os.path.join('tests', 'box.txt'), '-o', output]
+      with patch('sys.argv', new=argv):
+         with patch('sys.stderr', new_callable=io.StringIO):
+            main()
+
+      with open(output) as f:
+         self.assertTrue(f.read().startswith("CLR;\n"))
+
+
+if __name__ == '__main__':
+   unittest.main()
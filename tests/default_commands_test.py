@@ -34,4 +34,48 @@ class TestMovePenCommand(unittest.TestCase):
 
          mock_warning.assert_called_once_with(
             "Bytes passed to {} are of odd length: {}"
-               .format(MovePen.__name__, tuple(self.params_odd)))
\ No newline at end of file
+               .format(MovePen.__name__, tuple(self.params_odd)))
+
+
+class TestCompactMovePenCommand(unittest.TestCase):
+
+   def test_PrepareParameters(self):
+      from vectdraw.compact import EncodeMoves
+
+      params = EncodeMoves([(255, 255), (255, 255), (88, -97)])
+      self.assertListEqual(
+         CompactMovePen().PrepareParameters(*params),
+         [[Point(255, 255), Point(255, 255), Point(88, -97)]])
+
+   def test_malformed_PrepareParameters(self):
+      from vectdraw.compact import EncodeMoves
+
+      params = EncodeMoves([(1, 2), (300, 4)])[:-1]
+
+      logger = logging.getLogger('vectdraw.commands.default')
+      with mock.patch.object(logger, 'warning') as mock_warning:
+         self.assertListEqual(
+            CompactMovePen().PrepareParameters(*params), [[Point(1, 2)]])
+
+         mock_warning.assert_called_once()
+
+
+
+class TestBindCommand(unittest.TestCase):
+
+   def setUp(self):
+      self.board = mock.Mock()
+
+   def test_bind_to_board_method(self):
+      # nothing to prepare: the board method itself is the bound callable
+      self.assertIs(ClearCommand().Bind(self.board), self.board.clear)
+      self.assertIs(PenUpDownCommand().Bind(self.board),
+                    self.board.ChangePenPosition)
+      self.assertIs(SetColourCommand().Bind(self.board),
+                    self.board.SetColour)
+
+   def test_bind_prepares_parameters(self):
+      execute = MovePen().Bind(self.board)
+      execute(0, 0, 4000, 4000)
+      self.board.MovePen.assert_called_once_with(
+         [Point(0, 0), Point(4000, 4000)])
@@ -0,0 +1,67 @@
+import unittest
+import json
+
+from unittest import mock
+
+from vectdraw.diagnostics import MalformedInputError, StreamDiagnostics
+
+
+class TestStreamDiagnostics(unittest.TestCase):
+
+   def setUp(self):
+      self.diagnostics = StreamDiagnostics(maxOffsets=2)
+
+   def test_counts(self):
+      for offset in (4, 9, 12):
+         self.diagnostics.Add(StreamDiagnostics.kUnrecognizedCommand, 0x90,
+                              offset)
+      self.diagnostics.Add(StreamDiagnostics.kOddArgument, 0x67, 20)
+      self.diagnostics.Add(StreamDiagnostics.kOddArgument, 0x68)
+
+      self.assertEqual(len(self.diagnostics), 5)
+      self.assertEqual(self.diagnostics.Summary(), [
+         "Received unrecognized command byte 90 x3 at offsets 4, 9, ...",
+         "Discarded odd trailing argument byte 67 x1 at offset 20",
+         "Discarded odd trailing argument byte 68 x1"])
+
+   def test_strict(self):
+      diagnostics = StreamDiagnostics(strict=True)
+      with self.assertRaisesRegex(
+            MalformedInputError,
+            "Received unrecognized command byte 90 at offset 4"):
+         diagnostics.Add(StreamDiagnostics.kUnrecognizedCommand, 0x90, 4)
+
+   def test_merge(self):
+      self.diagnostics.Add(StreamDiagnostics.kUnrecognizedCommand, 0x90, 4)
+      later = StreamDiagnostics(maxOffsets=2, baseOffset=100)
+      for offset in (1, 2):
+         later.Add(StreamDiagnostics.kUnrecognizedCommand, 0x90, offset)
+      later.Add(StreamDiagnostics.kOddArgument, 0x67, 3)
+      later.skippedCharacters = 2
+
+      self.diagnostics.Merge(later)
+      self.assertEqual(self.diagnostics.Summary(), [
+         "Received unrecognized command byte 90 x3 at offsets 4, 101, ...",
+         "Discarded odd trailing argument byte 67 x1 at offset 103",
+         "Skipped 2 characters of malformed hex input"])
+
+   def test_state(self):
+      self.diagnostics.Add(StreamDiagnostics.kUnrecognizedCommand, 0x90, 4)
+      self.diagnostics.Add(StreamDiagnostics.kInvalidHex, 'x')
+      self.diagnostics.skippedCharacters = 3
+
+      restored = StreamDiagnostics()
+      restored.SetState(json.loads(json.dumps(self.diagnostics.GetState())))
+      self.assertEqual(len(restored), 2)
+      self.assertEqual(restored.Summary(), self.diagnostics.Summary())
+
+   def test_report(self):
+      self.diagnostics.skippedCharacters = 6
+      logger = mock.Mock()
+      self.diagnostics.Report(logger)
+      logger.warning.assert_called_once_with(
+         "Skipped 6 characters of malformed hex input")
+
+   def test_empty(self):
+      self.assertEqual(len(self.diagnostics), 0)
+      self.assertEqual(self.diagnostics.Summary(), [])
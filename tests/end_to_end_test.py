@@ -3,8 +3,9 @@ import os
 import sys
 
 from unittest.mock import patch
-from io import StringIO
+from io import StringIO, BytesIO, TextIOWrapper
 
+from vectdraw.diagnostics import MalformedInputError
 from vectdraw.scripts import main
 
 
@@ -122,3 +123,116 @@ class TestEndToEndSTDIOSquareExample(unittest.TestCase):
             self.assertEqual(
                self.expected_output, actual_output,
                msg='{}\n!= \n{}'.format(self.expected_output, actual_output))
+
+
+class TestEndToEndSTDIOBinary(unittest.TestCase):
+
+   def setUp(self):
+      self.mock_stdin = TextIOWrapper(BytesIO(bytes.fromhex(
+         "F0A04000417F4000417FC040004000804001C05F205F20804000")))
+
+      self.expected_output = ("CLR;\nCO 0 255 0 255;\nMV (0, 0);\n"
+                              "PEN DOWN;\nMV (4000, 4000);\nPEN UP;\n")
+
+   @patch('sys.argv', new=sys.argv[:1] + ['--binary'])
+   def test_e2e_binary_stdio(self):
+      with patch('sys.stdin', new=self.mock_stdin):
+         with patch('sys.stdout', new_callable=StringIO) as mock_stdout:
+
+            main()
+            self.assertEqual(self.expected_output, mock_stdout.getvalue())
+
+
+
+class TestEndToEndSTDIOMalformed(unittest.TestCase):
+
+   def setUp(self):
+      # an invalid hex character after the arguments of the first move
+      self.input = ("F0A04000417F4000417F"
+                    "C040004000z0804001C05F205F20804000")
+
+      self.expected_output = ("CLR;\nCO 0 255 0 255;\nMV (0, 0);\n"
+                              "PEN DOWN;\nMV (4000, 4000);\nPEN UP;\n")
+
+   @patch('sys.argv', new=sys.argv[:1])
+   def test_e2e_malformed_stdio(self):
+      with patch('sys.stdin', new=StringIO(self.input)):
+         with patch('sys.stdout', new_callable=StringIO) as mock_stdout:
+            with self.assertLogs(level='WARNING') as logs:
+
+               main()
+               self.assertEqual(self.expected_output, mock_stdout.getvalue())
+
+      self.assertIn("invalid hex character 'z' x1 at offset 30",
+                    "\n".join(logs.output))
+
+   @patch('sys.argv', new=sys.argv[:1] + ['--strict'])
+   def test_e2e_strict_stdio(self):
+      with patch('sys.stdin', new=StringIO(self.input)):
+         with patch('sys.stdout', new_callable=StringIO):
+            with self.assertRaises(MalformedInputError):
+               main()
+
+
+class TestEndToEndCheckpoint(unittest.TestCase):
+
+   def setUp(self):
+      self.output_target = 'test_output.txt'
+      self.checkpoint = 'test_checkpoint.json'
+      self.mock_argv = ['-f', os.path.join('tests', 'box.txt'),
+                        '-o', self.output_target,
+                        '--checkpoint', self.checkpoint]
+
+   def tearDown(self):
+      for path in (self.output_target, self.checkpoint):
+         if os.path.exists(path):
+            os.remove(path)
+
+   def test_e2e_checkpoint_resume(self):
+      with patch('sys.argv', new=sys.argv[:1] + self.mock_argv):
+         main()
+
+      with open(self.output_target) as f:
+         expected = f.read()
+
+      # output written after the checkpoint is discarded on resume
+      with open(self.output_target, 'a') as f:
+         f.write("MV (1, 1);\n")
+
+      with patch('sys.argv', new=sys.argv[:1] + self.mock_argv +
+                 ['--resume']):
+         main()
+
+      with open(self.output_target) as f:
+         self.assertEqual(expected, f.read())
+
+   def test_e2e_resume_without_checkpoint(self):
+      with patch('sys.argv', new=sys.argv[:1] + self.mock_argv):
+         main()
+
+      with open(self.output_target) as f:
+         expected = f.read()
+
+      # the run was interrupted before its first checkpoint
+      os.remove(self.checkpoint)
+      with open(self.output_target, 'a') as f:
+         f.write("MV (1, 1);\n")
+
+      with patch('sys.argv', new=sys.argv[:1] + self.mock_argv +
+                 ['--resume']):
+         main()
+
+      with open(self.output_target) as f:
+         self.assertEqual(expected, f.read())
+      self.assertTrue(os.path.exists(self.checkpoint))
+
+   def test_e2e_resume_bad_checkpoint(self):
+      with open(self.output_target, 'w') as f:
+         f.write("CLR;\n")
+      with open(self.checkpoint, 'w') as f:
+         f.write("{")
+
+      with patch('sys.argv', new=sys.argv[:1] + self.mock_argv +
+                 ['--resume']):
+         with self.assertRaisesRegex(SystemExit, "malformed checkpoint"):
+            main()
@@ -0,0 +1,168 @@
+import unittest
+import io
+import os
+import tempfile
+import threading
+import time
+
+try:
+   import numpy
+except ImportError:
+   numpy = None
+
+from vectdraw.follow import FollowedStream
+from vectdraw.process import VectorCommandStreamProcessor
+from vectdraw.vectorprocess import VectorizedCommandStreamProcessor
+from vectdraw.draw.board import Board, Pen
+from vectdraw.settings import REGISTERED_COMMANDS
+from vectdraw.hexstreamreader import BufferedHexStreamReader
+from vectdraw.hexstreamreader import BinaryStreamReader
+from vectdraw.streamwriter import CommandStreamWriter
+
+from sixteen14encoding.codec.sixteen14hex import Sixteen14Codec
+
+
+class TestFollowedStream(unittest.TestCase):
+
+   def setUp(self):
+      descriptor, self.path = tempfile.mkstemp()
+      os.close(descriptor)
+      self.addCleanup(os.remove, self.path)
+
+      stream = io.BytesIO()
+      with CommandStreamWriter(stream) as writer:
+         writer.clear()
+         writer.colour(0, 255, 0, 255)
+         writer.pen(True)
+         for i in range(20):
+            writer.move([(i, -i), (-i, i)])
+            writer.pen(i % 3 != 0)
+      self.hex = stream.getvalue()
+
+   def Append(self, data):
+      with open(self.path, 'ab') as f:
+         f.write(data)
+
+   def Open(self, mode='r'):
+      f = open(self.path, mode)
+      self.addCleanup(f.close)
+      return f
+
+   def test_read(self):
+      self.Append(b'abc')
+      stream = FollowedStream(self.Open('rb'), poll=0.01, timeout=0.1)
+      self.assertEqual(stream.read(2), b'ab')
+      self.assertEqual(stream.read(), b'c')
+
+      threading.Timer(0.03, self.Append, (b'de',)).start()
+      self.assertEqual(stream.read(), b'de')
+      self.assertEqual(stream.read(), b'')
+      self.assertEqual(stream.offset, 5)
+
+      stream.close()
+      self.Append(b'f')
+      self.assertEqual(stream.read(), b'')
+
+   def test_truncated(self):
+      self.Append(b'abc')
+      stream = FollowedStream(self.Open(), poll=0.01, timeout=0.1)
+      self.assertEqual(stream.read(), b'abc')
+
+      os.truncate(self.path, 1)
+      with self.assertRaises(OSError):
+         stream.read()
+
+   def Follow(self, binary, parts, eager=False,
+              processorClass=VectorCommandStreamProcessor):
+      """
+      draws the file while parts are appended to it, one per poll
+      :param eager: executes complete commands at the end of the file, see
+                    VectorCommandStreamProcessor.eagerCommands
+      :return: tuple of the outputs after each part, and the final output
+      """
+      if binary:
+         parts = [bytes.fromhex(part.decode('ascii')) for part in parts]
+         reader = BinaryStreamReader(
+            FollowedStream(self.Open('rb'), poll=0.01, timeout=0.3),
+            blockSize=7)
+      else:
+         reader = BufferedHexStreamReader(
+            FollowedStream(self.Open(), poll=0.01, timeout=0.3),
+            blockSize=7)
+
+      output = io.StringIO()
+      processor = processorClass(
+         reader, Sixteen14Codec, Board(Pen(), output), REGISTERED_COMMANDS)
+      processor.eagerCommands = eager
+      runner = threading.Thread(target=processor.run)
+      runner.start()
+
+      outputs = []
+      for part in parts:
+         self.Append(part)
+         time.sleep(0.1)
+         outputs.append(output.getvalue())
+
+      runner.join()
+      return outputs, output.getvalue()
+
+   def Draw(self, data):
+      output = io.StringIO()
+      VectorCommandStreamProcessor(
+         BufferedHexStreamReader(io.BytesIO(data)), Sixteen14Codec,
+         Board(Pen(), output), REGISTERED_COMMANDS).run()
+      return output.getvalue()
+
+   def test_growing_file(self):
+      # parts split inside commands and, for hex, inside bytes
+      cuts = [0, 21, 60, 61, 150, len(self.hex)]
+      parts = [self.hex[start:end] for start, end in zip(cuts, cuts[1:])]
+      for binary in (False, True):
+         if binary:
+            cuts = [cut & ~1 for cut in cuts]
+            parts = [self.hex[start:end]
+                     for start, end in zip(cuts, cuts[1:])]
+
+         os.truncate(self.path, 0)
+         outputs, final = self.Follow(binary, parts)
+         self.assertEqual(final, self.Draw(self.hex))
+
+         # each part draws the commands followed by the next command
+         self.assertEqual(outputs[0], "CLR;\n")
+         for part, output in zip(cuts[2:], outputs[1:]):
+            data = bytes.fromhex(self.hex[:part & ~1].decode('ascii'))
+            last = max(index for index, value in enumerate(data)
+                       if value & 0x80)
+            self.assertEqual(output, self.Draw(self.hex[:2 * last]))
+
+   def test_eager_commands(self):
+      # complete commands taking a fixed number of arguments are drawn
+      # before the next command is appended; a move waits for it, and
+      # argument bytes following a complete command are skipped
+      parts = [b"F0804001", b"A0417F4000", b"4000417F", b"C040014001",
+               b"804000", b"4001"]
+      expected = ["CLR;\nPEN DOWN;\n",
+                  "CLR;\nPEN DOWN;\n",
+                  "CLR;\nPEN DOWN;\nCO 255 0 0 255;\n",
+                  "CLR;\nPEN DOWN;\nCO 255 0 0 255;\n",
+                  "CLR;\nPEN DOWN;\nCO 255 0 0 255;\nMV (1, 1);\n"
+                  "PEN UP;\n"]
+      expected.append(expected[-1])
+
+      processorClasses = [VectorCommandStreamProcessor]
+      if numpy is not None:
+         processorClasses.append(VectorizedCommandStreamProcessor)
+
+      for processorClass in processorClasses:
+         for binary in (False, True):
+            os.truncate(self.path, 0)
+            outputs, final = self.Follow(binary, parts, eager=True,
+                                         processorClass=processorClass)
+            self.assertEqual(outputs, expected,
+                             msg="{}, binary {}".format(
+                                processorClass.__name__, binary))
+            self.assertEqual(final, expected[-1])
+
+
+if __name__ == '__main__':
+   unittest.main()
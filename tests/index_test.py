@@ -0,0 +1,190 @@
+import unittest
+import io
+import logging
+import os
+import shutil
+import sys
+import tempfile
+
+from unittest.mock import patch
+
+try:
+   import numpy
+except ImportError:
+   numpy = None
+
+from vectdraw.index import BlockWindow, CommandIndex, LoadIndex, NullStream
+from vectdraw.index import RunRange, SidecarPath
+from vectdraw.process import VectorCommandStreamProcessor
+from vectdraw.vectorprocess import VectorizedCommandStreamProcessor
+from vectdraw.draw.board import Board, Pen
+from vectdraw.settings import REGISTERED_COMMANDS
+from vectdraw.hexstreamreader import BufferedHexStreamReader
+from vectdraw.hexstreamreader import BinaryStreamReader
+from vectdraw.scripts import main
+from vectdraw.streamwriter import CommandStreamWriter
+
+from sixteen14encoding.codec.sixteen14hex import Sixteen14Codec
+
+
+class TestCommandIndex(unittest.TestCase):
+
+   def setUp(self):
+      stream = io.BytesIO()
+      with CommandStreamWriter(stream) as writer:
+         writer.clear()
+         writer.move([(0, 0)])
+         for i in range(12):
+            writer.pen(i % 3 != 0)
+            writer.colour(i, 2 * i, 3 * i, 255)
+            writer.move([(j * 7 % 900 - 450, 300 - j * 11 % 600)
+                         for j in range(i * 5)])
+            writer.compactMove([(1, 1), (-5, 2)])
+            writer.move([(10, 8000 if i % 2 else -8000)])
+
+      data = stream.getvalue().decode('ascii')
+
+      # an unrecognized command, and lines of odd length
+      data = data[:2] + "E04000" + data[2:]
+      self.hex = '\n'.join(data[i:i + 77] for i in range(0, len(data), 77))
+      self.binary = bytes.fromhex(data)
+      self.count = 2 + 12 * 5
+
+      self.directory = tempfile.mkdtemp()
+      self.path = os.path.join(self.directory, 'stream.txt')
+
+      # the unrecognized command is reported by every run
+      logging.disable(logging.WARNING)
+      self.addCleanup(logging.disable, logging.NOTSET)
+
+   def tearDown(self):
+      shutil.rmtree(self.directory)
+
+   def Processor(self, binary, out, blockSize=64,
+                 processorClass=VectorCommandStreamProcessor):
+      readerClass = BinaryStreamReader if binary else BufferedHexStreamReader
+      data = self.binary if binary else self.hex
+      stream = io.BytesIO(data) if binary else io.StringIO(data)
+      processor = processorClass(
+         readerClass(stream, blockSize=blockSize), Sixteen14Codec,
+         Board(Pen(), outputStream=out), REGISTERED_COMMANDS)
+      return processor
+
+   def Build(self, binary=False, every=7):
+      with open(self.path, 'wb' if binary else 'w') as f:
+         f.write(self.binary if binary else self.hex)
+
+      return CommandIndex.Build(
+         self.Processor(binary, NullStream()), SidecarPath(self.path),
+         every, source=self.path)
+
+   def Reference(self, binary, start, end):
+      """
+      output of commands start to end of the whole stream
+      """
+      out = io.StringIO()
+      processor = self.Processor(binary, NullStream())
+      board = processor.vectorBoard
+      for number, (commandByte, args, partial) in enumerate(
+            processor.Records(processor.streamreader.ReadBlocks())):
+         board.outputStream = out if start <= number < end else NullStream()
+         processor.Dispatch(commandByte, args, partial)
+
+      return out.getvalue()
+
+   def test_build(self):
+      index = self.Build()
+      self.assertEqual(len(index), self.count)
+      self.assertEqual(index.every, 7)
+      self.assertEqual(len(index.keyframes), (self.count + 6) // 7)
+      self.assertEqual(index.Offset(0), 0)
+      self.assertEqual(index.Offset(1), 4)  # after the unrecognized command
+      self.assertEqual(index.Offset(self.count), len(self.binary))
+
+      loaded = CommandIndex.Load(SidecarPath(self.path))
+      self.assertEqual(len(loaded), self.count)
+      self.assertEqual(loaded.keyframes, index.keyframes)
+
+      with self.assertRaises(IndexError):
+         index.Offset(self.count + 1)
+
+   def test_keyframe(self):
+      index = self.Build()
+      self.assertEqual(index.Keyframe(0)["command"], 0)
+      self.assertEqual(index.Keyframe(13)["command"], 7)
+      self.assertEqual(index.Keyframe(14)["command"], 14)
+
+   def Compare(self, binary, processorClass=VectorCommandStreamProcessor):
+      index = self.Build(binary)
+      for start, end in ((0, self.count), (0, 1), (3, 12), (13, 14),
+                         (14, 30), (40, self.count), (20, 20),
+                         (self.count, self.count + 5)):
+         for blockSize in (16, 101):
+            out = io.StringIO()
+            RunRange(self.Processor(binary, out, blockSize, processorClass),
+                     index, start, end)
+            self.assertEqual(out.getvalue(),
+                             self.Reference(binary, start, end))
+
+   def test_range(self):
+      self.Compare(False)
+
+   def test_binary_range(self):
+      self.Compare(True)
+
+   @unittest.skipIf(numpy is None, "numpy is not installed")
+   def test_vectorized_range(self):
+      self.Compare(False, VectorizedCommandStreamProcessor)
+
+   def test_load_index(self):
+      self.Build()
+      self.assertIsNotNone(LoadIndex(self.path, False))
+      self.assertIsNone(LoadIndex(self.path, True))
+
+      stat = os.stat(self.path)
+      os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+      self.assertIsNone(LoadIndex(self.path, False))
+
+      with open(SidecarPath(self.path), 'wb') as f:
+         f.write(b'VDI0' + bytes(64))
+      self.assertIsNone(LoadIndex(self.path, False))
+
+   def test_main(self):
+      with open(self.path, 'w') as f:
+         f.write(self.hex)
+
+      argv = sys.argv[:1] + ['index', '-f', self.path, '--every', '5']
+      with patch('sys.argv', new=argv):
+         main()
+      self.assertEqual(LoadIndex(self.path, False).every, 5)
+
+      argv = sys.argv[:1] + ['-f', self.path, '--range', '11:23']
+      with patch('sys.argv', new=argv):
+         with patch('sys.stdout', new_callable=io.StringIO) as mock_stdout:
+            main()
+
+      self.assertEqual(mock_stdout.getvalue(), self.Reference(False, 11, 23))
+
+   def test_main_builds_index(self):
+      with open(self.path, 'w') as f:
+         f.write(self.hex)
+
+      argv = sys.argv[:1] + ['-f', self.path, '--range', '50:']
+      with patch('sys.argv', new=argv):
+         with patch('sys.stdout', new_callable=io.StringIO) as mock_stdout:
+            main()
+
+      self.assertEqual(mock_stdout.getvalue(),
+                       self.Reference(False, 50, self.count))
+      self.assertIsNotNone(LoadIndex(self.path, False))
+
+
+class TestBlockWindow(unittest.TestCase):
+
+   def test_take(self):
+      window = BlockWindow([b'abc', b'defg', b'hi'], 10)
+      self.assertEqual(list(window.Take(11)), [b'a'])
+      self.assertEqual(list(window.Take(11)), [])
+      self.assertEqual(list(window.Take(15)), [b'bc', b'de'])
+      self.assertEqual(list(window.Take(100)), [b'fg', b'hi'])
+      window.Close()
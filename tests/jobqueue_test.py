@@ -0,0 +1,190 @@
+import unittest
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from vectdraw.jobqueue import JobQueue, Work, kDone, kFailed, kQueued
+from vectdraw.streamwriter import CommandStreamWriter
+
+
+class TestJobQueue(unittest.TestCase):
+
+   def setUp(self):
+      self.directory = tempfile.TemporaryDirectory()
+      self.addCleanup(self.directory.cleanup)
+      self.path = self.Path("queue.db")
+
+   def Path(self, name):
+      return os.path.join(self.directory.name, name)
+
+   def Queue(self, lease=JobQueue.kDefaultLease):
+      queue = JobQueue(self.path, lease)
+      self.addCleanup(queue.Close)
+      return queue
+
+   def Submit(self, count, maxAttempts=JobQueue.kDefaultAttempts):
+      return self.Queue().Submit(
+         [(['-f', 'in{}'.format(i)], 'in{}'.format(i), 'out{}'.format(i))
+          for i in range(count)], maxAttempts)
+
+   def test_claim(self):
+      ids = self.Submit(3)
+      first, second = self.Queue(), self.Queue()
+
+      job = first.Claim('a')
+      self.assertEqual((job.id, job.argv, job.input, job.output),
+                       (ids[0], ['-f', 'in0'], 'in0', 'out0'))
+      self.assertEqual(second.Claim('b').id, ids[1])
+      self.assertEqual(first.Claim('a').id, ids[2])
+      self.assertIsNone(second.Claim('b'))
+
+      self.assertTrue(first.Finish(job))
+      self.assertFalse(second.Finish(job))
+      self.assertEqual(first.Counts(),
+                       {'queued': 0, 'running': 2, 'done': 1, 'failed': 0})
+
+   def test_concurrent_claims(self):
+      ids = self.Submit(60)
+      claimed = []
+
+      def Claimer(name):
+         queue = JobQueue(self.path)
+         try:
+            for job in iter(lambda: queue.Claim(name), None):
+               claimed.append(job.id)
+         finally:
+            queue.Close()
+
+      claimers = [threading.Thread(target=Claimer, args=(str(i),))
+                  for i in range(4)]
+      for claimer in claimers:
+         claimer.start()
+      for claimer in claimers:
+         claimer.join()
+
+      self.assertEqual(sorted(claimed), ids)
+
+   def test_expired_lease(self):
+      jobId, = self.Submit(1)
+      dead, alive = self.Queue(lease=0.1), self.Queue(lease=0.1)
+
+      lost = dead.Claim('dead')
+      self.assertIsNone(alive.Claim('alive'))
+      time.sleep(0.2)
+
+      job = alive.Claim('alive')
+      self.assertEqual((job.id, job.attempts), (jobId, 2))
+      self.assertFalse(dead.Heartbeat(lost))
+      self.assertFalse(dead.Finish(lost))
+      self.assertTrue(alive.Finish(job, "ValueError: bad"))
+      self.assertEqual(alive.Jobs(kFailed),
+                       [(jobId, kFailed, 2, 'alive', 'in0', 'out0',
+                         "ValueError: bad")])
+
+   def test_attempts(self):
+      jobId, = self.Submit(1, maxAttempts=1)
+      queue = self.Queue(lease=0.05)
+      queue.Claim('dead')
+      time.sleep(0.1)
+
+      self.assertIsNone(queue.Claim('alive'))
+      self.assertEqual(queue.Jobs(), [(jobId, kFailed, 1, None, 'in0', 'out0',
+                                       "lease expired after 1 attempts")])
+
+   def test_heartbeat(self):
+      self.Submit(1)
+      worker, other = self.Queue(lease=0.2), self.Queue(lease=0.2)
+      job = worker.Claim('worker')
+      for _ in range(4):
+         time.sleep(0.1)
+         self.assertTrue(worker.Heartbeat(job))
+         self.assertIsNone(other.Claim('other'))
+
+   def test_work(self):
+      ids = self.Submit(4)
+      queue = self.Queue(lease=0.3)
+
+      # a job claimed by a worker that died, run again once its lease
+      # expires
+      queue.Claim('dead')
+
+      ran = []
+
+      def Run(argv):
+         ran.append(argv[1])
+         if argv[1] == 'in2':
+            raise ValueError("bad input")
+         if argv[1] == 'in3':
+            raise SystemExit(0)
+
+      with self.assertLogs('vectdraw.jobqueue', 'ERROR'):
+         self.assertEqual(Work(queue, Run, 'alive', poll=0.05), (3, 1))
+
+      self.assertEqual(ran, ['in1', 'in2', 'in3', 'in0'])
+      self.assertEqual([(jobId, state) for jobId, state, *_ in queue.Jobs()],
+                       [(ids[0], kDone), (ids[1], kDone), (ids[2], kFailed),
+                        (ids[3], kDone)])
+
+   def test_lost_lease(self):
+      output = self.Path("out.txt")
+      jobId, = self.Queue().Submit([(['-f', 'in', '-o', output], 'in',
+                                     output)])
+      queue, other = self.Queue(lease=0.2), self.Queue(lease=0.2)
+
+      def Run(argv):
+         # the lease expires while the job runs, and another worker
+         # finishes the job
+         queue.connection.execute("UPDATE jobs SET leaseExpires = 0")
+         job = other.Claim('other')
+         with open(job.output, 'w') as f:
+            f.write("other")
+         other.Finish(job)
+
+         with open(argv[3], 'w') as f:
+            f.write("lost")
+
+      with self.assertLogs('vectdraw.jobqueue', 'WARNING'):
+         self.assertEqual(Work(queue, Run, 'lost', poll=0.05), (0, 0))
+
+      with open(output) as f:
+         self.assertEqual(f.read(), "other")
+      self.assertEqual(sorted(os.listdir(self.directory.name)),
+                       ["out.txt", "queue.db"])
+      self.assertEqual(queue.Jobs()[0][:4], (jobId, kDone, 2, 'other'))
+
+   def test_workers(self):
+      for page in range(6):
+         with open(self.Path("page{}.txt".format(page)), 'wb') as f:
+            with CommandStreamWriter(f) as writer:
+               writer.clear()
+               writer.colour(page, 0, 255, 255)
+
+      vectdraw = [sys.executable, '-c', 'import sys; '
+                  'from vectdraw.scripts import main; sys.exit(main())',
+                  'queue']
+      environment = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+
+      subprocess.run(vectdraw + ['submit', self.Path("page*.txt"),
+                                 '--output', self.Path("out/{name}.out"),
+                                 '--db', self.path],
+                     env=environment, check=True, stdout=subprocess.DEVNULL)
+      self.assertEqual(self.Queue().Counts()[kQueued], 6)
+
+      workers = [subprocess.Popen(vectdraw + ['work', '--db', self.path],
+                                  env=environment, stdout=subprocess.DEVNULL)
+                 for _ in range(3)]
+      for worker in workers:
+         self.assertEqual(worker.wait(), 0)
+
+      self.assertEqual(self.Queue().Counts()[kDone], 6)
+      for page in range(6):
+         with open(self.Path("out/page{}.out".format(page))) as f:
+            self.assertEqual(f.read(),
+                             "CLR;\nCO {} 0 255 255;\n".format(page))
+
+
+if __name__ == '__main__':
+   unittest.main()
@@ -0,0 +1,125 @@
+import unittest
+import io
+import logging
+
+from unittest import mock
+
+try:
+   import numpy
+except ImportError:
+   numpy = None
+
+from vectdraw.diagnostics import MalformedInputError, StreamDiagnostics
+from vectdraw.parallel import RunParallel, _DrawStretch
+from vectdraw.process import VectorCommandStreamProcessor
+from vectdraw.vectorprocess import VectorizedCommandStreamProcessor
+from vectdraw.draw.board import Board, Pen
+from vectdraw.settings import REGISTERED_COMMANDS
+from vectdraw.hexstreamreader import BufferedHexStreamReader
+from vectdraw.hexstreamreader import BinaryStreamReader
+from vectdraw.streamwriter import CommandStreamWriter
+
+from sixteen14encoding.codec.sixteen14hex import Sixteen14Codec
+
+
+class TestRunParallel(unittest.TestCase):
+
+   def setUp(self):
+      stream = io.BytesIO()
+      with CommandStreamWriter(stream) as writer:
+         for page in range(20):
+            # pages leave the pen down, coloured and away from the origin
+            writer.clear()
+            writer.colour(page * 10, 0, 255, 255)
+            writer.pen(True)
+            for i in range(page * 3):
+               writer.move([(j * 7 % 900 - 450, 300 - j * 11 % 600)
+                            for j in range(i % 17)])
+               writer.pen(i % 4 != 0)
+
+      self.hex = stream.getvalue().decode('ascii')
+
+      # an unrecognized command and an odd argument in later pages
+      position = self.hex.index("F0", len(self.hex) // 2)
+      self.hex = (self.hex[:position] + "E04000" + self.hex[position:-4] +
+                  "01" + self.hex[-4:])
+
+      logging.disable(logging.WARNING)
+      self.addCleanup(logging.disable, logging.NOTSET)
+
+   def Processor(self, data, binary=False,
+                 processorClass=VectorCommandStreamProcessor, strict=False):
+      if binary:
+         reader = BinaryStreamReader(io.BytesIO(bytes.fromhex(data)),
+                                     blockSize=100)
+      else:
+         reader = BufferedHexStreamReader(io.StringIO(data), blockSize=100)
+
+      return processorClass(
+         reader, Sixteen14Codec, Board(Pen(), io.StringIO()),
+         REGISTERED_COMMANDS, diagnostics=StreamDiagnostics(strict=strict))
+
+   def Run(self, processor, jobs, **kwargs):
+      if jobs == 1:
+         processor.run()
+      else:
+         RunParallel(processor, jobs, segmentSize=64, **kwargs)
+
+      return processor.vectorBoard.outputStream.getvalue()
+
+   def test_same_output(self):
+      serial = self.Processor(self.hex)
+      expected = self.Run(serial, 1)
+
+      for binary in (False, True):
+         parallel = self.Processor(self.hex, binary)
+         self.assertEqual(self.Run(parallel, 3), expected)
+         self.assertEqual(parallel.diagnostics.Summary(),
+                          serial.diagnostics.Summary())
+
+   def test_one_segment(self):
+      data = self.hex[2:].replace("F0", "")
+      self.assertEqual(self.Run(self.Processor(data), 2),
+                       self.Run(self.Processor(data), 1))
+
+   def test_long_segments(self):
+      # stretches without CLR longer than maxSegmentSize are drawn in
+      # process, the others by the workers
+      for data in (self.hex, self.hex[2:].replace("F0", "")):
+         serial = self.Processor(data)
+         expected = self.Run(serial, 1)
+
+         parallel = self.Processor(data)
+         with mock.patch('vectdraw.parallel._DrawStretch',
+                         wraps=_DrawStretch) as drawStretch:
+            self.assertEqual(self.Run(parallel, 2, maxSegmentSize=512),
+                             expected)
+
+         self.assertTrue(drawStretch.called)
+         self.assertEqual(parallel.diagnostics.Summary(),
+                          serial.diagnostics.Summary())
+
+   @unittest.skipIf(numpy is None, "numpy is not installed")
+   def test_vectorized(self):
+      self.assertEqual(
+         self.Run(self.Processor(
+            self.hex, processorClass=VectorizedCommandStreamProcessor), 2),
+         self.Run(self.Processor(self.hex), 1))
+
+   def test_strict(self):
+      for data in (self.hex, self.hex[:1000] + "zz" + self.hex[1000:]):
+         serial = self.Processor(data, strict=True)
+         with self.assertRaises(MalformedInputError) as expected:
+            self.Run(serial, 1)
+
+         parallel = self.Processor(data, strict=True)
+         with self.assertRaises(MalformedInputError) as error:
+            self.Run(parallel, 3)
+
+         self.assertEqual(str(error.exception), str(expected.exception))
+         self.assertEqual(parallel.vectorBoard.outputStream.getvalue(),
+                          serial.vectorBoard.outputStream.getvalue())
+
+
+if __name__ == '__main__':
+   unittest.main()
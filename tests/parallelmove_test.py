@@ -0,0 +1,111 @@
+import unittest
+import io
+import logging
+
+from vectdraw.parallelmove import ParallelMoveExecutor
+from vectdraw.process import VectorCommandStreamProcessor
+from vectdraw.draw.board import Board, Pen
+from vectdraw.draw.plane import Point
+from vectdraw.settings import REGISTERED_COMMANDS
+from vectdraw.hexstreamreader import BufferedHexStreamReader
+from vectdraw.streamwriter import CommandStreamWriter
+
+from sixteen14encoding.codec.sixteen14hex import Sixteen14Codec
+
+
+class TestParallelMoveExecutor(unittest.TestCase):
+
+   @classmethod
+   def setUpClass(cls):
+      cls.executor = ParallelMoveExecutor(2, chunkPoints=37, minPoints=100)
+
+   @classmethod
+   def tearDownClass(cls):
+      cls.executor.Close()
+
+   def setUp(self):
+      # sweeps out of the board past x = 8191 and back in, many times
+      self.points = [Point(97 if i // 200 % 2 == 0 else -97,
+                           3 if i % 3 else -5)
+                     for i in range(3000)]
+
+   def Draw(self, points, executor=None, start=(0, 0), penDown=True,
+            chunks=1):
+      output = io.StringIO()
+      board = Board(Pen(), outputStream=output, moveExecutor=executor)
+      board.currentPenLocation = Point(*start)
+      if penDown:
+         board.pen.down()
+
+      size = len(points) // chunks + 1
+      board.BeginMove()
+      for chunk in range(0, len(points), size):
+         board.ContinueMove(points[chunk:chunk + size])
+      board.EndMove()
+
+      return (output.getvalue(), board.currentPenLocation.x,
+              board.currentPenLocation.y, board.pen.IsPenDown())
+
+   def test_same_output(self):
+      for chunks in (1, 13):
+         for penDown in (False, True):
+            expected = self.Draw(self.points, penDown=penDown, chunks=chunks)
+            self.assertEqual(
+               self.Draw(self.points, self.executor, penDown=penDown,
+                         chunks=chunks), expected)
+
+      self.assertIn("PEN UP;\n", expected[0])
+      self.assertIn("PEN DOWN;\n", expected[0])
+
+   def test_short_moves(self):
+      for points in ([], self.points[:5], self.points[:99]):
+         self.assertEqual(self.Draw(points, self.executor),
+                          self.Draw(points))
+
+   def test_wrong_pen_state(self):
+      # the pen is down outside the board, where workers assume it is up
+      points = [Point(1, 0)] * 150 + [Point(-3, 1)] * 400
+      self.assertEqual(self.Draw(points, self.executor, start=(8300, 0)),
+                       self.Draw(points, start=(8300, 0)))
+
+   def test_error(self):
+      # crossing two boundaries at once fails on the board itself
+      points = [Point(1, -1), Point(-1, 1)] * 200 + [Point(300, 300)] * 60
+      start = (8000, 8000)
+      output = self.Draw(points[:400], start=start)[0]
+      with self.assertRaises(TypeError):
+         self.Draw(points, start=start)
+
+      with self.assertRaises(TypeError):
+         self.Draw(points, self.executor, start=start)
+
+      # the executor is reset for the next move
+      self.assertEqual(self.Draw(points[:400], self.executor, start=start)[0],
+                       output)
+
+   def test_processor(self):
+      stream = io.BytesIO()
+      with CommandStreamWriter(stream) as writer:
+         writer.pen(True)
+         writer.move([(point.x, point.y) for point in self.points])
+         writer.colour(255, 0, 0, 255)
+         writer.move([(-point.x, point.y) for point in self.points[:500]])
+
+      data = stream.getvalue().decode('ascii')
+
+      def Run(executor):
+         board = Board(Pen(), io.StringIO(), moveExecutor=executor)
+         processor = VectorCommandStreamProcessor(
+            BufferedHexStreamReader(io.StringIO(data), blockSize=100),
+            Sixteen14Codec, board, REGISTERED_COMMANDS)
+         processor.kMaxChunkArgs = 64
+         processor.run()
+         return board.outputStream.getvalue()
+
+      logging.disable(logging.WARNING)
+      self.addCleanup(logging.disable, logging.NOTSET)
+      self.assertEqual(Run(self.executor), Run(None))
+
+
+if __name__ == '__main__':
+   unittest.main()
@@ -0,0 +1,224 @@
+import unittest
+import io
+import threading
+import time
+
+try:
+   import numpy
+except ImportError:
+   numpy = None
+
+from vectdraw.diagnostics import MalformedInputError, StreamDiagnostics
+from vectdraw.pipeline import RunPipelined, ThreadedBlocks, ThreadedOutput
+from vectdraw.process import VectorCommandStreamProcessor
+from vectdraw.vectorprocess import VectorizedCommandStreamProcessor
+from vectdraw.draw.board import Board, Pen
+from vectdraw.settings import REGISTERED_COMMANDS
+from vectdraw.hexstreamreader import BufferedHexStreamReader
+from vectdraw.hexstreamreader import BinaryStreamReader
+from vectdraw.streamwriter import CommandStreamWriter
+
+from sixteen14encoding.codec.sixteen14hex import Sixteen14Codec
+
+
+class FailingStream(io.StringIO):
+   """
+   text stream failing once more than limit characters are written
+   """
+
+   def __init__(self, limit):
+      super().__init__()
+      self.limit = limit
+
+   def write(self, text):
+      if self.tell() + len(text) > self.limit:
+         raise OSError("disk full")
+      return super().write(text)
+
+
+class TestThreadedBlocks(unittest.TestCase):
+
+   def test_order(self):
+      blocks = ThreadedBlocks((bytes([i]) for i in range(100)), queueSize=2)
+      self.assertEqual(b''.join(blocks), bytes(range(100)))
+      blocks.Close()
+      self.assertFalse(blocks.thread.is_alive())
+
+   def test_exception(self):
+      def Blocks():
+         yield b'a'
+         raise ValueError("bad block")
+
+      blocks = ThreadedBlocks(Blocks())
+      received = []
+      with self.assertRaisesRegex(ValueError, "bad block"):
+         for block in blocks:
+            received.append(block)
+
+      blocks.Close()
+      self.assertEqual(received, [b'a'])
+
+   def test_backpressure(self):
+      read = []
+
+      def Blocks():
+         for i in range(100):
+            read.append(i)
+            yield bytes([i])
+
+      blocks = ThreadedBlocks(Blocks(), queueSize=3)
+      iterator = iter(blocks)
+      next(iterator)
+      time.sleep(0.1)
+
+      # the consumed block, the queued ones, and the one waiting to be put
+      self.assertLessEqual(len(read), 5)
+
+      # stopping early ends the reader thread and closes the blocks
+      blocks.Close()
+      self.assertFalse(blocks.thread.is_alive())
+      self.assertLess(len(read), 100)
+
+
+class TestThreadedOutput(unittest.TestCase):
+
+   def test_order(self):
+      stream = io.StringIO()
+      output = ThreadedOutput(stream, queueSize=1)
+      output.kChunkSize = 10
+      expected = ''.join(str(i) for i in range(1000))
+      for i in range(1000):
+         output.write(str(i))
+         output.flush()
+
+      output.Close()
+      self.assertEqual(stream.getvalue(), expected)
+      self.assertFalse(output.thread.is_alive())
+
+   def test_exception(self):
+      output = ThreadedOutput(FailingStream(100))
+      output.kChunkSize = 10
+      with self.assertRaisesRegex(OSError, "disk full"):
+         for i in range(1000):
+            output.write("0123456789")
+            output.flush()
+
+            # give the writer thread a chance to fail
+            time.sleep(0.001)
+
+      with self.assertRaisesRegex(OSError, "disk full"):
+         output.Close()
+
+      self.assertFalse(output.thread.is_alive())
+
+
+class TestRunPipelined(unittest.TestCase):
+
+   def setUp(self):
+      stream = io.BytesIO()
+      with CommandStreamWriter(stream) as writer:
+         writer.clear()
+         for i in range(200):
+            writer.pen(i % 3 != 0)
+            writer.colour(i % 256, 2 * i % 256, 3 * i % 256, 255)
+            writer.move([(j * 7 % 900 - 450, 300 - j * 11 % 600)
+                         for j in range(i % 17)])
+            writer.compactMove([(1, 1), (-5, 2)])
+
+      self.hex = stream.getvalue().decode('ascii')
+
+   def Processor(self, out, binary=False,
+                 processorClass=VectorCommandStreamProcessor,
+                 diagnostics=None, hex=None):
+      hex = self.hex if hex is None else hex
+      if binary:
+         reader = BinaryStreamReader(io.BytesIO(bytes.fromhex(hex)),
+                                     blockSize=64)
+      else:
+         reader = BufferedHexStreamReader(io.StringIO(hex), blockSize=64)
+
+      return processorClass(reader, Sixteen14Codec, Board(Pen(), out),
+                            REGISTERED_COMMANDS, diagnostics=diagnostics)
+
+   def Output(self, pipelined, **kwargs):
+      out = io.StringIO()
+      processor = self.Processor(out, **kwargs)
+      if pipelined:
+         RunPipelined(processor, queueSize=2)
+      else:
+         processor.run()
+
+      self.assertIs(processor.vectorBoard.outputStream, out)
+      return out.getvalue()
+
+   def test_same_output(self):
+      expected = self.Output(False)
+      self.assertTrue(expected)
+      self.assertEqual(self.Output(True), expected)
+      self.assertEqual(self.Output(True, binary=True), expected)
+
+   @unittest.skipIf(numpy is None, "numpy is not installed")
+   def test_vectorized(self):
+      self.assertEqual(
+         self.Output(True, processorClass=VectorizedCommandStreamProcessor),
+         self.Output(False))
+
+   def test_reader_exception(self):
+      threads = threading.active_count()
+      out = io.StringIO()
+      processor = self.Processor(
+         out, diagnostics=StreamDiagnostics(strict=True),
+         hex=self.hex[:1000] + "zz" + self.hex[1000:])
+
+      with self.assertRaises(MalformedInputError):
+         RunPipelined(processor)
+
+      # the output up to the failure is written
+      self.assertTrue(out.getvalue())
+      self.assertIs(processor.vectorBoard.outputStream, out)
+      self.assertEqual(threading.active_count(), threads)
+
+   def test_diagnostics(self):
+      # invalid hex found by the reader thread, and unrecognized commands
+      # found by the drawing thread
+      hex = self.hex[:1000] + "zz" + self.hex[1000:] + "E04000"
+      summaries = []
+      for pipelined in (False, True):
+         diagnostics = StreamDiagnostics()
+         processor = self.Processor(io.StringIO(), diagnostics=diagnostics,
+                                    hex=hex)
+         with self.assertLogs(processor.logger.name, 'WARNING'):
+            if pipelined:
+               RunPipelined(processor, queueSize=2)
+            else:
+               processor.run()
+         summaries.append(sorted(diagnostics.Summary()))
+
+      self.assertEqual(len(summaries[0]), 3)
+      self.assertEqual(summaries[1], summaries[0])
+
+   def test_writer_exception(self):
+      threads = threading.active_count()
+      processor = self.Processor(FailingStream(100))
+
+      with self.assertRaisesRegex(OSError, "disk full"):
+         RunPipelined(processor)
+
+      self.assertEqual(threading.active_count(), threads)
+
+   def test_drawing_and_writer_exception(self):
+      # the drawing thread fails on the unrecognized command, then the
+      # writer thread fails writing the output drawn so far
+      processor = self.Processor(
+         FailingStream(10), diagnostics=StreamDiagnostics(strict=True),
+         hex=self.hex[:1000] + "E04000")
+
+      with self.assertLogs(processor.logger.name, 'ERROR') as logs:
+         with self.assertRaises(MalformedInputError):
+            RunPipelined(processor)
+
+      self.assertIn("OSError: disk full", logs.output[0])
+
+
+if __name__ == '__main__':
+   unittest.main()
@@ -1,12 +1,22 @@
 import unittest
 import io
+import importlib.metadata
+import logging
+import os
+import subprocess
+import sys
+
+from unittest import mock
 
 from vectdraw.process import VectorCommandStreamProcessor
 from vectdraw.process import DuplicateCommandCodeError
 from vectdraw.draw.board import Board, Pen
 from vectdraw.settings import REGISTERED_COMMANDS
 from vectdraw.commands.default import Command, MovePen
-from vectdraw.hexstreamreader import HexStreamReader
+from vectdraw.hexstreamreader import HexStreamReader, BinaryStreamReader
+from vectdraw.hexstreamreader import BufferedHexStreamReader
+from vectdraw.diagnostics import MalformedInputError, StreamDiagnostics
+from vectdraw.tokenizer import CommandTokenizer
 
 
 from sixteen14encoding.codec.sixteen14hex import Sixteen14Codec
@@ -21,6 +31,12 @@ class TestCommand(Command):
       return args
 
 
+class PluginCommand(Command):
+
+   commandByte = "90"
+   method = 'ChangePenPosition'
+
+
 class TestStreamProcessor(unittest.TestCase):
 
    def setUp(self):
@@ -94,4 +110,283 @@ class TestStreamProcessor(unittest.TestCase):
          stream, self.encoding, self.board, commands)
 
       processor.run()
-      self.assertEqual(self.out.getvalue(), "MV (5000, 5000);\n")
\ No newline at end of file
+      self.assertEqual(self.out.getvalue(), "MV (5000, 5000);\n")
+
+   def test_binary_get_args(self):
+      stream = BinaryStreamReader(io.BytesIO(
+         bytes.fromhex('C067086708804001C0670840004000187818784000')))
+
+      processor = VectorCommandStreamProcessor(
+         stream, self.encoding, self.board, self.commands)
+
+      next(stream)
+      self.assertListEqual(processor.GetArgs(), [5000, 5000])
+      self.assertEqual(stream.currentByte, 0x80)
+
+   def test_binary_run(self):
+      stream = BinaryStreamReader(io.BytesIO(bytes.fromhex(
+         "F0A0417F40004000417FC067086708804001C0670840004000187818784000"
+         "804000")))
+
+      processor = VectorCommandStreamProcessor(
+         stream, self.encoding, self.board, self.commands)
+
+      processor.run()
+      self.assertEqual(self.out.getvalue(),
+                       "CLR;\nCO 255 0 0 255;\nMV (5000, 5000);\n"
+                       "PEN DOWN;\nMV (8191, 5000);\nPEN UP;\n"
+                       "MV (8191, 0);\nPEN DOWN;\nMV (5000, 0);\nPEN UP;\n")
+
+   def test_binary_requires_decode_bytes(self):
+      stream = BinaryStreamReader(io.BytesIO(b''))
+
+      class HexOnlyCodec(object):
+         @staticmethod
+         def decode(hexadecimal):
+            return int(hexadecimal, 16)
+
+      with self.assertRaises(TypeError):
+         VectorCommandStreamProcessor(
+            stream, HexOnlyCodec, self.board, self.commands)
+
+   def test_odd_argument_bytes(self):
+      stream = HexStreamReader(io.StringIO('C06708670867'))
+      processor = VectorCommandStreamProcessor(
+         stream, self.encoding, self.board, self.commands)
+
+      with mock.patch.object(processor.logger, 'warning') as mock_warning:
+         processor.run()
+         mock_warning.assert_called_once_with(
+            "Discarded odd trailing argument byte 67 x1 at offset 0")
+
+      self.assertEqual(self.out.getvalue(), "MV (5000, 5000);\n")
+
+   def test_unrecognized_command(self):
+      stream = BinaryStreamReader(io.BytesIO(bytes.fromhex('904000F0')))
+      processor = VectorCommandStreamProcessor(
+         stream, self.encoding, self.board, self.commands)
+
+      with mock.patch.object(processor.logger, 'warning') as mock_warning:
+         processor.run()
+         mock_warning.assert_called_once_with(
+            "Received unrecognized command byte 90 x1 at offset 0")
+
+      self.assertEqual(self.out.getvalue(), "CLR;\n")
+
+   def test_argument_count(self):
+      # a PEN and a CO missing arguments, a PEN whose only byte is
+      # discarded, and a truncated trailing PEN
+      data = "F0" + "80" + "A0417F4000" + "8040" + "804001" + "80"
+      processor = VectorCommandStreamProcessor(
+         HexStreamReader(io.StringIO(data)), self.encoding, self.board,
+         self.commands)
+
+      with self.assertLogs(processor.logger.name, 'WARNING') as logs:
+         processor.run()
+
+      self.assertEqual(self.out.getvalue(), "CLR;\nPEN DOWN;\n")
+      self.assertIn("Skipped command 80 with the wrong number of arguments "
+                    "x3 at offsets 1, 7, 12", logs.output[0])
+      self.assertIn("Skipped command A0 with the wrong number of arguments "
+                    "x1 at offset 2", logs.output[1])
+
+      strict = VectorCommandStreamProcessor(
+         HexStreamReader(io.StringIO(data)), self.encoding,
+         Board(Pen(), outputStream=io.StringIO()), self.commands,
+         diagnostics=StreamDiagnostics(strict=True))
+      with self.assertRaises(MalformedInputError):
+         strict.run()
+
+   def test_chunked_argument_count(self):
+      # a CO split into chunks is executed, a PEN split into chunks is
+      # skipped once, as a whole
+      stream = HexStreamReader(io.StringIO(
+         "A0417F40004000417F" + "80" + "4001" * 6 + "F0"))
+      processor = VectorCommandStreamProcessor(
+         stream, self.encoding, self.board, self.commands)
+      processor.kMaxChunkArgs = 4
+
+      with self.assertLogs(processor.logger.name, 'WARNING') as logs:
+         processor.run()
+
+      self.assertEqual(self.out.getvalue(), "CO 255 0 0 255;\nCLR;\n")
+      self.assertEqual(len(logs.output), 1)
+
+   def test_token_records_on_command(self):
+      # onCommand receives the first token of each registered command,
+      # including a CO with too few arguments, but not unrecognized ones
+      data = bytes.fromhex(
+         "F0" "A0417F" "904001" "C0" + "40014002" * 5 + "804001")
+      processor = VectorCommandStreamProcessor(
+         HexStreamReader(io.StringIO()), self.encoding, self.board,
+         self.commands, plugins=False)
+      tokenizer = CommandTokenizer(4)
+
+      started = []
+      with self.assertLogs(processor.logger.name, 'WARNING'):
+         records = list(processor.TokenRecords(
+            tokenizer.Tokenize([data]), started.append))
+         processor.diagnostics.Report(processor.logger)
+
+      self.assertEqual([(token.command, token.offset) for token in started],
+                       [(0xF0, 0), (0xA0, 1), (0xC0, 7), (0x80, 28)])
+      self.assertEqual([record[0] for record in records],
+                       [0xF0] + [0xC0] * 5 + [0x80])
+
+   def test_dispatch_table(self):
+      processor = VectorCommandStreamProcessor(
+         self.stream, self.encoding, self.board, self.commands)
+
+      self.assertIsInstance(processor.commandTable[0xC0], MovePen)
+      self.assertEqual(processor.dispatchTable[0xF0], self.board.clear)
+      self.assertIsNone(processor.commandTable[0x90])
+      self.assertIsNone(processor.dispatchTable[0x90])
+
+   def test_plugins(self):
+      entryPoint = importlib.metadata.EntryPoint(
+         name='test', value='tests.process_test:PluginCommand',
+         group='vectdraw.commands')
+
+      with mock.patch('importlib.metadata.entry_points',
+                      return_value=[entryPoint]) as entry_points:
+         processor = VectorCommandStreamProcessor(
+            BinaryStreamReader(io.BytesIO(bytes.fromhex('904001904000F0'))),
+            self.encoding, self.board, self.commands)
+
+         # plugins are only loaded once an unregistered byte is received
+         entry_points.assert_not_called()
+         processor.run()
+         entry_points.assert_called_once_with(group='vectdraw.commands')
+
+      self.assertEqual(self.out.getvalue(), "PEN DOWN;\nPEN UP;\nCLR;\n")
+
+   def test_plugins_disabled(self):
+      with mock.patch('importlib.metadata.entry_points') as entry_points:
+         processor = VectorCommandStreamProcessor(
+            BinaryStreamReader(io.BytesIO(bytes.fromhex('904001F0'))),
+            self.encoding, self.board, self.commands, plugins=False)
+
+         with self.assertLogs(level='WARNING'):
+            processor.run()
+         entry_points.assert_not_called()
+
+   def test_duplicate_plugin(self):
+      entryPoint = importlib.metadata.EntryPoint(
+         name='test', value='tests.process_test:TestCommand',
+         group='vectdraw.commands')
+
+      with mock.patch('importlib.metadata.entry_points',
+                      return_value=[entryPoint]):
+         processor = VectorCommandStreamProcessor(
+            BinaryStreamReader(io.BytesIO(bytes.fromhex('904001F0'))),
+            self.encoding, self.board, self.commands)
+
+         with self.assertLogs(level='WARNING') as logs:
+            processor.run()
+
+      self.assertIn("Skipped plugin command", logs.output[0])
+      self.assertEqual(self.out.getvalue(), "CLR;\n")
+
+   def test_whitespace_and_dangling_half_byte(self):
+      stream = BufferedHexStreamReader(
+         io.StringIO('F0\n80 40\n01\nC'), blockSize=3)
+      processor = VectorCommandStreamProcessor(
+         stream, self.encoding, self.board, self.commands)
+
+      logger = logging.getLogger('vectdraw.hexstreamreader')
+      with mock.patch.object(logger, 'warning') as mock_warning:
+         processor.run()
+         mock_warning.assert_called_once()
+
+      self.assertEqual(self.out.getvalue(), "CLR;\nPEN DOWN;\n")
+
+
+   def test_chunked_commands(self):
+      # long commands are executed in chunks with the same output
+      stream = ("F0A04000417F4000417F" "C0" + "40014002" * 40 +
+                "804001" "C0" + "3F7F4000" * 25 + "804000" "F0")
+
+      expected = io.StringIO()
+      VectorCommandStreamProcessor(
+         BufferedHexStreamReader(io.StringIO(stream)), self.encoding,
+         Board(Pen(), outputStream=expected), self.commands).run()
+
+      for blockSize in (2, 7, 1024):
+         processor = VectorCommandStreamProcessor(
+            BufferedHexStreamReader(io.StringIO(stream), blockSize=blockSize),
+            self.encoding, self.board, self.commands)
+         processor.kMaxChunkArgs = 8
+         processor.run()
+
+         self.assertEqual(self.out.getvalue(), expected.getvalue())
+         self.out.seek(0)
+         self.out.truncate()
+
+
+class TestLongMoveMemory(unittest.TestCase):
+   """
+   a single MV of millions of points is executed in chunks, so the peak
+   memory used doesn't grow with the length of the move
+   """
+
+   kPoints = 2000000
+
+   # peak resident memory growth allowed while processing, in MiB. Holding
+   # all points of the move at once takes several hundred MiB
+   kCeiling = 32
+
+   kScript = """if True:
+      import io
+      import resource
+      import sys
+
+      from vectdraw.draw.board import Board, Pen
+      from vectdraw.hexstreamreader import BufferedHexStreamReader
+      from vectdraw.process import VectorCommandStreamProcessor
+      from vectdraw.settings import REGISTERED_COMMANDS
+      from sixteen14encoding.codec.sixteen14hex import Sixteen14Codec
+
+      class MoveStream(io.RawIOBase):
+         # hex of a single MV of count points, generated as it is read
+         def __init__(self, count):
+            self.position = 0
+            self.size = 2 + count * 8
+
+         def readable(self):
+            return True
+
+         def readinto(self, buffer):
+            size = min(len(buffer), self.size - self.position)
+            start = (self.position - 2) % 8 if self.position else 0
+            data = b"C0" if not self.position else b""
+            data += b"40014000" * (size // 8 + 2)
+            buffer[:size] = data[start:start + size]
+            self.position += size
+            return size
+
+      processor = VectorCommandStreamProcessor(
+         BufferedHexStreamReader(MoveStream(int(sys.argv[1])),
+                                 blockSize=1 << 16),
+         Sixteen14Codec, Board(Pen(), outputStream=io.StringIO()),
+         REGISTERED_COMMANDS)
+
+      before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+      processor.run()
+      after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+      print(after - before, processor.vectorBoard.currentPenLocation)
+   """
+
+   @unittest.skipIf(sys.platform not in ('linux', 'darwin'),
+                    "ru_maxrss units are platform specific")
+   def test_memory_ceiling(self):
+      environment = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+      result = subprocess.run(
+         [sys.executable, '-c', self.kScript, str(self.kPoints)],
+         env=environment, stdout=subprocess.PIPE, check=True)
+
+      growth, location = result.stdout.decode().split(' ', 1)
+
+      # ru_maxrss is in KiB on linux and in bytes on macOS
+      growth = int(growth) / (1 << 10 if sys.platform == 'linux' else 1 << 20)
+      self.assertEqual(location.strip(), "({}, 0)".format(self.kPoints))
+      self.assertLess(growth, self.kCeiling)
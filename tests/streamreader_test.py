@@ -1,7 +1,12 @@
 import unittest
 import io
+import os
+import tempfile
 
-from vectdraw.hexstreamreader import HexStreamReader
+from vectdraw.diagnostics import MalformedInputError, StreamDiagnostics
+from vectdraw.hexstreamreader import HexStreamReader, BufferedHexStreamReader
+from vectdraw.hexstreamreader import BinaryStreamReader, HexBlockDecoder
+from vectdraw.mappedsource import MappedSource
 
 
 class TestStreamReader(unittest.TestCase):
@@ -41,4 +46,200 @@ class TestStreamReader(unittest.TestCase):
          self.assertEqual(hex_b, correct_vals[index])
 
       with self.assertRaises(StopIteration):
-         next(self.stream)
\ No newline at end of file
+         next(self.stream)
+
+
+class TestBufferedStreamReader(unittest.TestCase):
+
+   def test_constructor(self):
+      with self.assertRaises(TypeError):
+         BufferedHexStreamReader('2')
+
+      with self.assertRaises(ValueError):
+         BufferedHexStreamReader(io.StringIO("12"), blockSize=1)
+
+   def test_stream_reader_buffer(self):
+      stream = BufferedHexStreamReader(io.StringIO("123456789"), blockSize=3)
+      self.assertIsNone(stream.currentByte)
+
+      for expected in ['12', '34', '56', '78', '9']:
+         self.assertEqual(next(stream), expected)
+         self.assertEqual(stream.currentByte, expected)
+
+      with self.assertRaises(StopIteration):
+         next(stream)
+
+      self.assertTrue(stream.closed)
+
+   def test_whitespace_is_ignored(self):
+      stream = BufferedHexStreamReader(
+         io.StringIO("F0 A0\n4000\r\n 41\t7F\n"), blockSize=4)
+
+      self.assertListEqual(list(stream), ['F0', 'A0', '40', '00', '41', '7F'])
+
+   def test_binary_layer(self):
+      raw = io.BytesIO(b"F0A0\n4000 417F\n")
+      text = io.TextIOWrapper(raw)
+      stream = BufferedHexStreamReader(text, blockSize=5)
+
+      self.assertIs(stream.source, raw)
+      self.assertListEqual(list(stream), ['F0', 'A0', '40', '00', '41', '7F'])
+
+
+class TestBinaryStreamReader(unittest.TestCase):
+
+   def test_constructor(self):
+      with self.assertRaises(TypeError):
+         BinaryStreamReader('2')
+
+      with self.assertRaises(ValueError):
+         BinaryStreamReader(io.BytesIO(b"12"), blockSize=0)
+
+   def test_stream_reader_buffer(self):
+      stream = BinaryStreamReader(io.BytesIO(b"\xf0\x00\x80\x7f"),
+                                  blockSize=3)
+      self.assertIsNone(stream.currentByte)
+
+      for expected in [0xF0, 0x00, 0x80, 0x7F]:
+         self.assertEqual(next(stream), expected)
+         self.assertEqual(stream.currentByte, expected)
+
+      with self.assertRaises(StopIteration):
+         next(stream)
+
+      self.assertIsNone(stream.currentByte)
+      self.assertTrue(stream.closed)
+
+   def test_binary_layer(self):
+      raw = io.BytesIO(b"\xf0\x0a")
+      stream = BinaryStreamReader(io.TextIOWrapper(raw))
+
+      self.assertIs(stream.source, raw)
+      self.assertListEqual(list(stream), [0xF0, 0x0A])
+
+   def test_text_stream(self):
+      with self.assertRaises(TypeError):
+         next(BinaryStreamReader(io.StringIO("F0")))
+
+
+class TestMappedStreamReaders(unittest.TestCase):
+
+   def setUp(self):
+      fd, self.path = tempfile.mkstemp()
+      os.close(fd)
+
+   def tearDown(self):
+      os.remove(self.path)
+
+   def Write(self, data):
+      with open(self.path, 'wb') as f:
+         f.write(data)
+
+   def test_mapped_source(self):
+      self.Write(b"0123456789")
+
+      with open(self.path, 'rb') as f:
+         source = MappedSource.FromStream(f)
+
+      self.assertEqual(bytes(source.read(4)), b"0123")
+      self.assertEqual(source.tell(), 4)
+      source.seek(8)
+      self.assertEqual(bytes(source.read(4)), b"89")
+      self.assertEqual(len(source.read(4)), 0)
+      source.close()
+
+   def test_unmappable_streams(self):
+      self.Write(b"")
+
+      with open(self.path, 'rb') as f:
+         self.assertIsNone(MappedSource.FromStream(f))
+
+      self.assertIsNone(MappedSource.FromStream(io.BytesIO(b"F0")))
+
+   def test_mapped_hex_reader(self):
+      self.Write(b"F0A0\n4000 417F\n9")
+
+      with open(self.path) as f:
+         stream = BufferedHexStreamReader(f, blockSize=3, useMmap=True)
+         self.assertIsInstance(stream.source, MappedSource)
+         self.assertListEqual(
+            list(stream), ['F0', 'A0', '40', '00', '41', '7F', '9'])
+
+      self.assertTrue(stream.source.closed)
+
+   def test_mapped_binary_reader(self):
+      self.Write(b"\xf0\x00\x80\x7f")
+
+      with open(self.path, 'rb') as f:
+         stream = BinaryStreamReader(f, blockSize=3, useMmap=True)
+         self.assertIsInstance(stream.source, MappedSource)
+         self.assertListEqual(list(stream), [0xF0, 0x00, 0x80, 0x7F])
+
+      self.assertTrue(stream.source.closed)
+
+   def test_stream_fallback(self):
+      stream = BinaryStreamReader(io.BytesIO(b"\xf0"), useMmap=True)
+      self.assertNotIsInstance(stream.source, MappedSource)
+      self.assertListEqual(list(stream), [0xF0])
+
+
+class TestReadBlocks(unittest.TestCase):
+
+   def test_hex_stream_reader(self):
+      stream = HexStreamReader(io.StringIO("F0A04000"))
+      self.assertEqual(next(stream), 'F0')
+      self.assertEqual(b''.join(stream.ReadBlocks()), b'\xa0\x40\x00')
+
+   def test_buffered_hex_stream_reader(self):
+      stream = BufferedHexStreamReader(
+         io.StringIO("F0A0\n4000 417F\n"), blockSize=3)
+      self.assertEqual(next(stream), 'F0')
+      self.assertEqual(b''.join(stream.ReadBlocks()),
+                       bytes.fromhex("A04000417F"))
+
+   def test_binary_stream_reader(self):
+      stream = BinaryStreamReader(io.BytesIO(b"\xf0\xa0\x40\x00"),
+                                  blockSize=3)
+      self.assertEqual(next(stream), 0xF0)
+      self.assertEqual(b''.join(stream.ReadBlocks()), b'\xa0\x40\x00')
+
+
+
+class TestHexBlockDecoder(unittest.TestCase):
+
+   def setUp(self):
+      self.diagnostics = StreamDiagnostics()
+      self.decoder = HexBlockDecoder(self.diagnostics)
+
+   def test_valid_blocks(self):
+      self.assertEqual(self.decoder.Feed(b"F0A"), b'\xf0')
+      self.assertEqual(self.decoder.Feed(b"0 40\n00"), b'\xa0\x40\x00')
+      self.assertEqual(len(self.diagnostics), 0)
+
+   def test_resync(self):
+      # the pair holding 'x' and the argument pairs after it are skipped
+      self.assertEqual(self.decoder.Feed(b"C040x04000417FA040"),
+                       bytes.fromhex("C040A040"))
+      self.assertEqual(self.diagnostics.Summary(), [
+         "Skipped to the next command byte after invalid hex character 'x'"
+         " x1 at offset 4",
+         "Skipped 10 characters of malformed hex input"])
+
+   def test_resync_across_blocks(self):
+      self.assertEqual(self.decoder.Feed(b"C0404g00"), b'\xc0\x40')
+      self.assertEqual(self.decoder.Feed(b"4000"), b'')
+      self.assertEqual(self.decoder.Feed(b"05F0"), b'\xf0')
+      self.assertEqual(self.diagnostics.skippedCharacters, 10)
+
+   def test_command_pairs_are_aligned(self):
+      # "0F00" doesn't hold a command byte, only the pair "F0" after it
+      self.assertEqual(self.decoder.Feed(b"zz0F00F0"), b'\xf0')
+
+   def test_strict(self):
+      decoder = HexBlockDecoder(StreamDiagnostics(strict=True))
+      with self.assertRaises(MalformedInputError):
+         decoder.Feed(b"C040x0")
+
+   def test_without_diagnostics(self):
+      with self.assertRaises(MalformedInputError):
+         HexBlockDecoder().Feed(b"C040x0")
@@ -0,0 +1,86 @@
+import unittest
+import io
+
+from vectdraw.streamwriter import CommandStreamWriter
+from vectdraw.process import VectorCommandStreamProcessor
+from vectdraw.hexstreamreader import BufferedHexStreamReader
+from vectdraw.hexstreamreader import BinaryStreamReader
+from vectdraw.draw.board import Board, Pen
+from vectdraw.draw.plane import Point
+from vectdraw.settings import REGISTERED_COMMANDS
+
+from sixteen14encoding.codec.sixteen14hex import Sixteen14Codec
+
+try:
+   import numpy
+except ImportError:
+   numpy = None
+
+
+class TestCommandStreamWriter(unittest.TestCase):
+
+   def setUp(self):
+      self.expected = b"F0A04000417F4000417FC040004000804001C05F205F20804000"
+
+   def Write(self, writer):
+      writer.clear()
+      writer.colour(0, 255, 0, 255)
+      writer.move([(0, 0)])
+      writer.pen(True)
+      writer.move([Point(4000, 4000)])
+      writer.pen(False)
+      writer.close()
+
+   def test_constructor(self):
+      with self.assertRaises(TypeError):
+         CommandStreamWriter("")
+
+   def test_hex_bytearray(self):
+      output = bytearray()
+      self.Write(CommandStreamWriter(output))
+      self.assertEqual(bytes(output), self.expected)
+
+   def test_binary_stream(self):
+      output = io.BytesIO()
+      self.Write(CommandStreamWriter(output, binary=True))
+      self.assertEqual(output.getvalue(), bytes.fromhex(self.expected.decode()))
+
+   def test_text_stream_buffering(self):
+      output = io.StringIO()
+      writer = CommandStreamWriter(output, bufferSize=4)
+
+      writer.clear()
+      self.assertEqual(output.getvalue(), "")
+      writer.pen(True)
+      self.assertEqual(output.getvalue(), "F0804001")
+
+   def test_closed(self):
+      writer = CommandStreamWriter(bytearray())
+      writer.close()
+
+      with self.assertRaises(ValueError):
+         writer.clear()
+
+   def test_roundtrip(self):
+      for binary, readerClass in ((False, BufferedHexStreamReader),
+                                  (True, BinaryStreamReader)):
+         stream = io.BytesIO()
+         self.Write(CommandStreamWriter(stream, binary=binary))
+         stream.seek(0)
+
+         out = io.StringIO()
+         VectorCommandStreamProcessor(
+            readerClass(stream), Sixteen14Codec, Board(Pen(), out),
+            REGISTERED_COMMANDS).run()
+
+         self.assertEqual(out.getvalue(),
+                          "CLR;\nCO 0 255 0 255;\nMV (0, 0);\nPEN DOWN;\n"
+                          "MV (4000, 4000);\nPEN UP;\n")
+
+   @unittest.skipIf(numpy is None, "numpy is not installed")
+   def test_numpy_moves(self):
+      output = bytearray()
+      with CommandStreamWriter(output) as writer:
+         writer.move(numpy.array([[0, 0], [4000, 4000]], dtype=numpy.int16))
+
+      self.assertEqual(bytes(output), b"C0400040005F205F20")
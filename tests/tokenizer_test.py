@@ -0,0 +1,85 @@
+import unittest
+
+from vectdraw.tokenizer import CommandTokenizer, Token, kByteClass
+from vectdraw.tokenizer import kCommandByte, kArgumentByte
+
+
+class TestCommandTokenizer(unittest.TestCase):
+
+   def setUp(self):
+      self.tokenizer = CommandTokenizer()
+
+   def test_byte_class_table(self):
+      self.assertEqual(len(kByteClass), 256)
+      self.assertEqual(kByteClass[0x7F], kArgumentByte)
+      self.assertEqual(kByteClass[0x80], kCommandByte)
+      self.assertEqual(kByteClass[0xFF], kCommandByte)
+
+   def test_single_block(self):
+      stream = bytes.fromhex("F0A04000417F4000417FC0400040008040")
+
+      self.assertListEqual(
+         list(self.tokenizer.Tokenize([stream])),
+         [Token(0xF0, b'', 0),
+          Token(0xA0, bytes.fromhex("4000417F4000417F"), 1),
+          Token(0xC0, bytes.fromhex("40004000"), 10),
+          Token(0x80, bytes.fromhex("40"), 15)])
+
+   def test_commands_spanning_blocks(self):
+      stream = bytes.fromhex("F0A04000417F4000417FC04000400080400180")
+      expected = list(CommandTokenizer().Tokenize([stream]))
+
+      for size in range(1, len(stream)):
+         blocks = [stream[i:i + size] for i in range(0, len(stream), size)]
+         self.assertListEqual(
+            list(CommandTokenizer().Tokenize(blocks)), expected,
+            msg="block size {}".format(size))
+
+   def test_leading_argument_bytes(self):
+      tokens = list(self.tokenizer.Tokenize(
+         [b'\x01\x02', memoryview(b'\x03\xf0\x01')]))
+
+      self.assertListEqual(tokens, [Token(0xF0, b'\x01', 3)])
+      self.assertEqual(self.tokenizer.skippedBytes, 3)
+
+   def test_feed_and_close(self):
+      self.assertListEqual(self.tokenizer.Feed(b'\x80\x40'), [])
+      self.assertListEqual(self.tokenizer.Feed(b'\x01\x80'),
+                           [Token(0x80, b'\x40\x01', 0)])
+      self.assertListEqual(self.tokenizer.Close(), [Token(0x80, b'', 3)])
+      self.assertListEqual(self.tokenizer.Close(), [])
+
+   def test_max_args(self):
+      stream = bytes.fromhex("C0400140024003400440" "F0" "80400140")
+
+      for size in range(1, len(stream) + 1):
+         tokenizer = CommandTokenizer(maxArgs=4)
+         blocks = [stream[i:i + size] for i in range(0, len(stream), size)]
+         self.assertListEqual(
+            list(tokenizer.Tokenize(blocks)),
+            [Token(0xC0, bytes.fromhex("40014002"), 0, True),
+             Token(0xC0, bytes.fromhex("40034004"), 0, True),
+             Token(0xC0, bytes.fromhex("40"), 0),
+             Token(0xF0, b'', 10),
+             Token(0x80, bytes.fromhex("400140"), 11)],
+            msg="block size {}".format(size))
+
+      with self.assertRaises(ValueError):
+         CommandTokenizer(maxArgs=0)
+
+   def test_complete(self):
+      # PEN takes 2 argument bytes: it is handed out at the end of the
+      # block completing it, and the bytes following it are skipped
+      tokenizer = CommandTokenizer(
+         complete=lambda command, size: command == 0x80 and size == 2)
+
+      self.assertListEqual(tokenizer.Feed(b'\xF0\x80\x40'),
+                           [Token(0xF0, b'', 0)])
+      self.assertListEqual(tokenizer.Feed(b'\x01'),
+                           [Token(0x80, b'\x40\x01', 1)])
+      self.assertEqual(tokenizer.PendingOffset(), 4)
+      self.assertListEqual(tokenizer.Feed(b'\x40\x00\x80\x40\x00\x40'),
+                           [])
+      self.assertListEqual(tokenizer.Close(),
+                           [Token(0x80, b'\x40\x00\x40', 6)])
+      self.assertEqual(tokenizer.skippedBytes, 2)
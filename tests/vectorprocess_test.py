@@ -0,0 +1,162 @@
+import unittest
+import io
+import sys
+
+from unittest.mock import patch
+
+try:
+   import numpy
+except ImportError:
+   numpy = None
+
+from vectdraw.diagnostics import StreamDiagnostics
+from vectdraw.process import VectorCommandStreamProcessor
+from vectdraw.vectorprocess import VectorizedCommandStreamProcessor
+from vectdraw.draw.board import Board, Pen
+from vectdraw.settings import REGISTERED_COMMANDS
+from vectdraw.hexstreamreader import BufferedHexStreamReader
+from vectdraw.hexstreamreader import BinaryStreamReader
+from vectdraw.scripts import main
+from vectdraw.streamwriter import CommandStreamWriter
+
+from sixteen14encoding.codec.sixteen14hex import Sixteen14Codec
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class TestVectorizedStreamProcessor(unittest.TestCase):
+   """
+   the vectorized engine must produce the output of the reference engine
+   """
+
+   def setUp(self):
+      stream = io.BytesIO()
+      with CommandStreamWriter(stream) as writer:
+         writer.clear()
+         writer.colour(255, 0, 0, 255)
+         writer.move([(0, 0)])
+         writer.pen(True)
+         writer.move([(i * 7 % 900 - 450, 300 - i * 11 % 600)
+                      for i in range(300)])
+         writer.compactMove([(1, 1), (1, 1), (1, 1), (-5, 2)])
+         writer.pen(False)
+         writer.move([(8000, 8000), (-8000, 100)])
+
+      self.hex = stream.getvalue().decode('ascii')
+
+   def Run(self, processorClass, reader, maxChunkArgs=None):
+      out = io.StringIO()
+      processor = processorClass(
+         reader, Sixteen14Codec, Board(Pen(), outputStream=out),
+         REGISTERED_COMMANDS)
+      if maxChunkArgs is not None:
+         processor.kMaxChunkArgs = maxChunkArgs
+
+      processor.run()
+      return out.getvalue()
+
+   def Compare(self, data, binary=False, blockSize=1 << 20,
+               maxChunkArgs=None):
+      readerClass = BinaryStreamReader if binary else BufferedHexStreamReader
+      stream = io.BytesIO if binary else io.StringIO
+      expected = self.Run(VectorCommandStreamProcessor,
+                          readerClass(stream(data), blockSize=blockSize))
+      output = self.Run(VectorizedCommandStreamProcessor,
+                        readerClass(stream(data), blockSize=blockSize),
+                        maxChunkArgs)
+      self.assertEqual(expected, output)
+      return output
+
+   def test_same_output(self):
+      self.assertTrue(self.Compare(self.hex).startswith("CLR;\nCO 255 0 0"))
+
+   def test_small_blocks(self):
+      # commands and their arguments span several blocks
+      for blockSize in (2, 3, 7, 64):
+         self.Compare(self.hex, blockSize=blockSize)
+
+   def test_chunked_commands(self):
+      # commands spanning blocks are executed in chunks
+      for blockSize in (3, 8, 64):
+         self.Compare(self.hex, blockSize=blockSize, maxChunkArgs=8)
+
+   def test_binary(self):
+      self.Compare(bytes.fromhex(self.hex), binary=True, blockSize=5)
+
+   def test_leading_bytes_and_odd_args(self):
+      with self.assertLogs(level='WARNING') as logs:
+         self.Compare("4000F0" + "804001" + "A0417F40004000417F7F",
+                      blockSize=3)
+
+      self.assertIn("Discarded odd trailing argument byte 7F",
+                    logs.output[-1])
+
+   def test_unrecognized_command(self):
+      with self.assertLogs(level='WARNING') as logs:
+         output = self.Compare("F0" + "E04000" + "804001")
+
+      self.assertEqual(output, "CLR;\nPEN DOWN;\n")
+      self.assertIn("Received unrecognized command byte E0",
+                    logs.output[-1])
+
+   def test_argument_count(self):
+      data = "F0" + "80" + "A0417F4000" + "8040" + "804001" + "80"
+      for blockSize in (3, 1 << 20):
+         with self.assertLogs(level='WARNING'):
+            output = self.Compare(data, blockSize=blockSize)
+         self.assertEqual(output, "CLR;\nPEN DOWN;\n")
+
+      with self.assertLogs(level='WARNING'):
+         self.Compare("A0417F40004000417F" + "80" + "4001" * 6 + "F0",
+                      blockSize=3, maxChunkArgs=4)
+
+   def test_diagnostic_offsets(self):
+      # offsets are stream offsets of the command byte, also for commands
+      # carried across blocks and split into chunks
+      data = ("4000E04000" + self.hex[:398] + "7F" + "E0" + self.hex[398:] +
+              "E07F")
+
+      def Summary(processorClass, blockSize, maxChunkArgs=None):
+         diagnostics = StreamDiagnostics()
+         processor = processorClass(
+            BufferedHexStreamReader(io.StringIO(data), blockSize=blockSize),
+            Sixteen14Codec, Board(Pen(), outputStream=io.StringIO()),
+            REGISTERED_COMMANDS, diagnostics=diagnostics)
+         if maxChunkArgs is not None:
+            processor.kMaxChunkArgs = maxChunkArgs
+
+         with self.assertLogs(level='WARNING'):
+            processor.run()
+         # the order of first occurrence may differ within a segment
+         return sorted(diagnostics.Summary())
+
+      expected = Summary(VectorCommandStreamProcessor, 1 << 20)
+      self.assertEqual(len(expected), 2)
+      for blockSize, maxChunkArgs in ((1 << 20, None), (5, None), (7, 8),
+                                      (64, 4)):
+         self.assertEqual(
+            Summary(VectorizedCommandStreamProcessor, blockSize,
+                    maxChunkArgs), expected)
+
+   def test_records(self):
+      processor = VectorizedCommandStreamProcessor(
+         BufferedHexStreamReader(io.StringIO("")), Sixteen14Codec,
+         Board(Pen(), outputStream=io.StringIO()), REGISTERED_COMMANDS)
+
+      records = list(processor.Records(
+         [bytes.fromhex("C05F205F20"), bytes.fromhex("2000F0")]))
+
+      self.assertEqual(len(records), 2)
+      self.assertEqual(records[0][0], 0xC0)
+      self.assertEqual(records[0][1].dtype, numpy.int16)
+      self.assertEqual(records[0][1].tolist(), [4000, 4000, -4096])
+      self.assertEqual(records[1][0], 0xF0)
+
+   @patch('sys.argv', new=sys.argv[:1] + ['--engine', 'vectorized'])
+   def test_main(self):
+      with patch('sys.stdin', new=io.StringIO(self.hex)):
+         with patch('sys.stdout', new_callable=io.StringIO) as mock_stdout:
+            main()
+            self.assertEqual(
+               self.Run(VectorCommandStreamProcessor,
+                        BufferedHexStreamReader(io.StringIO(self.hex))),
+               mock_stdout.getvalue())
@@ -0,0 +1,169 @@
+"""
+asyncio processing of command streams: a processor reading an
+asyncio.StreamReader and drawing to an asyncio.StreamWriter, so many
+streams can be processed concurrently on one event loop
+"""
+
+import asyncio
+
+from vectdraw.diagnostics import StreamDiagnostics
+from vectdraw.draw.board import Board, Pen
+from vectdraw.hexstreamreader import HexBlockDecoder, HexStreamReader
+from vectdraw.process import VectorCommandStreamProcessor
+from vectdraw.settings import REGISTERED_COMMANDS
+from vectdraw.tokenizer import CommandTokenizer
+
+
+class AsyncStreamReader(HexStreamReader):
+   """
+   Reader of a command stream received on an asyncio.StreamReader, as hex
+   encoded text or, if binary, raw byte values. ReadBlocks is an
+   asynchronous generator; the reader can't be iterated byte by byte
+   """
+
+   kDefaultBlockSize = 1 << 16
+
+   def __init__(self, stream, binary=False, blockSize=kDefaultBlockSize):
+      """
+      :param stream: asyncio.StreamReader of the command stream
+      :param binary: True if the stream holds raw byte values
+      :param blockSize: maximum number of bytes read from stream at a time
+      """
+      super().__init__(stream)
+      self.binary = binary
+      self.blockSize = blockSize
+
+   def close(self):
+      """
+      stops reading. The stream is owned by its connection, which closes
+      it
+      """
+      self.closed = True
+
+   def __next__(self):
+      raise TypeError("{} can only be read with ReadBlocks"
+                      .format(type(self).__name__))
+
+   async def ReadBlocks(self, diagnostics=None, trackPositions=False):
+      """
+      asynchronous generator yielding the stream as blocks of raw byte
+      values, as they are received
+      :param diagnostics: StreamDiagnostics collecting invalid hex input,
+                          see HexBlockDecoder
+      :param trackPositions: unused, positions can't be tracked
+      """
+      decoder = None if self.binary else HexBlockDecoder(diagnostics)
+      while not self.closed:
+         block = await self.stream.read(self.blockSize)
+         if not block:
+            break
+
+         yield block if decoder is None else decoder.Feed(block)
+
+      if decoder is not None:
+         decoder.Close()
+
+      self.closed = True
+
+
+class AsyncStreamOutput(object):
+   """
+   Text output stream of a Board writing to an asyncio.StreamWriter.
+   write() buffers the text, and flush() hands it to the writer in one
+   piece, rather than issuing a transport write per line; Boards writing
+   to it shouldn't flush after every command. Drain() flushes and waits
+   until the writer's transport is below its high water mark
+   """
+
+   def __init__(self, writer, encoding='ascii'):
+      """
+      :param writer: asyncio.StreamWriter to write to
+      :param encoding: encoding of the written text
+      """
+      self.writer = writer
+      self.encoding = encoding
+      self.buffer = []
+
+   def write(self, text):
+      self.buffer.append(text)
+      return len(text)
+
+   def flush(self):
+      if self.buffer:
+         self.writer.write(''.join(self.buffer).encode(self.encoding))
+         self.buffer = []
+
+   async def Drain(self):
+      self.flush()
+      await self.writer.drain()
+
+
+class AsyncCommandStreamProcessor(VectorCommandStreamProcessor):
+   """
+   VectorCommandStreamProcessor whose run() is a coroutine reading an
+   AsyncStreamReader. Each block is tokenized and executed as it is
+   received; in between, run() drains the board's output, if it is an
+   AsyncStreamOutput, and yields to the event loop, so a fast stream
+   doesn't starve the other tasks and a slow peer holds back the reading
+   of its stream.
+
+   Checkpoints aren't supported, as an asyncio stream can't seek.
+   """
+
+   async def run(self):
+      """
+      processes the stream like VectorCommandStreamProcessor.run, reading
+      it with the event loop
+      """
+      tokenizer = self.tokenizer = CommandTokenizer(self.kMaxChunkArgs)
+      self.dropping = False
+      self.heldArgs = b''
+
+      drain = getattr(self.vectorBoard.outputStream, 'Drain', None)
+      try:
+         async for block in self.streamreader.ReadBlocks(self.diagnostics):
+            self.__Dispatch(tokenizer.Feed(block))
+            if drain is not None:
+               await drain()
+
+            await asyncio.sleep(0)
+
+         self.__Dispatch(tokenizer.Close())
+         if drain is not None:
+            await drain()
+      except BaseException:
+         # hand the output of the commands executed so far to the writer
+         self.vectorBoard.outputStream.flush()
+         raise
+      finally:
+         self.diagnostics.Report(self.logger)
+
+   def __Dispatch(self, tokens):
+      """
+      executes the board methods of the commands of tokens
+      """
+      for commandByte, args, partial in self.TokenRecords(tokens):
+         self.Dispatch(commandByte, args, partial)
+
+
+async def ProcessStream(reader, writer, encodingClass, binary=False,
+                        commands=REGISTERED_COMMANDS, strict=False,
+                        blockSize=AsyncStreamReader.kDefaultBlockSize):
+   """
+   draws the command stream received on reader, writing the output to
+   writer. The writer isn't closed
+   :param reader: asyncio.StreamReader of the command stream
+   :param writer: asyncio.StreamWriter to write the output to
+   :param encodingClass: codec decoding the arguments
+   :param binary: True if the stream holds raw byte values
+   :param commands: sequence of Command classes to register
+   :param strict: raise MalformedInputError on the first malformed input
+   :param blockSize: maximum number of bytes read from reader at a time
+   """
+   board = Board(Pen(), outputStream=AsyncStreamOutput(writer),
+                 autoFlush=False)
+   processor = AsyncCommandStreamProcessor(
+      AsyncStreamReader(reader, binary, blockSize), encodingClass, board,
+      commands, diagnostics=StreamDiagnostics(strict=strict))
+
+   await processor.run()
@@ -0,0 +1,250 @@
+"""
+drawing of many command files by one pool of worker processes, which
+import vectdraw and load the plugin commands once
+"""
+
+import collections
+import concurrent.futures
+import glob
+import logging
+import os
+import sys
+import time
+
+from sixteen14encoding.codec.sixteen14hex import Sixteen14Codec
+from vectdraw.commands.plugins import WithPluginCommands
+from vectdraw.compression import OpenOutputFile
+from vectdraw.diagnostics import StreamDiagnostics
+from vectdraw.draw.board import Board, Pen
+from vectdraw.process import VectorCommandStreamProcessor
+from vectdraw.scripts import OpenReader
+from vectdraw.settings import REGISTERED_COMMANDS, kDefaultOutputTemplate
+
+logger = logging.getLogger(__name__)
+
+# number of files sent to a worker at once, so small files don't cost a
+# round trip each
+kFilesPerTask = 16
+
+kMegabyte = 1 << 20
+
+
+def BatchFiles(source, template=kDefaultOutputTemplate):
+   """
+   lists the files of a batch. source is either a glob pattern of input
+   files, or the path of a manifest holding one input path per line,
+   optionally followed by a tab and its output path. Blank lines and lines
+   starting with # are skipped, and so are files whose output path is
+   their input path, which would be truncated before it is read, or the
+   output path of an earlier file, with an error logged
+   :param source: glob pattern or manifest path
+   :param template: output path template of inputs without an output
+                    path, see OutputPath
+   :return: list of (input path, output path) tuples
+   :raises OSError: if the manifest can't be read
+   """
+   if glob.escape(source) != source:
+      return _CheckOutputs([(path, OutputPath(template, path))
+                            for path in sorted(glob.glob(source,
+                                                         recursive=True))
+                            if os.path.isfile(path)])
+
+   files = []
+   with open(source) as manifest:
+      for line in manifest:
+         line = line.rstrip('\r\n')
+         if not line.strip() or line.startswith('#'):
+            continue
+
+         path, _, output = line.partition('\t')
+         files.append((path, output or OutputPath(template, path)))
+
+   return _CheckOutputs(files)
+
+
+def OutputPath(template, path):
+   """
+   :param template: format string of the output path, with the fields
+                    {dir} (directory of path, or "."), {name} (file name of
+                    path without its extension) and {ext} (its extension)
+   :param path: input path
+   :return: output path of path
+   """
+   directory, fileName = os.path.split(path)
+   name, ext = os.path.splitext(fileName)
+   return template.format(dir=directory or '.', name=name, ext=ext)
+
+
+def _CheckOutputs(files):
+   """
+   drops the files whose output path is their input path or the output
+   path of an earlier file, logging an error for each
+   :param files: list of (input path, output path) tuples
+   :return: list of the other (input path, output path) tuples
+   """
+   checked = []
+   outputs = {}
+   for path, output in files:
+      key = os.path.normcase(os.path.abspath(output))
+      if _SameFile(path, output):
+         logger.error("{}: skipped, as its output path is the input path"
+                      .format(path))
+      elif key in outputs:
+         logger.error("{}: skipped, as its output path {} is the output "
+                      "path of {}".format(path, output, outputs[key]))
+      else:
+         outputs[key] = path
+         checked.append((path, output))
+
+   return checked
+
+
+def _SameFile(first, second):
+   """
+   :return: True if the paths first and second are the same file, or the
+            same path if either doesn't exist
+   """
+   try:
+      return os.path.samefile(first, second)
+   except OSError:
+      return (os.path.normcase(os.path.abspath(first)) ==
+              os.path.normcase(os.path.abspath(second)))
+
+
+def RunBatch(files, jobs, binary=False, strict=False, engine='stream',
+             filesPerTask=kFilesPerTask, reportStream=sys.stderr):
+   """
+   draws every input file of files to its output file, on jobs worker
+   processes (in the calling process if jobs is 1). The workers stay up
+   for the whole batch. A file that fails is logged as an error and the
+   batch goes on; the malformed input warnings of a file are logged with
+   its path. The number of files, failures and the throughput are written
+   to reportStream at the end
+   :param files: list of (input path, output path) tuples
+   :param jobs: number of worker processes
+   :param binary: read the inputs as raw binary
+   :param strict: fail a file on its first malformed input
+   :param engine: "stream" or "vectorized"
+   :param filesPerTask: number of files sent to a worker at once
+   :param reportStream: text stream the summary is written to
+   :return: number of files that failed
+   """
+   options = (binary, strict, engine)
+   totals = {'files': 0, 'failed': 0, 'bytes': 0}
+
+   def Report(results):
+      for path, size, warnings, error in results:
+         totals['files'] += 1
+         totals['bytes'] += size
+         for warning in warnings:
+            logger.warning("{}: {}".format(path, warning))
+         if error is not None:
+            totals['failed'] += 1
+            logger.error("{}: {}".format(path, error))
+
+   tasks = [files[start:start + filesPerTask]
+            for start in range(0, len(files), filesPerTask)]
+
+   start = time.perf_counter()
+   if jobs == 1:
+      _InitWorker(*options)
+      for task in tasks:
+         Report(_DrawFiles(task))
+   else:
+      with concurrent.futures.ProcessPoolExecutor(
+            jobs, initializer=_InitWorker, initargs=options) as executor:
+         inFlight = collections.deque()
+         for task in tasks:
+            inFlight.append(executor.submit(_DrawFiles, task))
+            if len(inFlight) > 2 * jobs:
+               Report(inFlight.popleft().result())
+
+         while inFlight:
+            Report(inFlight.popleft().result())
+   elapsed = max(time.perf_counter() - start, 1e-9)
+
+   reportStream.write(
+      "{} files, {} failed, {:.1f} MB in {:.2f}s: {:.1f} files/s, "
+      "{:.2f} MB/s\n".format(
+         totals['files'], totals['failed'], totals['bytes'] / kMegabyte,
+         elapsed, totals['files'] / elapsed,
+         totals['bytes'] / kMegabyte / elapsed))
+   reportStream.flush()
+
+   return totals['failed']
+
+
+class _WarningCollector(logging.Handler):
+   """
+   keeps the messages of the records logged to a file's processor
+   """
+
+   def __init__(self):
+      super().__init__(logging.WARNING)
+      self.messages = []
+
+   def emit(self, record):
+      self.messages.append(record.getMessage())
+
+
+# set up by _InitWorker in every worker process
+_worker = None
+
+
+def _InitWorker(binary, strict, engine):
+   """
+   imports the engine and loads the plugin commands of a worker process
+   """
+   global _worker
+
+   processorClass = VectorCommandStreamProcessor
+   if engine == 'vectorized':
+      from vectdraw.vectorprocess import VectorizedCommandStreamProcessor
+      processorClass = VectorizedCommandStreamProcessor
+
+   _worker = (processorClass, Sixteen14Codec(),
+              WithPluginCommands(REGISTERED_COMMANDS), OpenReader, binary,
+              strict)
+
+
+def _DrawFiles(files):
+   """
+   draws files in a worker process
+   :param files: list of (input path, output path) tuples
+   :return: list of (input path, input size, warnings, error) tuples, where
+            error is None for files drawn without error
+   """
+   processorClass, codec, commands, OpenReader, binary, strict = _worker
+
+   results = []
+   for path, output in files:
+      size = 0
+      collector = _WarningCollector()
+      try:
+         size = os.path.getsize(path)
+         directory = os.path.dirname(output)
+         if directory:
+            os.makedirs(directory, exist_ok=True)
+
+         with open(path) as inputFile, OpenOutputFile(output) as outputFile:
+            reader = OpenReader(inputFile, binary)
+            try:
+               processor = processorClass(
+                  reader, codec,
+                  Board(Pen(), outputStream=outputFile, autoFlush=False),
+                  commands, plugins=False,
+                  diagnostics=StreamDiagnostics(strict=strict))
+
+               processor.logger = logging.Logger(processorClass.__name__)
+               processor.logger.addHandler(collector)
+               processor.run()
+            finally:
+               reader.close()
+
+         error = None
+      except Exception as e:
+         error = "{}: {}".format(type(e).__name__, e)
+
+      results.append((path, size, collector.messages, error))
+
+   return results
@@ -0,0 +1,101 @@
+"""
+periodic checkpoints of a command stream processor's progress, so a long
+run can be resumed after being interrupted
+"""
+
+import json
+import os
+import time
+
+
+kVersion = 2
+
+
+class Checkpointer(object):
+   """
+   Writes the state of a run to a small JSON file (see
+   VectorCommandStreamProcessor.Checkpoint): the position of the input,
+   the offset of the output and the state of the board. A checkpoint is
+   due once everyBytes bytes of the stream were processed or everySeconds
+   seconds passed since the last one, whichever comes first.
+
+   The file is replaced atomically, so an interrupted run leaves either the
+   previous checkpoint or the new one. The output is flushed before each
+   checkpoint, so everything before the output offset is in the file.
+   """
+
+   kDefaultBytes = 1 << 26  # 64 MiB
+   kDefaultSeconds = 60.0
+
+   def __init__(self, path, everyBytes=kDefaultBytes,
+                everySeconds=kDefaultSeconds, source=None):
+      """
+      :param path: path of the checkpoint file
+      :param everyBytes: stream bytes between checkpoints, or None
+      :param everySeconds: seconds between checkpoints, or None
+      :param source: JSON serializable identity of the input (e.g. its
+                     path), checked when loading the checkpoint
+      """
+      self.path = path
+      self.everyBytes = everyBytes
+      self.everySeconds = everySeconds
+      self.source = source
+
+      self.lastOffset = 0
+      self.lastTime = time.monotonic()
+
+   def Due(self, offset):
+      """
+      :param offset: stream offset processed up to
+      :return: True if a checkpoint is due
+      """
+      return ((self.everyBytes is not None and
+               offset - self.lastOffset >= self.everyBytes) or
+              (self.everySeconds is not None and
+               time.monotonic() - self.lastTime >= self.everySeconds))
+
+   def Write(self, state):
+      """
+      writes a checkpoint
+      :param state: JSON serializable dict of the state of the run, whose
+                    "input" entry holds the stream "offset"
+      """
+      state = dict(state, version=kVersion, source=self.source)
+
+      temporary = '{}.{}.tmp'.format(self.path, os.getpid())
+      try:
+         with open(temporary, 'w') as f:
+            json.dump(state, f)
+
+         os.replace(temporary, self.path)
+      finally:
+         if os.path.exists(temporary):
+            os.remove(temporary)
+
+      self.lastOffset = state["input"]["offset"]
+      self.lastTime = time.monotonic()
+
+   def Load(self):
+      """
+      reads the last checkpoint, counting the next one from it
+      :return: dict of the state of the run, as given to Write
+      :raises ValueError: if there is no valid checkpoint of source
+      """
+      try:
+         with open(self.path) as f:
+            state = json.load(f)
+      except OSError as e:
+         raise ValueError("can't read checkpoint {}: {}".format(self.path, e))
+      except ValueError as e:
+         raise ValueError("malformed checkpoint {}: {}".format(self.path, e))
+
+      if not isinstance(state, dict) or state.get("version") != kVersion:
+         raise ValueError("unsupported checkpoint {}".format(self.path))
+
+      if state.get("source") != self.source:
+         raise ValueError("checkpoint {} is of another input: {}"
+                          .format(self.path, state.get("source")))
+
+      self.lastOffset = state["input"]["offset"]
+      self.lastTime = time.monotonic()
+      return state
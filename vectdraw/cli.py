@@ -4,11 +4,116 @@ handle command line arguments
 
 
 import argparse
+import os
+import sys
+
+from vectdraw.checkpoint import Checkpointer
+from vectdraw.compression import OpenOutputFile, kExtensions
+from vectdraw.index import CommandIndex
+from vectdraw.protocol import DefaultSocketPath
+from vectdraw.settings import DefaultQueuePath, kDefaultAttempts
+from vectdraw.settings import kDefaultLease, kDefaultOutputTemplate
 
 
 __description = """byte encoded vector based drawing system"""
-__fParameterDescription = "path to byte command file"
-__oParameterDescription = "path to output file"
+__fParameterDescription = ("path to byte command file. gzip, bz2 and xz "
+                           "compressed files are decompressed on the fly")
+__oParameterDescription = ("path to output file. Paths ending in .gz, .bz2 "
+                           "or .xz are compressed accordingly")
+__binaryParameterDescription = ("read command bytes as raw binary instead of "
+                                "hex encoded text")
+__engineParameterDescription = ("parse engine: 'stream' (default) tokenizes "
+                                "the input block by block, 'vectorized' "
+                                "segments whole blocks with numpy")
+__compileParameterDescription = ("also compile the input file to a .vdc "
+                                 "sidecar next to it. Later runs on the "
+                                 "unchanged file replay the sidecar instead "
+                                 "of parsing the file")
+__strictParameterDescription = ("fail on the first malformed input instead "
+                                "of skipping it and summarizing it at the "
+                                "end of the run")
+__checkpointParameterDescription = ("path of a state file to write periodic "
+                                    "checkpoints of the run to. Requires "
+                                    "-f and -o files")
+__checkpointBytesParameterDescription = (
+   "stream bytes between checkpoints (default {})"
+   .format(Checkpointer.kDefaultBytes))
+__checkpointSecondsParameterDescription = (
+   "seconds between checkpoints (default {:g})"
+   .format(Checkpointer.kDefaultSeconds))
+__resumeParameterDescription = ("continue the run from the last checkpoint "
+                                "given with --checkpoint, seeking the input "
+                                "and output files. Without a checkpoint "
+                                "file, the run starts from the beginning")
+__rangeParameterDescription = ("only draw commands START to END (excluded), "
+                               "numbered from 0. Either may be omitted. The "
+                               "run starts from the closest keyframe of the "
+                               "index written by 'vectdraw index', which is "
+                               "built first if missing")
+__pipelineParameterDescription = ("read and decompress the input on a reader "
+                                  "thread and write the output on a writer "
+                                  "thread, so a slow input or output doesn't "
+                                  "stall drawing")
+__jobsParameterDescription = ("draw the input on N processes, cut into "
+                              "segments at CLR commands. The output is the "
+                              "same as with one process (default 1)")
+__moveJobsParameterDescription = ("draw the points of very long moves on N "
+                                  "processes, cut into chunks. The output "
+                                  "is the same as with one process "
+                                  "(default 1)")
+__followParameterDescription = ("once the input file is drawn, keep drawing "
+                                "the commands appended to it until "
+                                "interrupted. The last command is drawn once "
+                                "the next one begins, as its arguments may "
+                                "still grow")
+__followTimeoutParameterDescription = ("stop following after S seconds "
+                                       "without new data")
+__batchParameterDescription = ("draw every file of SOURCE, a glob pattern of "
+                               "input files or a manifest of input paths, "
+                               "each optionally followed by a tab and its "
+                               "output path, on a pool of --jobs processes. "
+                               "Failed files are reported and skipped")
+__batchOutputParameterDescription = ("output path of batch inputs without "
+                                     "one, with the fields {{dir}}, {{name}} "
+                                     "and {{ext}} of the input path "
+                                     "(default {})"
+                                     .format(kDefaultOutputTemplate))
+__serveParameterDescription = ("run as a daemon drawing the streams sent by "
+                               "vectdraw-client over the Unix domain socket "
+                               "PATH (default ${} or {})"
+                               .format("VECTDRAW_SOCKET",
+                                       DefaultSocketPath()))
+
+__indexDescription = ("write a seekable index (.vdi) of the commands of a "
+                      "file next to it, with keyframes of the board state, "
+                      "for --range")
+__indexFParameterDescription = "path to byte command file"
+__everyParameterDescription = ("number of commands between keyframes "
+                               "(default {})"
+                               .format(CommandIndex.kDefaultEvery))
+
+__queueDescription = ("queue vectdraw runs in a sqlite database that "
+                      "workers on any host sharing its filesystem drain")
+__dbParameterDescription = ("path to the queue database (default ${} or {})"
+                            .format("VECTDRAW_QUEUE", DefaultQueuePath()))
+__submitDescription = "queue a run for every file of a batch"
+__sourceParameterDescription = ("glob pattern of input files, or manifest of "
+                                "input paths, each optionally followed by a "
+                                "tab and its output path")
+__attemptsParameterDescription = ("number of times a job is claimed before "
+                                  "it fails, when its workers die (default "
+                                  "{})".format(kDefaultAttempts))
+__workDescription = ("run queued jobs until the queue is drained. Jobs of "
+                     "workers that died are run again")
+__leaseParameterDescription = ("seconds a job stays claimed by a worker "
+                               "that stopped sending heartbeats (default "
+                               "{:g})".format(kDefaultLease))
+__waitParameterDescription = "keep polling for new jobs once drained"
+__pollParameterDescription = ("seconds between polls while no job can be "
+                              "claimed (default 1)")
+__statusDescription = ("print the number of jobs in each state and the "
+                       "errors of failed jobs")
+__listParameterDescription = "also list every job"
 
 
 def ParseArgs():
@@ -20,7 +125,12 @@ def ParseArgs():
    Raises file related exceptions (IOError, etc)
 
    returns args in the format:
-   {"f": _io.FileIO, "o": _io.TextIOWrapper}
+   {"f": _io.FileIO, "o": _io.TextIOWrapper, "binary": bool, "engine": str,
+    "compile": bool, "strict": bool, "checkpoint": str,
+    "checkpoint_bytes": int, "checkpoint_seconds": float, "resume": bool,
+    "range": (int, int or None), "pipeline": bool, "jobs": int,
+    "move_jobs": int, "follow": bool, "follow_timeout": float,
+    "batch": str, "batch_output": str, "serve": str}
 
    :return: dict containing parsed arguments
    """
@@ -29,8 +139,290 @@ def ParseArgs():
       "-f", nargs="?", default="-", type=argparse.FileType('r'),
       help=__fParameterDescription)
 
+   # opened once the arguments are parsed, see OutputFileType
+   parser.add_argument(
+      "-o", nargs="?", default="-", help=__oParameterDescription)
+
+   parser.add_argument(
+      "--binary", action="store_true", help=__binaryParameterDescription)
+
+   parser.add_argument(
+      "--engine", choices=("stream", "vectorized"), default="stream",
+      help=__engineParameterDescription)
+
+   parser.add_argument(
+      "--compile", action="store_true", help=__compileParameterDescription)
+
+   parser.add_argument(
+      "--strict", action="store_true", help=__strictParameterDescription)
+
+   parser.add_argument(
+      "--checkpoint", metavar="PATH", help=__checkpointParameterDescription)
+
+   parser.add_argument(
+      "--checkpoint-bytes", type=int, default=Checkpointer.kDefaultBytes,
+      metavar="N", help=__checkpointBytesParameterDescription)
+
+   parser.add_argument(
+      "--checkpoint-seconds", type=float,
+      default=Checkpointer.kDefaultSeconds, metavar="S",
+      help=__checkpointSecondsParameterDescription)
+
+   parser.add_argument(
+      "--resume", action="store_true", help=__resumeParameterDescription)
+
+   parser.add_argument(
+      "--range", type=RangeType, metavar="START:END",
+      help=__rangeParameterDescription)
+
+   parser.add_argument(
+      "--pipeline", action="store_true", help=__pipelineParameterDescription)
+
+   parser.add_argument(
+      "--jobs", type=int, default=1, metavar="N",
+      help=__jobsParameterDescription)
+
+   parser.add_argument(
+      "--move-jobs", type=int, default=1, metavar="N",
+      help=__moveJobsParameterDescription)
+
+   parser.add_argument(
+      "--follow", action="store_true", help=__followParameterDescription)
+
+   parser.add_argument(
+      "--follow-timeout", type=float, metavar="S",
+      help=__followTimeoutParameterDescription)
+
+   parser.add_argument(
+      "--batch", metavar="SOURCE", help=__batchParameterDescription)
+
+   parser.add_argument(
+      "--batch-output", default=kDefaultOutputTemplate, metavar="TEMPLATE",
+      help=__batchOutputParameterDescription)
+
+   parser.add_argument(
+      "--serve", nargs="?", const=DefaultSocketPath(), metavar="PATH",
+      help=__serveParameterDescription)
+
+   args = parser.parse_args()
+   if args.compile and args.f is sys.stdin:
+      parser.error("--compile requires an input file given with -f")
+
+   if args.resume and not args.checkpoint:
+      parser.error("--resume requires a checkpoint given with --checkpoint")
+
+   if args.checkpoint:
+      if args.f is sys.stdin or args.o == '-':
+         parser.error("--checkpoint requires input and output files given "
+                      "with -f and -o")
+      if args.compile:
+         parser.error("--checkpoint can't be combined with --compile")
+      if os.path.splitext(args.o)[1].lower() in kExtensions:
+         parser.error("--checkpoint can't resume compressed output")
+
+      # a run interrupted before its first checkpoint starts over,
+      # truncating its output
+      if args.resume and not os.path.exists(args.checkpoint):
+         args.resume = False
+
+   if args.range:
+      if args.f is sys.stdin:
+         parser.error("--range requires an input file given with -f")
+      if args.checkpoint or args.compile:
+         parser.error("--range can't be combined with --checkpoint or "
+                      "--compile")
+
+   if args.pipeline and (args.checkpoint or args.compile or args.range):
+      parser.error("--pipeline can't be combined with --checkpoint, "
+                   "--compile or --range")
+
+   if args.jobs < 1:
+      parser.error("--jobs must be at least 1")
+
+   if args.jobs > 1 and (args.checkpoint or args.compile or args.range or
+                         args.pipeline):
+      parser.error("--jobs can't be combined with --checkpoint, --compile, "
+                   "--range or --pipeline")
+
+   if args.move_jobs < 1:
+      parser.error("--move-jobs must be at least 1")
+
+   if args.move_jobs > 1 and args.jobs > 1:
+      parser.error("--move-jobs can't be combined with --jobs")
+
+   if args.follow:
+      if args.f is sys.stdin:
+         parser.error("--follow requires an input file given with -f")
+      if (args.compile or args.checkpoint or args.range or args.pipeline or
+            args.jobs > 1):
+         parser.error("--follow can't be combined with --compile, "
+                      "--checkpoint, --range, --pipeline or --jobs")
+      if not os.path.isfile(args.f.name):
+         parser.error("--follow requires a regular file")
+
+   if args.follow_timeout is not None and (not args.follow or
+                                           args.follow_timeout < 0):
+      parser.error("--follow-timeout requires --follow and a non negative "
+                   "number of seconds")
+
+   if args.batch and (args.f is not sys.stdin or args.o != '-' or
+                      args.compile or args.checkpoint or args.range or
+                      args.pipeline or args.move_jobs > 1 or args.serve):
+      parser.error("--batch can't be combined with -f, -o, --compile, "
+                   "--checkpoint, --range, --pipeline, --move-jobs or "
+                   "--serve")
+
+   if args.serve and (args.f is not sys.stdin or args.o != '-' or
+                      args.binary or args.strict or args.compile or
+                      args.checkpoint or args.range or args.pipeline or
+                      args.jobs > 1 or args.move_jobs > 1 or
+                      args.engine != "stream"):
+      parser.error("--serve takes no other arguments: clients choose "
+                   "their own")
+
+   try:
+      args.o = OutputFileType(args.o, resume=args.resume)
+   except argparse.ArgumentTypeError as e:
+      parser.error("argument -o: {}".format(e))
+
+   return vars(args)
+
+
+def ParseIndexArgs(argv):
+   """
+   parses and validates the arguments of 'vectdraw index'
+
+   returns args in the format:
+   {"f": _io.TextIOWrapper, "binary": bool, "every": int}
+
+   :param argv: arguments following 'index'
+   :return: dict containing parsed arguments
+   """
+   parser = argparse.ArgumentParser(prog="vectdraw index",
+                                    description=__indexDescription)
+   parser.add_argument(
+      "-f", required=True, type=argparse.FileType('r'),
+      help=__indexFParameterDescription)
+
+   parser.add_argument(
+      "--binary", action="store_true", help=__binaryParameterDescription)
+
    parser.add_argument(
-      "-o", nargs="?", default="-", type=argparse.FileType("w"),
-      help=__oParameterDescription)
+      "--every", type=int, default=CommandIndex.kDefaultEvery, metavar="N",
+      help=__everyParameterDescription)
+
+   args = parser.parse_args(argv)
+   if args.f is sys.stdin:
+      parser.error("the input must be a file")
+   if args.every < 1:
+      parser.error("--every must be at least 1")
+
+   return vars(args)
+
+
+def ParseQueueArgs(argv):
+   """
+   parses and validates the arguments of 'vectdraw queue'
+
+   returns args in the format:
+   {"action": "submit", "db": str, "source": str, "output": str,
+    "binary": bool, "strict": bool, "engine": str, "attempts": int}
+   {"action": "work", "db": str, "lease": float, "wait": bool,
+    "poll": float}
+   {"action": "status", "db": str, "list": bool}
+
+   :param argv: arguments following 'queue'
+   :return: dict containing parsed arguments
+   """
+   parser = argparse.ArgumentParser(prog="vectdraw queue",
+                                    description=__queueDescription)
+   actions = parser.add_subparsers(dest="action", required=True)
+
+   submit = actions.add_parser("submit", description=__submitDescription)
+   submit.add_argument("source", help=__sourceParameterDescription)
+   submit.add_argument(
+      "--output", default=kDefaultOutputTemplate, metavar="TEMPLATE",
+      help=__batchOutputParameterDescription)
+   submit.add_argument(
+      "--binary", action="store_true", help=__binaryParameterDescription)
+   submit.add_argument(
+      "--strict", action="store_true", help=__strictParameterDescription)
+   submit.add_argument(
+      "--engine", choices=("stream", "vectorized"), default="stream",
+      help=__engineParameterDescription)
+   submit.add_argument(
+      "--attempts", type=int, default=kDefaultAttempts,
+      metavar="N", help=__attemptsParameterDescription)
+
+   work = actions.add_parser("work", description=__workDescription)
+   work.add_argument(
+      "--lease", type=float, default=kDefaultLease, metavar="S",
+      help=__leaseParameterDescription)
+   work.add_argument(
+      "--wait", action="store_true", help=__waitParameterDescription)
+   work.add_argument(
+      "--poll", type=float, default=1.0, metavar="S",
+      help=__pollParameterDescription)
+
+   status = actions.add_parser("status", description=__statusDescription)
+   status.add_argument(
+      "--list", action="store_true", help=__listParameterDescription)
+
+   for action in (submit, work, status):
+      action.add_argument(
+         "--db", default=DefaultQueuePath(), metavar="PATH",
+         help=__dbParameterDescription)
+
+   args = parser.parse_args(argv)
+   if args.action == "submit" and args.attempts < 1:
+      parser.error("--attempts must be at least 1")
+   if args.action == "work" and (args.lease <= 0 or args.poll <= 0):
+      parser.error("--lease and --poll must be positive")
+
+   return vars(args)
+
+
+def RangeType(value):
+   """
+   argparse type parsing a START:END range of command numbers
+   :param value: range given on the command line
+   :return: tuple of start and end, None for an open end
+   """
+   start, separator, end = value.partition(':')
+   try:
+      if not separator:
+         raise ValueError()
+
+      start = int(start) if start else 0
+      end = int(end) if end else None
+   except ValueError:
+      raise argparse.ArgumentTypeError(
+         "expected START:END, received '{}'".format(value))
+
+   if start < 0 or (end is not None and end < start):
+      raise argparse.ArgumentTypeError(
+         "invalid range '{}'".format(value))
+
+   return start, end
+
+
+def OutputFileType(path, resume=False):
+   """
+   opens path for writing, compressing the output if path ends with a
+   compression extension. "-" is stdout
+   :param path: output path given on the command line
+   :param resume: open the existing, uncompressed file without truncating
+                  it, to be seeked to a checkpoint
+   :return: writable text file object
+   """
+   if path == '-':
+      return sys.stdout
+
+   try:
+      if resume:
+         return open(path, 'r+')
 
-   return vars(parser.parse_args())
\ No newline at end of file
+      return OpenOutputFile(path)
+   except OSError as e:
+      raise argparse.ArgumentTypeError(
+         "can't open '{}': {}".format(path, e))
@@ -0,0 +1,244 @@
+"""
+thin client of the vectdraw daemon (vectdraw --serve): takes the -f, -o,
+--binary and --strict arguments of vectdraw and has the daemon draw the
+stream. Without a listening daemon, the stream is drawn in process
+"""
+
+import json
+import os
+import socket
+import sys
+import threading
+
+from vectdraw.protocol import DefaultSocketPath, EncodeHeader, kFrameHeader
+from vectdraw.protocol import kExitFrame, kLogFrame, kOutputFrame
+
+
+kProgram = "vectdraw-client"
+kUsage = ("usage: {} [-h] [-f [F]] [-o [O]] [--binary] [--strict] "
+          "[--socket PATH]".format(kProgram))
+kHelp = """
+Draws a byte encoded vector command stream like vectdraw, with the vectdraw
+daemon started by 'vectdraw --serve'. If no daemon listens on the socket,
+the stream is drawn in process.
+
+optional arguments:
+  -h, --help     show this help message and exit
+  -f [F]         path to byte command file (default stdin)
+  -o [O]         path to output file (default stdout)
+  --binary       read command bytes as raw binary instead of hex encoded text
+  --strict       fail on the first malformed input
+  --socket PATH  socket of the daemon (default ${} or {})
+"""
+
+# input bytes sent to the daemon at a time
+kBlockSize = 1 << 16
+
+
+class UsageError(ValueError):
+   """
+   raised on invalid client arguments
+   """
+   pass
+
+
+def ParseClientArgs(argv):
+   """
+   parses the client arguments, without argparse to keep the client's
+   startup short
+
+   returns args in the format:
+   {"f": str, "o": str, "binary": bool, "strict": bool, "socket": str,
+    "help": bool}
+
+   :param argv: command line arguments
+   :return: dict containing parsed arguments
+   :raises UsageError: on unrecognized or incomplete arguments
+   """
+   args = {"f": "-", "o": "-", "binary": False, "strict": False,
+           "socket": DefaultSocketPath(), "help": False}
+   flags = {"--binary": "binary", "--strict": "strict", "-h": "help",
+            "--help": "help"}
+   options = {"-f": "f", "-o": "o", "--socket": "socket"}
+
+   index = 0
+   while index < len(argv):
+      argument = argv[index]
+      index += 1
+      name, separator, value = argument.partition('=')
+      if argument in flags:
+         args[flags[argument]] = True
+      elif name in options:
+         if not separator:
+            # -f and -o may be given without a value, like vectdraw's
+            missing = index == len(argv) or (argv[index].startswith('-') and
+                                             argv[index] != '-')
+            if missing and name == '--socket':
+               raise UsageError("argument --socket: expected one argument")
+            if missing:
+               continue
+
+            value = argv[index]
+            index += 1
+
+         args[options[name]] = value
+      else:
+         raise UsageError("unrecognized arguments: {}".format(argument))
+
+   return args
+
+
+def Request(sock, inputStream, outputStream, options, errorStream=None):
+   """
+   sends the command stream read from inputStream to the daemon connected
+   to sock, writing the output to outputStream and the logged warnings and
+   errors to errorStream
+   :param sock: socket connected to the daemon
+   :param inputStream: binary stream of the command stream
+   :param outputStream: binary stream to write the output to
+   :param options: dict of request options, see vectdraw.protocol.kOptions
+   :param errorStream: text stream for warnings and errors, default stderr
+   :return: exit status of the request
+   """
+   errorStream = errorStream if errorStream is not None else sys.stderr
+   failures = []
+
+   def Send():
+      try:
+         sock.sendall(EncodeHeader(options))
+         for block in iter(lambda: inputStream.read(kBlockSize), b''):
+            sock.sendall(block)
+         sock.shutdown(socket.SHUT_WR)
+      except OSError as e:
+         # the daemon stops reading on errors it reports itself
+         failures.append(e)
+
+   # the input is sent while the output is received, so neither side
+   # waits for the other's buffer to drain
+   sender = threading.Thread(target=Send, daemon=True)
+   sender.start()
+
+   replies = sock.makefile('rb')
+   try:
+      while True:
+         header = replies.read(kFrameHeader.size)
+         if len(header) < kFrameHeader.size:
+            break
+
+         kind, size = kFrameHeader.unpack(header)
+         payload = replies.read(size)
+         if len(payload) < size:
+            break
+
+         if kind == kOutputFrame:
+            outputStream.write(payload)
+            outputStream.flush()
+         elif kind == kLogFrame:
+            errorStream.write(payload.decode('utf-8', 'replace') + '\n')
+         elif kind == kExitFrame:
+            reply = json.loads(payload.decode('utf-8'))
+            if reply.get("error"):
+               errorStream.write("vectdraw: error: {}\n"
+                                 .format(reply["error"]))
+            return reply.get("status", 1)
+   finally:
+      replies.close()
+      sock.close()
+
+   error = failures[0] if failures else "the daemon closed the connection"
+   errorStream.write("{}: error: {}\n".format(kProgram, error))
+   return 1
+
+
+def main():
+   """
+   parses the client arguments and has the daemon draw the stream,
+   exiting with the status of the request
+   """
+   try:
+      args = ParseClientArgs(sys.argv[1:])
+   except UsageError as e:
+      sys.stderr.write("{}\n{}: error: {}\n".format(kUsage, kProgram, e))
+      sys.exit(2)
+
+   if args["help"]:
+      sys.stdout.write(kUsage + "\n" + kHelp.format(
+         "VECTDRAW_SOCKET", DefaultSocketPath()))
+      return
+
+   sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+   try:
+      sock.connect(args["socket"])
+   except (FileNotFoundError, ConnectionRefusedError):
+      sock.close()
+      LocalMain(args)
+      return
+
+   streams = {}
+   for name, stdio, Open in (("f", sys.stdin.buffer, OpenInput),
+                             ("o", sys.stdout.buffer, OpenOutput)):
+      try:
+         streams[name] = stdio if args[name] == '-' else Open(args[name])
+      except OSError as e:
+         sock.close()
+         sys.stderr.write("{}\n{}: error: argument -{}: can't open '{}': {}\n"
+                          .format(kUsage, kProgram, name, args[name], e))
+         sys.exit(2)
+
+   inputStream, outputStream = streams["f"], streams["o"]
+
+   try:
+      status = Request(sock, inputStream, outputStream, args)
+   finally:
+      for stream in (inputStream, outputStream):
+         if stream not in (sys.stdin.buffer, sys.stdout.buffer):
+            stream.close()
+
+   sys.exit(status)
+
+
+def OpenInput(path):
+   """
+   :param path: input path given on the command line
+   :return: binary file object of path. Compressed input is decompressed
+            by the daemon
+   """
+   return open(path, 'rb')
+
+
+def OpenOutput(path):
+   """
+   opens path for writing bytes, compressing them like vectdraw if path
+   ends with a compression extension
+   :param path: output path given on the command line
+   :return: writable binary file object
+   """
+   # imported here so runs writing to stdout don't pay for importing the
+   # codecs
+   from vectdraw.compression import kExtensions
+
+   module = kExtensions.get(os.path.splitext(path)[1].lower())
+   if module is None:
+      return open(path, 'wb')
+
+   return module.open(path, 'wb')
+
+
+def LocalMain(args):
+   """
+   draws the stream in process, as vectdraw does
+   :param args: parsed client arguments
+   """
+   from vectdraw.scripts import main as VectdrawMain
+
+   argv = [sys.argv[0], '-f', args["f"], '-o', args["o"]]
+   for flag in ("binary", "strict"):
+      if args[flag]:
+         argv.append("--" + flag)
+
+   sys.argv = argv
+   VectdrawMain()
+
+
+if __name__ == '__main__':
+   main()
@@ -1,4 +1,5 @@
 from .default import *
 
 
-__all__ = ['ClearCommand', 'PenUpDownCommand', 'SetColourCommand', 'MovePen']
+__all__ = ['ClearCommand', 'PenUpDownCommand', 'SetColourCommand', 'MovePen',
+           'CompactMovePen']
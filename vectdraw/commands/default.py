@@ -5,7 +5,8 @@ define commands and their parameter methods
 
 import logging
 
-from vectdraw.helpers import chunker
+from vectdraw.compact import DecodeMoves, MovesDecoder, kMaxRunLength
+from vectdraw.diagnostics import MalformedInputError, StreamDiagnostics
 from vectdraw.draw.board import Board
 from vectdraw.draw.plane import Point
 
@@ -17,6 +18,23 @@ class Command(object):
    commandByte = ""
    method = None
 
+   # if True, PrepareParameters receives the raw argument byte values
+   # instead of decoded arguments
+   rawArgs = False
+
+   # number of decoded arguments the command takes, or None for any
+   # number. Commands received with another number are skipped
+   argCount = None
+
+   # if True, StartChunks keeps no state between chunks besides the move
+   # of the board (see Board.GetMoveState), so a run checkpointed between
+   # two chunks can resume the command
+   resumableChunks = False
+
+   # StreamDiagnostics collecting the malformed arguments the command
+   # finds, set by the processor registering it, or None
+   diagnostics = None
+
    def PrepareParameters(self, *args):
       """
       receives a list of decoded bytes and prepares them for method
@@ -27,20 +45,62 @@ class Command(object):
       """
       return args
 
+   def Bind(self, board):
+      """
+      fuses PrepareParameters with the call to method of board, so that
+      executing a command costs a single call. Commands that don't
+      override PrepareParameters are bound to the board method itself
+      :param board: Board the command draws on
+      :return: callable receiving the decoded arguments of the command
+      """
+      method = getattr(board, self.method)
+      if type(self).PrepareParameters is Command.PrepareParameters:
+         return method
+
+      prepare = self.PrepareParameters
+
+      def Execute(*args):
+         return method(*prepare(*args))
+
+      return Execute
+
+   def StartChunks(self, board):
+      """
+      starts executing the command from arguments received in chunks, as
+      done for commands with long argument lists. By default, the chunks
+      are collected and the command is executed once all were received
+      :param board: Board the command draws on
+      :return: tuple of callables (feed, end). feed receives the arguments
+               of each chunk in order, end is called after the last chunk
+      """
+      execute = self.Bind(board)
+      chunks = []
+
+      def Feed(*args):
+         chunks.extend(args)
+
+      def End():
+         execute(*chunks)
+
+      return Feed, End
+
 
 class ClearCommand(Command):
    commandByte = "F0"
    method = 'clear'
+   argCount = 0
 
 
 class PenUpDownCommand(Command):
    commandByte = "80"
    method = 'ChangePenPosition'
+   argCount = 1
 
 
 class SetColourCommand(Command):
    commandByte = "A0"
    method = 'SetColour'
+   argCount = 4
 
    def PrepareParameters(self, r, g, b, a):
       """
@@ -53,10 +113,20 @@ class SetColourCommand(Command):
       """
       return r, g, b, a
 
+   def Bind(self, board):
+      """
+      PrepareParameters only checks for 4 arguments, which calling the
+      board method checks as well
+      :param board: Board the command draws on
+      :return: the board method
+      """
+      return getattr(board, self.method)
+
 
 class MovePen(Command):
    commandByte = "C0"
    method = 'MovePen'
+   resumableChunks = True
 
    def PrepareParameters(self, *args):
       """
@@ -69,9 +139,128 @@ class MovePen(Command):
          logger.warning("Bytes passed to {} are of odd length: {}"
                         .format(self.__class__.__name__, args))
 
+      # map stops at the shorter slice, ignoring an odd last byte
+      return [list(map(Point, args[0::2], args[1::2]))]
+
+   def StartChunks(self, board):
+      """
+      moves the pen by each chunk as it is received (see Board.BeginMove),
+      so a move of any length only holds one chunk of points at a time.
+      Chunks must hold whole points (an even number of arguments), except
+      for the last one
+      :param board: Board the command draws on
+      :return: tuple of callables (feed, end)
+      """
+      prepare = self.PrepareParameters
+      continueMove = board.ContinueMove
+      board.BeginMove()
+
+      def Feed(*args):
+         continueMove(*prepare(*args))
+
+      return Feed, board.EndMove
+
+
+class CompactMovePen(Command):
+   commandByte = "D0"
+   method = 'MovePen'
+   rawArgs = True
+
+   # points handed to the board at a time, so runs and long commands are
+   # drawn in bounded memory
+   kBatchPoints = 1 << 14
+
+   def PrepareParameters(self, *args):
+      """
+      convert compact move records (see vectdraw.compact) to list of Points
+      if the records end with an incomplete record, it is ignored.
+      :param args: list of raw argument byte values
+      :return: list of Points
+      """
       points = []
-      for pair in chunker(args, 2):
-         if len(pair) == 2:
-            points.append(Point(pair[0], pair[1]))
+      try:
+         for dx, dy in DecodeMoves(args):
+            points.append(Point(dx, dy))
+
+      except ValueError as e:
+         logger.warning("Bytes passed to {} are malformed: {}"
+                        .format(self.__class__.__name__, e))
 
       return [points]
+
+   def Bind(self, board):
+      """
+      executes the command as a single chunk, see StartChunks
+      :param board: Board the command draws on
+      :return: callable receiving the raw argument bytes of the command
+      """
+      startChunks = self.StartChunks
+
+      def Execute(*args):
+         feed, end = startChunks(board)
+         feed(*args)
+         end()
+
+      return Execute
+
+   def StartChunks(self, board):
+      """
+      decodes each chunk of records as it is received, a record cut off at
+      the end of a chunk being completed by the next one, and moves the pen
+      by at most kBatchPoints points at a time (see Board.BeginMove). Runs
+      of more than kMaxRunLength moves are added to diagnostics and
+      skipped. Malformed records end the moves, as in PrepareParameters
+      :param board: Board the command draws on
+      :return: tuple of callables (feed, end)
+      """
+      decoder = MovesDecoder()
+      continueMove = board.ContinueMove
+      batchPoints = self.kBatchPoints
+      diagnostics = self.diagnostics
+      malformed = []
+      board.BeginMove()
+
+      def Feed(*args):
+         if malformed:
+            return
+
+         points = []
+         try:
+            for move, count in decoder.Runs(args):
+               if count > kMaxRunLength:
+                  if diagnostics is not None:
+                     diagnostics.Add(StreamDiagnostics.kLongRun,
+                                     kMaxRunLength)
+                  continue
+
+               point = Point(*move)
+               while count:
+                  size = min(count, batchPoints - len(points))
+                  points.extend([point] * size)
+                  count -= size
+                  if len(points) == batchPoints:
+                     continueMove(points)
+                     points = []
+
+         except MalformedInputError:
+            raise
+         except ValueError as e:
+            malformed.append(e)
+            logger.warning("Bytes passed to {} are malformed: {}"
+                           .format(self.__class__.__name__, e))
+
+         if points:
+            continueMove(points)
+
+      def End():
+         if not malformed:
+            try:
+               decoder.Close()
+            except ValueError as e:
+               logger.warning("Bytes passed to {} are malformed: {}"
+                              .format(self.__class__.__name__, e))
+
+         board.EndMove()
+
+      return Feed, End
+
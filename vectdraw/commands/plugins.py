@@ -0,0 +1,71 @@
+"""
+commands provided by other installed packages
+"""
+
+import logging
+
+from vectdraw.commands.default import Command
+
+
+logger = logging.getLogger(__name__)
+
+kEntryPointGroup = 'vectdraw.commands'
+
+
+def LoadPluginCommands():
+   """
+   imports the Command classes installed packages register under the
+   kEntryPointGroup entry point group, e.g. in their setup.py:
+
+      entry_points={
+         "vectdraw.commands": ["spline = package.commands:SplineCommand"]
+      }
+
+   Entry points that fail to load or aren't Command classes are logged and
+   skipped
+   :return: list of Command classes
+   """
+   # imported on use: scanning the installed packages for entry points is
+   # slow, and most streams never need a plugin
+   from importlib.metadata import entry_points
+
+   commands = []
+   for entryPoint in entry_points(group=kEntryPointGroup):
+      try:
+         command = entryPoint.load()
+      except Exception as e:
+         logger.warning("Failed to load command plugin {}: {}"
+                        .format(entryPoint.name, e))
+         continue
+
+      if not isinstance(command, type) or not issubclass(command, Command):
+         logger.warning("Command plugin {} is not a Command class: {!r}"
+                        .format(entryPoint.name, command))
+         continue
+
+      commands.append(command)
+
+   return commands
+
+
+def WithPluginCommands(commands):
+   """
+   loads the plugin commands up front, for processes drawing many streams
+   with plugins=False
+   :param commands: list of Command classes
+   :return: list of commands followed by the plugin commands whose command
+            byte isn't taken
+   """
+   commands = list(commands)
+   commandBytes = {command.commandByte for command in commands}
+   for command in LoadPluginCommands():
+      if command.commandByte in commandBytes:
+         logger.warning("Skipped plugin command {}: command byte {} is "
+                        "already registered"
+                        .format(command.__name__, command.commandByte))
+         continue
+
+      commands.append(command)
+      commandBytes.add(command.commandByte)
+
+   return commands
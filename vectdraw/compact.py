@@ -0,0 +1,158 @@
+"""
+compact wire format for relative pen moves
+
+Moves are packed as zigzag encoded varints, and runs of identical moves as
+run length records. Every byte keeps its most significant bit clear, so the
+format can be carried as the arguments of a command without being mistaken
+for a command byte.
+
+varint:  6 payload bits per byte, least significant group first. Bit 6
+         (0x40) is set on every byte but the last of a varint.
+
+record:  varint(zigzag(dx) << 1 | isRun), varint(zigzag(dy))
+         [, varint(count - 2) if isRun]
+
+A run holds at most kMaxRunLength moves, so a few bytes can't ask for
+billions of moves: longer runs are written as several records, and
+decoders reject longer records.
+"""
+
+
+kPayloadBits = 6
+kPayloadMask = (1 << kPayloadBits) - 1
+kContinuationBit = 1 << kPayloadBits
+
+# shortest run worth a run length record, and longest run of a record
+kMinRunLength = 2
+kMaxRunLength = 1 << 16
+
+
+def ZigZag(number):
+   """
+   maps signed ints to unsigned ints so small magnitudes stay small
+   (0, -1, 1, -2, 2 ...  ->  0, 1, 2, 3, 4 ...)
+   """
+   return number << 1 if number >= 0 else ((-number) << 1) - 1
+
+
+def UnZigZag(number):
+   """
+   reverses ZigZag
+   """
+   return (number >> 1) if not number & 1 else -((number + 1) >> 1)
+
+
+def EncodeMoves(moves):
+   """
+   packs relative moves into the compact format
+   :param moves: sequence of (dx, dy) pairs or Point instances
+   :return: bytes of the encoded records
+   """
+   encoded = bytearray()
+   pairs = [(m.x, m.y) if hasattr(m, 'x') else tuple(m) for m in moves]
+
+   index = 0
+   while index < len(pairs):
+      move = pairs[index]
+      count = 1
+      while (index + count < len(pairs) and pairs[index + count] == move and
+             count < kMaxRunLength):
+         count += 1
+
+      isRun = count >= kMinRunLength
+      _WriteVarint(encoded, ZigZag(move[0]) << 1 | isRun)
+      _WriteVarint(encoded, ZigZag(move[1]))
+
+      if isRun:
+         _WriteVarint(encoded, count - kMinRunLength)
+         index += count
+      else:
+         index += 1
+
+   return bytes(encoded)
+
+
+def DecodeMoves(data):
+   """
+   generator unpacking compact records into relative (dx, dy) moves. Runs
+   are expanded into their repeated moves.
+
+   Raises ValueError after the last complete record if data ends in the
+   middle of a record, if it contains a byte with the MSB set, or a run of
+   more than kMaxRunLength moves
+   :param data: bytes-like object of encoded records
+   :return: generator of (dx, dy) tuples
+   """
+   decoder = MovesDecoder()
+   for move, count in decoder.Runs(data):
+      if count > kMaxRunLength:
+         raise ValueError("Run of {} moves in compact moves, more than {}"
+                          .format(count, kMaxRunLength))
+
+      for _ in range(count):
+         yield move
+
+   decoder.Close()
+
+
+class MovesDecoder(object):
+   """
+   Unpacks compact records received in chunks split anywhere, e.g. the
+   arguments of a long command: a record cut off at the end of a chunk is
+   completed by the next one. Runs are handed out unexpanded, so their
+   length can be checked before their moves are held.
+   """
+
+   def __init__(self):
+      # varints of the incomplete record, and the varint being read
+      self.values = []
+      self.number = 0
+      self.shift = 0
+
+   def Runs(self, data):
+      """
+      generator of the runs of the records completed by data. Raises
+      ValueError after the last complete record if data contains a byte
+      with the MSB set
+      :param data: bytes-like object of the next encoded bytes
+      :return: generator of ((dx, dy), count) tuples, count being 1 for
+               single moves
+      """
+      values, number, shift = self.values, self.number, self.shift
+      for byte in bytes(data):
+         if byte & 0x80:
+            raise ValueError("Unexpected command byte {} in compact moves"
+                             .format(hex(byte)))
+
+         number |= (byte & kPayloadMask) << shift
+         if byte & kContinuationBit:
+            shift += kPayloadBits
+            continue
+
+         values.append(number)
+         number = 0
+         shift = 0
+
+         isRun = values[0] & 1
+         if len(values) == 2 + isRun:
+            yield ((UnZigZag(values[0] >> 1), UnZigZag(values[1])),
+                   values[2] + kMinRunLength if isRun else 1)
+            values.clear()
+
+      self.number, self.shift = number, shift
+
+   def Close(self):
+      """
+      ends the records
+      :raises ValueError: if they end in the middle of a record
+      """
+      if self.values or self.shift:
+         raise ValueError("Compact moves end with an incomplete record")
+
+
+def _WriteVarint(buffer, number):
+   while number > kPayloadMask:
+      buffer.append(number & kPayloadMask | kContinuationBit)
+      number >>= kPayloadBits
+
+   buffer.append(number)
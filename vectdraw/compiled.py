@@ -0,0 +1,296 @@
+"""
+compiled intermediate representation (.vdc) of a command stream, cached
+next to its source file so the stream isn't parsed again
+"""
+
+import array
+import hashlib
+import json
+import logging
+import os
+import struct
+import sys
+
+from vectdraw.commands.plugins import LoadPluginCommands
+from vectdraw.diagnostics import StreamDiagnostics
+
+logger = logging.getLogger(__name__)
+
+kSidecarExtension = '.vdc'
+
+# magic, flags, sha256 of the source file, command count, pool size,
+# size of the diagnostics
+kHeader = struct.Struct('<4sB3x32sQQQ')
+kMagic = b'VDC2'
+kBinaryFlag = 0x01
+
+kHashBlockSize = 1 << 20
+
+
+class CompiledStream(object):
+   """
+   A command stream after tokenizing and decoding, as three arrays:
+
+   - opcodes: the command byte of each command (array 'B')
+   - offsets: the start of each command's arguments in pool, followed by
+     the end of the last command's arguments (array 'q')
+   - pool: the decoded arguments of all commands (array 'h'). rawArgs
+     commands store their raw argument bytes
+
+   Unrecognized commands are dropped when compiling, and the malformed
+   input found is kept in diagnostics, to be reported again by Replay. The
+   .vdc file holds a header (see kHeader), recording whether the source was
+   read as binary and the sha256 of the source file, followed by the three
+   arrays in little endian byte order and the diagnostics as JSON.
+   """
+
+   # commands with more arguments are replayed in chunks of this many
+   # arguments (see Command.StartChunks). Even, so chunks hold whole points
+   kReplayChunkArgs = 1 << 15
+
+   def __init__(self, binary=False, sourceHash=bytes(32)):
+      self.binary = binary
+      self.sourceHash = sourceHash
+      self.opcodes = array.array('B')
+      self.offsets = array.array('q', [0])
+      self.pool = array.array('h')
+      self.diagnostics = StreamDiagnostics()
+
+      # True while the arguments of the last command are being appended
+      self.partial = False
+
+   def __len__(self):
+      return len(self.opcodes)
+
+   @classmethod
+   def Compile(cls, processor, sourceHash=bytes(32)):
+      """
+      runs processor, recording every command it executes
+      :param processor: VectorCommandStreamProcessor to run
+      :param sourceHash: sha256 digest of the source file
+      :return: CompiledStream of the processed stream
+      """
+      compiled = cls(processor.streamreader.binary, sourceHash)
+      reader = processor.streamreader
+      try:
+         for commandByte, args, partial in processor.Records(
+               reader.ReadBlocks(processor.diagnostics)):
+
+            compiled.Append(commandByte, args, partial)
+            processor.Dispatch(commandByte, args, partial)
+      finally:
+         processor.diagnostics.Report(processor.logger)
+
+      compiled.diagnostics.Merge(processor.diagnostics)
+      return compiled
+
+   def Append(self, commandByte, args, partial=False):
+      """
+      appends a command, or a chunk of its arguments
+      :param commandByte: command byte value of the command
+      :param args: decoded arguments, or raw argument bytes for rawArgs
+                   commands
+      :param partial: True if the next call continues the arguments of
+                      the command
+      """
+      if not self.partial:
+         self.opcodes.append(commandByte)
+
+      if hasattr(args, 'dtype'):
+         # int16 array of the vectorized engine
+         self.pool.frombytes(args.tobytes())
+      else:
+         self.pool.extend(args)
+
+      self.partial = partial
+      if not partial:
+         self.offsets.append(len(self.pool))
+
+   def Replay(self, board, commands):
+      """
+      executes the board methods of the compiled commands, without
+      tokenizing or decoding anything, and reports the malformed input
+      found when compiling
+      :param board: Board to draw on
+      :param commands: list of Command classes, as given to the processor.
+                       Plugin commands are loaded if the stream uses any
+                       other command
+      """
+      commandTable = [None] * 256
+      dispatchTable = [None] * 256
+
+      def Register(commands):
+         for command in commands:
+            try:
+               value = int(command.commandByte, 16)
+            except ValueError:
+               continue
+
+            if 0x80 <= value <= 0xFF and dispatchTable[value] is None:
+               commandTable[value] = command()
+               dispatchTable[value] = commandTable[value].Bind(board)
+
+      Register(commands)
+      if any(dispatchTable[opcode] is None for opcode in set(self.opcodes)):
+         Register(LoadPluginCommands())
+
+      pool = self.pool
+      offsets = self.offsets
+      chunkArgs = self.kReplayChunkArgs
+      for index, opcode in enumerate(self.opcodes):
+         execute = dispatchTable[opcode]
+         if execute is None:
+            logger.warning("Received unrecognized command byte {:02X}"
+                           .format(opcode))
+            continue
+
+         start, end = offsets[index], offsets[index + 1]
+         rawArgs = commandTable[opcode].rawArgs
+         if end - start <= chunkArgs:
+            args = pool[start:end].tolist()
+            execute(*(bytes(args) if rawArgs else args))
+            continue
+
+         feed, endCommand = commandTable[opcode].StartChunks(board)
+         for chunk in range(start, end, chunkArgs):
+            args = pool[chunk:min(chunk + chunkArgs, end)].tolist()
+            feed(*(bytes(args) if rawArgs else args))
+         endCommand()
+
+      self.diagnostics.Report(logger)
+
+   def Save(self, path):
+      """
+      writes the .vdc file to path. The file is replaced atomically, so a
+      concurrent reader never sees a partial file
+      :param path: path of the .vdc file
+      """
+      diagnostics = json.dumps(self.diagnostics.GetState()).encode('ascii')
+      temporary = '{}.{}.tmp'.format(path, os.getpid())
+      try:
+         with open(temporary, 'wb') as f:
+            f.write(kHeader.pack(
+               kMagic, kBinaryFlag if self.binary else 0, self.sourceHash,
+               len(self.opcodes), len(self.pool), len(diagnostics)))
+
+            for values in (self.opcodes, self.offsets, self.pool):
+               if sys.byteorder == 'big':
+                  values = array.array(values.typecode, values)
+                  values.byteswap()
+               values.tofile(f)
+            f.write(diagnostics)
+
+         os.replace(temporary, path)
+      finally:
+         if os.path.exists(temporary):
+            os.remove(temporary)
+
+   @classmethod
+   def Load(cls, path):
+      """
+      reads a .vdc file
+      :param path: path of the .vdc file
+      :return: CompiledStream
+      :raises ValueError: if path isn't a complete .vdc file
+      """
+      with open(path, 'rb') as f:
+         binary, sourceHash, count, poolSize, diagnosticsSize = ReadHeader(f)
+         compiled = cls(binary, sourceHash)
+         compiled.offsets = array.array('q')
+
+         try:
+            compiled.opcodes.fromfile(f, count)
+            compiled.offsets.fromfile(f, count + 1)
+            compiled.pool.fromfile(f, poolSize)
+         except EOFError:
+            raise ValueError("truncated compiled stream {}".format(path))
+
+         diagnostics = f.read(diagnosticsSize)
+         if len(diagnostics) != diagnosticsSize:
+            raise ValueError("truncated compiled stream {}".format(path))
+         compiled.diagnostics.SetState(json.loads(diagnostics))
+
+      if sys.byteorder == 'big':
+         compiled.offsets.byteswap()
+         compiled.pool.byteswap()
+
+      return compiled
+
+
+def ReadHeader(f):
+   """
+   reads the header of a .vdc file
+   :param f: binary file object positioned at the start of the file
+   :return: tuple of (binary, sourceHash, command count, pool size,
+            diagnostics size)
+   :raises ValueError: if f doesn't start with a .vdc header
+   """
+   header = f.read(kHeader.size)
+   if len(header) != kHeader.size:
+      raise ValueError("not a compiled stream: header is truncated")
+
+   magic, flags, sourceHash, count, poolSize, diagnosticsSize = (
+      kHeader.unpack(header))
+   if magic != kMagic:
+      raise ValueError("not a compiled stream: bad magic number {!r}"
+                       .format(magic))
+
+   return (bool(flags & kBinaryFlag), sourceHash, count, poolSize,
+           diagnosticsSize)
+
+
+def SidecarPath(path):
+   """
+   :param path: path of a command stream file
+   :return: path of its .vdc sidecar
+   """
+   return path + kSidecarExtension
+
+
+def HashFile(path):
+   """
+   :param path: path of a file
+   :return: sha256 digest of the file's content
+   """
+   digest = hashlib.sha256()
+   with open(path, 'rb') as f:
+      for block in iter(lambda: f.read(kHashBlockSize), b''):
+         digest.update(block)
+
+   return digest.digest()
+
+
+def LoadSidecar(path, binary, strict=False):
+   """
+   loads the .vdc sidecar of path if it was compiled from the current
+   content of path, read in the same mode
+   :param path: path of a command stream file
+   :param binary: True if the stream is read as raw binary
+   :param strict: ignore the sidecar if malformed input was found when
+                  compiling, so the stream is parsed and stops at the
+                  first malformed input
+   :return: CompiledStream, or None if there is no valid sidecar
+   """
+   sidecar = SidecarPath(path)
+   if not os.path.isfile(sidecar):
+      return None
+
+   try:
+      with open(sidecar, 'rb') as f:
+         sidecarBinary, sourceHash = ReadHeader(f)[:2]
+
+      if sidecarBinary != binary or sourceHash != HashFile(path):
+         logger.info("ignoring stale compiled stream {}".format(sidecar))
+         return None
+
+      compiled = CompiledStream.Load(sidecar)
+   except (OSError, ValueError) as e:
+      logger.warning("ignoring compiled stream {}: {}".format(sidecar, e))
+      return None
+
+   if strict and len(compiled.diagnostics):
+      logger.info("ignoring compiled stream {} of malformed input in strict "
+                  "mode".format(sidecar))
+      return None
+
+   return compiled
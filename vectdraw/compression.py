@@ -0,0 +1,157 @@
+"""
+transparent (de)compression of input and output streams using the stdlib
+gzip, bz2 and lzma codecs
+"""
+
+import bz2
+import gzip
+import lzma
+import os
+import zlib
+
+
+# leading bytes identifying each supported format and its codec module
+kMagicNumbers = (
+   (b'\x1f\x8b\x08', gzip),
+   (b'BZh', bz2),
+   (b'\xfd7zXZ\x00', lzma),
+)
+
+kExtensions = {
+   '.gz': gzip,
+   '.bz2': bz2,
+   '.xz': lzma,
+   '.lzma': lzma,
+}
+
+kMagicLength = max(len(magic) for magic, _ in kMagicNumbers)
+
+# incremental decompressor of each codec module, for streams that can't be
+# wrapped in a file object
+kDecompressors = {
+   gzip: lambda: zlib.decompressobj(16 + zlib.MAX_WBITS),
+   bz2: bz2.BZ2Decompressor,
+   lzma: lzma.LZMADecompressor,
+}
+
+
+def OpenDecompressedStream(stream):
+   """
+   returns a binary stream decompressing stream on the fly if stream is
+   compressed with gzip, bz2 or xz, else None.
+
+   The format is detected by the leading magic bytes when the stream can be
+   peeked or rewound, otherwise by the extension of its name. stream is not
+   consumed if it is not compressed
+   :param stream: an open stream (text or binary)
+   :return: decompressing file object or None
+   """
+   raw = getattr(stream, 'buffer', stream)
+   head = _PeekHead(raw)
+
+   if head is None:
+      module = kExtensions.get(
+         os.path.splitext(str(getattr(stream, 'name', '')))[1].lower())
+      return module.open(raw, 'rb') if module else None
+
+   for magic, module in kMagicNumbers:
+      if head.startswith(magic):
+         return module.open(raw, 'rb')
+
+   return None
+
+
+def IncrementalDecompressor(head):
+   """
+   returns an incremental decompressor (with decompress(data) and flush()
+   methods) for a stream starting with head if it is compressed with gzip,
+   bz2 or xz, else None. Streams of several concatenated compressed
+   members are decompressed whole, as gzip.open and bz2.open do
+   :param head: the first kMagicLength bytes of the stream, or all of it
+                if it is shorter
+   :return: decompressor object or None
+   """
+   for magic, module in kMagicNumbers:
+      if head.startswith(magic):
+         return _MembersDecompressor(kDecompressors[module])
+
+   return None
+
+
+class _MembersDecompressor(object):
+   """
+   incremental decompressor of a stream of concatenated compressed members:
+   once a member ends, a new decompressor starts on the data following it
+   """
+
+   def __init__(self, factory):
+      """
+      :param factory: callable returning the decompressor of a member
+      """
+      self.factory = factory
+      self.decompressor = factory()
+
+   def decompress(self, data):
+      chunks = []
+      while data:
+         if self.decompressor.eof:
+            self.decompressor = self.factory()
+
+         chunks.append(self.decompressor.decompress(data))
+         data = self.decompressor.unused_data if self.decompressor.eof else b''
+
+      return b''.join(chunks)
+
+   def flush(self):
+      flush = getattr(self.decompressor, 'flush', None)
+      return flush() if flush is not None else b''
+
+
+def OpenOutputFile(path):
+   """
+   opens path for writing text. If path ends with a supported compression
+   extension (e.g. out.txt.gz) the text is compressed as it is written
+   :param path: path of the output file
+   :return: writable text file object
+   """
+   module = kExtensions.get(os.path.splitext(path)[1].lower())
+   if module is None:
+      return open(path, 'w')
+
+   return module.open(path, 'wt')
+
+
+def IsCompressedStream(stream):
+   """
+   returns True if stream (or its binary layer) compresses or decompresses
+   data on the fly
+   """
+   raw = getattr(stream, 'buffer', stream)
+   return isinstance(raw, (gzip.GzipFile, bz2.BZ2File, lzma.LZMAFile))
+
+
+def _PeekHead(raw):
+   """
+   returns the first bytes of raw without consuming them, or None if raw
+   cannot be peeked or rewound
+   """
+   if hasattr(raw, 'peek'):
+      try:
+         head = raw.peek(kMagicLength)
+      except (OSError, ValueError):
+         return None
+
+      if isinstance(head, bytes):
+         return head[:kMagicLength]
+
+   try:
+      if raw.seekable():
+         position = raw.tell()
+         head = raw.read(kMagicLength)
+         raw.seek(position)
+         if isinstance(head, bytes):
+            return head
+   except (AttributeError, OSError, ValueError):
+      pass
+
+   return None
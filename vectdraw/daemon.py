@@ -0,0 +1,272 @@
+"""
+warm daemon (vectdraw --serve) drawing the command streams its clients
+send over a Unix domain socket, see vectdraw.protocol
+"""
+
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import signal
+import socket
+import stat
+
+from vectdraw.asyncprocess import AsyncCommandStreamProcessor
+from vectdraw.asyncprocess import AsyncStreamOutput, AsyncStreamReader
+from vectdraw.commands.plugins import WithPluginCommands
+from vectdraw.compression import IncrementalDecompressor, kMagicLength
+from vectdraw.diagnostics import StreamDiagnostics
+from vectdraw.draw.board import Board, Pen
+from vectdraw.protocol import DecodeHeader, Frame
+from vectdraw.protocol import kExitFrame, kLogFrame, kOutputFrame
+
+
+logger = logging.getLogger(__name__)
+
+# loggers of the modules logging warnings of a run, besides the processor
+kSessionLoggers = ('vectdraw.hexstreamreader', 'vectdraw.commands.default')
+
+# FrameLogHandler of the session of the current task, see SessionLogFilter
+_sessionHandler = contextvars.ContextVar('sessionHandler', default=None)
+
+
+class FramedOutput(AsyncStreamOutput):
+   """
+   AsyncStreamOutput writing the output text in output frames
+   """
+
+   def flush(self):
+      if self.buffer:
+         self.writer.write(Frame(
+            kOutputFrame, ''.join(self.buffer).encode(self.encoding)))
+         self.buffer = []
+
+
+class FrameLogHandler(logging.Handler):
+   """
+   logging handler sending the records of a session to its client in log
+   frames
+   """
+
+   def __init__(self, writer):
+      """
+      :param writer: asyncio.StreamWriter of the session
+      """
+      super().__init__()
+      self.writer = writer
+
+   def emit(self, record):
+      self.writer.write(Frame(kLogFrame, self.format(record).encode('utf-8')))
+
+
+class SessionLogFilter(logging.Filter):
+   """
+   logging filter of the kSessionLoggers, handing the warnings logged by a
+   session to its FrameLogHandler instead of the daemon's handlers.
+   Sessions run concurrently on one thread, so the session logging a
+   record is the one whose task is running, whose handler is kept in a
+   context variable
+   """
+
+   def filter(self, record):
+      handler = _sessionHandler.get()
+      if handler is None:
+         return True
+
+      if record.levelno >= logging.WARNING:
+         handler.handle(record)
+      return False
+
+
+class SessionStream(object):
+   """
+   asyncio.StreamReader stand-in handing out the bytes already read from
+   stream (head) before the rest of it, decompressed by decompressor if
+   given
+   """
+
+   def __init__(self, stream, head=b'', decompressor=None):
+      self.stream = stream
+      self.head = head
+      self.decompressor = decompressor
+      self.eof = False
+
+   async def read(self, size):
+      while not self.eof:
+         if self.head:
+            data, self.head = self.head, b''
+         else:
+            data = await self.stream.read(size)
+
+         if self.decompressor is None:
+            self.eof = not data
+            return data
+
+         if data:
+            data = self.decompressor.decompress(data)
+         else:
+            self.eof = True
+            data = self.decompressor.flush()
+
+         if data:
+            return data
+
+      return b''
+
+
+async def OpenSessionStream(stream):
+   """
+   reads the first bytes of stream to detect its compression
+   :param stream: asyncio.StreamReader of a command stream
+   :return: SessionStream of the (decompressed) command stream
+   """
+   head = b''
+   while len(head) < kMagicLength:
+      data = await stream.read(kMagicLength - len(head))
+      if not data:
+         break
+      head += data
+
+   return SessionStream(stream, head, IncrementalDecompressor(head))
+
+
+class Daemon(object):
+   """
+   Serves vectdraw requests on a Unix domain socket, so the interpreter,
+   the package and the commands, plugin commands included, are loaded once
+   instead of on every run. Each connection is a session drawing one
+   command stream on a board of its own. Sessions run concurrently on the
+   event loop (see AsyncCommandStreamProcessor).
+
+   The output, the warnings a run would log and the exit status of each
+   session are sent back to its client in frames (see vectdraw.protocol).
+   """
+
+   kBlockSize = AsyncStreamReader.kDefaultBlockSize
+
+   def __init__(self, path, encodingClass, commands):
+      """
+      :param path: path of the socket to listen on
+      :param encodingClass: codec decoding the arguments
+      :param commands: sequence of Command classes to register. The plugin
+                       commands of installed packages are loaded as well
+      """
+      self.path = path
+      self.encodingClass = encodingClass
+      self.commands = WithPluginCommands(commands)
+      self.server = None
+
+   async def Serve(self):
+      """
+      listens on path until cancelled or Close is called. The socket is
+      only accessible to the current user, and removed when done
+      :raises OSError: if path is taken, e.g. by a running daemon
+      """
+      self.__RemoveStaleSocket()
+      self.server = await asyncio.start_unix_server(self.Session, self.path)
+      sessionFilter = SessionLogFilter()
+      for name in kSessionLoggers:
+         logging.getLogger(name).addFilter(sessionFilter)
+
+      try:
+         os.chmod(self.path, stat.S_IRUSR | stat.S_IWUSR)
+         await self.server.serve_forever()
+      except asyncio.CancelledError:
+         pass
+      finally:
+         for name in kSessionLoggers:
+            logging.getLogger(name).removeFilter(sessionFilter)
+         self.server.close()
+         if os.path.exists(self.path):
+            os.remove(self.path)
+
+   def Close(self):
+      """
+      stops listening, ending Serve
+      """
+      if self.server is not None:
+         self.server.close()
+
+   async def Session(self, reader, writer):
+      """
+      processes the request of a client connection
+      :param reader: asyncio.StreamReader of the connection
+      :param writer: asyncio.StreamWriter of the connection
+      """
+      status, error = 0, None
+      try:
+         options = DecodeHeader(await reader.readline())
+
+         # each session runs in a task of its own, with its own context
+         handler = FrameLogHandler(writer)
+         _sessionHandler.set(handler)
+         sessionLogger = logging.Logger(AsyncCommandStreamProcessor.__name__,
+                                        logging.WARNING)
+         sessionLogger.addHandler(handler)
+
+         processor = AsyncCommandStreamProcessor(
+            AsyncStreamReader(await OpenSessionStream(reader),
+                              options['binary'], self.kBlockSize),
+            self.encodingClass,
+            Board(Pen(), outputStream=FramedOutput(writer), autoFlush=False),
+            self.commands, plugins=False,
+            diagnostics=StreamDiagnostics(strict=options['strict']))
+         processor.logger = sessionLogger
+
+         await processor.run()
+      except ConnectionError:
+         writer.close()
+         return
+      except Exception as e:
+         status, error = 1, "{}: {}".format(type(e).__name__, e)
+
+      try:
+         writer.write(Frame(kExitFrame, json.dumps(
+            {"status": status, "error": error}).encode('utf-8')))
+         await writer.drain()
+      except ConnectionError:
+         pass
+      finally:
+         writer.close()
+
+   def __RemoveStaleSocket(self):
+      """
+      removes the socket at path if no daemon listens on it anymore
+      :raises OSError: if path is taken
+      """
+      try:
+         mode = os.stat(self.path).st_mode
+      except FileNotFoundError:
+         return
+
+      if not stat.S_ISSOCK(mode):
+         raise OSError("{} exists and isn't a socket".format(self.path))
+
+      probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+      try:
+         probe.connect(self.path)
+      except ConnectionRefusedError:
+         os.remove(self.path)
+         return
+      finally:
+         probe.close()
+
+      raise OSError("a daemon is already listening on {}".format(self.path))
+
+
+def RunDaemon(path, encodingClass, commands):
+   """
+   runs a Daemon on path until interrupted or terminated
+   """
+   daemon = Daemon(path, encodingClass, commands)
+
+   async def Serve():
+      asyncio.get_running_loop().add_signal_handler(signal.SIGTERM,
+                                                    daemon.Close)
+      await daemon.Serve()
+
+   try:
+      asyncio.run(Serve())
+   except KeyboardInterrupt:
+      pass
@@ -0,0 +1,149 @@
+"""
+aggregated reporting of malformed input found while processing a stream
+"""
+
+
+class MalformedInputError(ValueError):
+   """
+   raised in strict mode on the first malformed input of a stream
+   """
+   pass
+
+
+class StreamDiagnostics(object):
+   """
+   Collects the malformed input found in a stream instead of logging every
+   occurrence: occurrences are counted per kind and value, and the offsets
+   of the first maxOffsets of each are kept. Report() logs one summary line
+   per kind and value, so a corrupt stream costs a counter increment per
+   occurrence rather than a log record.
+
+   In strict mode the first occurrence raises MalformedInputError instead.
+   """
+
+   kMaxOffsets = 10
+
+   # kinds of malformed input, formatted with the offending value. Their
+   # offsets are the byte offsets of the command byte in the decoded stream,
+   # except for invalid hex, whose offsets are offsets among the non
+   # whitespace characters of the input
+   kUnrecognizedCommand = "Received unrecognized command byte {:02X}"
+   kOddArgument = "Discarded odd trailing argument byte {:02X}"
+   kArgumentCount = ("Skipped command {:02X} with the wrong number of "
+                     "arguments")
+   kInvalidHex = ("Skipped to the next command byte after invalid hex "
+                  "character {!r}")
+   kLongRun = "Skipped compact move run of more than {} moves"
+
+   def __init__(self, strict=False, maxOffsets=kMaxOffsets, baseOffset=0):
+      """
+      :param strict: raise MalformedInputError on the first malformed input
+      :param maxOffsets: number of offsets kept per kind and value
+      :param baseOffset: added to every offset, when the stream processed
+                         is a part of a larger one
+      """
+      self.strict = strict
+      self.maxOffsets = maxOffsets
+      self.baseOffset = baseOffset
+      self.counts = {}
+      self.offsets = {}
+      self.skippedCharacters = 0
+
+   def __len__(self):
+      """
+      :return: number of occurrences of malformed input found
+      """
+      return sum(self.counts.values())
+
+   def Add(self, kind, value, offset=None):
+      """
+      records an occurrence of malformed input
+      :param kind: one of the k* kinds
+      :param value: offending value (byte value or character)
+      :param offset: offset of the occurrence in the stream, if known
+      :raises MalformedInputError: in strict mode
+      """
+      if offset is not None:
+         offset += self.baseOffset
+
+      if self.strict:
+         message = kind.format(value)
+         if offset is not None:
+            message += " at offset {}".format(offset)
+         raise MalformedInputError(message)
+
+      key = (kind, value)
+      count = self.counts.get(key, 0)
+      self.counts[key] = count + 1
+      if count < self.maxOffsets and offset is not None:
+         self.offsets.setdefault(key, []).append(offset)
+
+   def Merge(self, other):
+      """
+      adds the occurrences collected by other, e.g. for a later part of
+      the same stream
+      :param other: StreamDiagnostics
+      """
+      for key, count in other.counts.items():
+         self.counts[key] = self.counts.get(key, 0) + count
+
+         offsets = other.offsets.get(key, ())
+         room = self.maxOffsets - len(self.offsets.get(key, ()))
+         if offsets and room > 0:
+            self.offsets.setdefault(key, []).extend(offsets[:room])
+
+      self.skippedCharacters += other.skippedCharacters
+
+   def GetState(self):
+      """
+      :return: JSON serializable dict of the occurrences collected, see
+               SetState
+      """
+      return {"occurrences": [[kind, value, count,
+                               self.offsets.get((kind, value), [])]
+                              for (kind, value), count in self.counts.items()],
+              "skippedCharacters": self.skippedCharacters}
+
+   def SetState(self, state):
+      """
+      replaces the occurrences collected by the ones of state
+      :param state: dict returned by GetState
+      """
+      self.counts = {}
+      self.offsets = {}
+      for kind, value, count, offsets in state["occurrences"]:
+         self.counts[(kind, value)] = count
+         if offsets:
+            self.offsets[(kind, value)] = offsets
+      self.skippedCharacters = state["skippedCharacters"]
+
+   def Summary(self):
+      """
+      :return: list of summary lines, one per kind and value, in order of
+               first occurrence
+      """
+      lines = []
+      for (kind, value), count in self.counts.items():
+         line = "{} x{}".format(kind.format(value), count)
+
+         offsets = self.offsets.get((kind, value), None)
+         if offsets:
+            line += " at offset{} {}{}".format(
+               "s" if count > 1 else "", ", ".join(map(str, offsets)),
+               ", ..." if count > len(offsets) else "")
+
+         lines.append(line)
+
+      if self.skippedCharacters:
+         lines.append("Skipped {} characters of malformed hex input"
+                      .format(self.skippedCharacters))
+
+      return lines
+
+   def Report(self, logger):
+      """
+      logs the summary lines as warnings
+      :param logger: logger to log to
+      """
+      for line in self.Summary():
+         logger.warning(line)
@@ -4,7 +4,6 @@
 board class for vector drawing
 """
 import sys
-import queue
 
 from vectdraw.draw.pen import Pen
 from vectdraw.draw.colour import Colour
@@ -16,13 +15,31 @@ class Board(VirtualPlane):
    pen = None
    outputStream = None
 
-   def __init__(self, pen, outputStream=sys.stdout, **kwargs):
+   # flush the output stream after every command result
+   autoFlush = True
+
+   # executor drawing the points of moves begun with the pen down, e.g. a
+   # ParallelMoveExecutor, or None to draw them on the board itself
+   moveExecutor = None
+
+   def __init__(self, pen, outputStream=sys.stdout, autoFlush=True,
+                moveExecutor=None, **kwargs):
 
       super(Board, self).__init__(**kwargs)
 
+      self.autoFlush = autoFlush
+      self.moveExecutor = moveExecutor
+
       self.currentPenLocation = Point()
       self.lastPenLocation = Point()
 
+      # state of the move begun by BeginMove: whether the pen draws, the
+      # points of the current MV line not yet written, and whether "MV" of
+      # the current line was written
+      self.__drawing = False
+      self.__movePoints = []
+      self.__moveLineOpen = False
+
       if isinstance(pen, Pen):
          self.pen = pen
 
@@ -71,6 +88,36 @@ class Board(VirtualPlane):
       self.__WriteToStream(
          "CO {} {} {} {};\n".format(r, g, b, a))
 
+   def GetState(self):
+      """
+      returns the state of the board and its pen as a JSON serializable
+      dict, restored by SetState. Between the chunks of a move begun by
+      BeginMove, the state of the move is returned by GetMoveState
+      :return: dict of the pen locations, pen position and colour
+      """
+      colour = self.pen.colour()
+      return {
+         "currentPenLocation": [self.currentPenLocation.x,
+                                self.currentPenLocation.y],
+         "lastPenLocation": [self.lastPenLocation.x, self.lastPenLocation.y],
+         "penDown": self.pen.IsPenDown(),
+         "colour": [colour.red, colour.green, colour.blue, colour.alpha]}
+
+   def SetState(self, state):
+      """
+      restores the state returned by GetState, without printing anything
+      :param state: dict returned by GetState
+      """
+      self.currentPenLocation = Point(*state["currentPenLocation"])
+      self.lastPenLocation = Point(*state["lastPenLocation"])
+
+      if state["penDown"]:
+         self.pen.down()
+      else:
+         self.pen.lift()
+
+      self.pen.ChangeColour(Colour(tuple(state["colour"])))
+
    def MovePen(self, points):
       """
       Moves pen to area on board specified by points. Movement is relative to
@@ -88,25 +135,96 @@ class Board(VirtualPlane):
 
       :param points: list of Point instances
       """
-      if not self.pen.IsPenDown():
-         self.__MoveToFinalDestination(points)
+      self.BeginMove()
+      self.ContinueMove(points)
+      self.EndMove()
+
+   def BeginMove(self):
+      """
+      begins a move whose points are given in any number of chunks by
+      ContinueMove and which is ended by EndMove. The output is the same as
+      that of a single MovePen call with all points, while only a chunk of
+      them is held at a time. Movement behaviour depends on the pen's
+      position when the move begins
+      """
+      self.__drawing = self.pen.IsPenDown()
+      if self.__drawing and self.moveExecutor is not None:
+         self.moveExecutor.Begin(self)
 
+   def ContinueMove(self, points):
+      """
+      moves the pen by the next chunk of points of the move begun by
+      BeginMove
+      :param points: list of Point instances
+      """
+      if not self.__drawing:
+         self.__MoveToPoints(points)
+      elif self.moveExecutor is not None:
+         self.moveExecutor.Continue(self, points)
       else:
          self.__draw(points)
 
-   def __MoveToFinalDestination(self, points):
+   def EndMove(self):
+      """
+      ends the move begun by BeginMove, printing its remaining output
       """
-      Calculates the final location of the pen from points, and prints the
-      location to the output stream
+      if self.__drawing:
+         if self.moveExecutor is not None:
+            self.moveExecutor.End(self)
+         self.__PrintMovePointsFromBuffer()
+      else:
+         self.__PrintFinalDestination()
 
-      if the pen crosses the boundary, it is placed on the boundary at the
-      position it crossed
+   def DrawPoints(self, points):
+      """
+      draws the next chunk of points of the move begun by BeginMove with
+      the pen down on the board itself, for moveExecutor
+      :param points: list of Point instances
+      """
+      self.__draw(points)
+
+   def GetMoveState(self):
+      """
+      returns the state of the move begun by BeginMove, between chunks of
+      points: whether it draws, and whether its MV line is open
+      :return: tuple of (drawing, lineOpen)
+      """
+      return self.__drawing, self.__moveLineOpen
+
+   def SetMoveState(self, drawing, lineOpen):
+      """
+      restores the state returned by GetMoveState, e.g. on another board
+      continuing the move
+      :param drawing: True if the move draws
+      :param lineOpen: True if the MV line of the move is open
+      """
+      self.__drawing = drawing
+      self.__moveLineOpen = lineOpen
+
+   def WriteOutput(self, text):
+      """
+      writes text produced for the board to its output stream, e.g. the
+      output of chunks of a move drawn on other boards
+      :param text: output text
+      """
+      self.__WriteToStream(text)
+
+   def __MoveToPoints(self, points):
+      """
+      Moves the pen location by points, without printing it
       :param points: list of Point instances
       """
       for point in points:
          self.lastPenLocation = self.currentPenLocation
          self.__MovePenLocation(point)
 
+   def __PrintFinalDestination(self):
+      """
+      prints the final location of the pen to the output stream
+
+      if the pen crosses the boundary, it is placed on the boundary at the
+      position it crossed
+      """
       boundaryIntercepts = self.GetBoundaryIntercepts(
          self.lastPenLocation, self.currentPenLocation)
 
@@ -126,20 +244,22 @@ class Board(VirtualPlane):
 
    def __draw(self, points):
       """
-      MovePen implementation for when the pen is down. It converts points to
-      an iterator and moves the pen to the calculated new position per point.
+      MovePen implementation for when the pen is down. It moves the pen to
+      the calculated new position per point.
 
       If the pen moves outside the boards boundaries it is placed on the
       boundary and its position is printed to the output stream. The pen is
       then lifted and moved based on the remaining points until moved within
-      the board's boundaries. Then pen is then placed down and this draw
-      is called with the remaining points
+      the board's boundaries. Then pen is then placed down and drawing
+      continues with the remaining points
 
-      For output accuracy, points to be printed are bufferd until a border is
-      crossed or no more points are left to print
+      For output accuracy, points to be printed are buffered until a border
+      is crossed or no more points are left to print. The buffered points
+      of the chunk are written at its end, leaving the MV line open for the
+      next chunk
       :param points: list of Point instances
       """
-      outputBuffer = queue.Queue()
+      outputBuffer = self.__movePoints
       for point in points:
 
          # Store last location and move point
@@ -153,33 +273,38 @@ class Board(VirtualPlane):
          # if boundaries crossed, print points leading to crossing then handle
          # the boundary intercept points
          if boundaryIntercepts:
-            outputBuffer.put(boundaryIntercepts[0][0])
-            self.__PrintMovePointsFromBuffer(outputBuffer)
+            outputBuffer.append(" {}".format(boundaryIntercepts[0][0]))
+            self.__PrintMovePointsFromBuffer()
             self.__HandleCrossedBoundaries(boundaryIntercepts)
 
          if (self.pen.IsPenDown() and
              self.__IsPointWithinBoundaries(self.currentPenLocation)):
 
-            outputBuffer.put(self.currentPenLocation)
+            outputBuffer.append(" {}".format(self.currentPenLocation))
 
-      self.__PrintMovePointsFromBuffer(outputBuffer)
+      self.__WriteMovePointsFromBuffer()
 
-   def __PrintMovePointsFromBuffer(self, buffer):
+   def __WriteMovePointsFromBuffer(self):
       """
-      pops points from buffer and writes them to stream as a single move command
-      :param buffer: queue of Point instances
+      writes the buffered points to stream, beginning a move command if
+      none is open
       """
-      outputString = ""
-      while True:
-         try:
-            point = buffer.get_nowait()
-         except queue.Empty:
-            break
-         outputString += " {}".format(point)
+      if self.__movePoints:
+         if not self.__moveLineOpen:
+            self.__movePoints[0] = "MV" + self.__movePoints[0]
+            self.__moveLineOpen = True
+
+         self.__WriteToStream("".join(self.__movePoints))
+         self.__movePoints.clear()
 
-      if outputString:
-         outputString = "MV" + outputString + ";\n"
-         self.__WriteToStream(outputString)
+   def __PrintMovePointsFromBuffer(self):
+      """
+      writes the buffered points to stream and ends the open move command
+      """
+      self.__WriteMovePointsFromBuffer()
+      if self.__moveLineOpen:
+         self.__WriteToStream(";\n")
+         self.__moveLineOpen = False
 
    def __HandleCrossedBoundaries(self, boundaries):
       """
@@ -216,4 +341,5 @@ class Board(VirtualPlane):
 
    def __WriteToStream(self, message):
       self.outputStream.write(message)
-      self.outputStream.flush()
+      if self.autoFlush:
+         self.outputStream.flush()
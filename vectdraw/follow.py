@@ -0,0 +1,70 @@
+"""
+following a command file that is being appended to, like tail -f
+"""
+
+import os
+import time
+
+
+class FollowedStream(object):
+   """
+   Binary stream over a file that waits for more data at its end instead of
+   ending, for the stream readers. Reads return the bytes appended since
+   the previous read, so each read costs time proportional to the new data,
+   not to the size of the file; the readers and processors keep their
+   state, including a partial command at the end of the file, between
+   reads.
+
+   The stream ends once timeout seconds pass without new data, when it is
+   closed, or when it is interrupted (KeyboardInterrupt) while waiting, so
+   the last command is still drawn. A file that shrinks raises OSError.
+   """
+
+   kPollInterval = 0.2
+
+   def __init__(self, stream, poll=kPollInterval, timeout=None):
+      """
+      :param stream: file object of a regular file, in text or binary mode
+      :param poll: seconds between checks for new data at the end of the
+                   file
+      :param timeout: seconds without new data after which the stream ends,
+                      or None to follow the file until interrupted
+      """
+      # the text layer is kept, as closing it closes its binary layer
+      self.file = stream
+      self.stream = getattr(stream, 'buffer', stream)
+      self.poll = poll
+      self.timeout = timeout
+      self.offset = self.stream.tell()
+      self.closed = False
+
+   def read(self, size=-1):
+      """
+      :param size: maximum number of bytes to return, -1 for any number
+      :return: the next bytes of the file, waiting for them at its end.
+               b'' once the stream ended
+      """
+      waited = 0
+      while not self.closed:
+         data = self.stream.read(size)
+         if data:
+            self.offset += len(data)
+            return data
+
+         if os.fstat(self.stream.fileno()).st_size < self.offset:
+            raise OSError("followed file was truncated at offset {}"
+                          .format(self.offset))
+
+         if self.timeout is not None and waited >= self.timeout:
+            break
+
+         try:
+            time.sleep(self.poll)
+         except KeyboardInterrupt:
+            break
+         waited += self.poll
+
+      return b''
+
+   def close(self):
+      self.closed = True
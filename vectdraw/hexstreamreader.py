@@ -4,6 +4,127 @@
 stream reader generator
 """
 
+import binascii
+import logging
+import operator
+import re
+
+from vectdraw.diagnostics import StreamDiagnostics
+from vectdraw.mappedsource import MappedSource
+
+
+logger = logging.getLogger(__name__)
+
+kWhitespace = b' \t\n\r\x0b\x0c'
+
+
+class HexBlockDecoder(object):
+   """
+   Converts blocks of hex encoded text into blocks of raw byte values.
+   Whitespace is ignored, and an odd trailing character is carried over to
+   the next block.
+
+   Invalid hex characters are reported to diagnostics, and decoding resumes
+   at the next command byte (a pair starting with 8-F): the pair holding
+   the invalid character and the pairs up to the next command byte are
+   skipped. Without diagnostics, invalid hex characters raise
+   MalformedInputError.
+   """
+
+   kInvalidHexPattern = re.compile(b'[^0-9A-Fa-f]')
+   kCommandPairPattern = re.compile(b'[89A-Fa-f][0-9A-Fa-f]')
+
+   def __init__(self, diagnostics=None):
+      """
+      :param diagnostics: StreamDiagnostics collecting invalid hex input
+      """
+      self.carry = b''
+      self.diagnostics = (diagnostics if diagnostics is not None
+                          else StreamDiagnostics(strict=True))
+
+      # offset of the next character among the non whitespace characters
+      # of the input, and whether input is skipped up to a command byte
+      self.offset = 0
+      self.skipping = False
+
+   def Feed(self, block):
+      """
+      :param block: str, bytes or memoryview of hex text
+      :return: bytes of the complete bytes decoded from carry + block
+      """
+      if isinstance(block, str):
+         block = block.encode('latin-1')
+
+      text = self.carry + bytes(block).translate(None, kWhitespace)
+
+      if len(text) % 2:
+         text, self.carry = text[:-1], text[-1:]
+      else:
+         self.carry = b''
+
+      offset = self.offset
+      self.offset += len(text)
+      if not self.skipping:
+         try:
+            return binascii.unhexlify(text)
+         except binascii.Error:
+            pass
+
+      return self.__Resync(text, offset)
+
+   def __Resync(self, text, offset):
+      """
+      decodes text holding invalid characters, or starting while skipping
+      to the next command byte
+      :param text: even length hex text
+      :param offset: input offset of text
+      :return: bytes decoded from the valid parts of text
+      """
+      decoded = bytearray()
+      position = 0
+      while position < len(text):
+         if self.skipping:
+            match = self.kCommandPairPattern.search(text, position)
+            while match is not None and match.start() % 2:
+               match = self.kCommandPairPattern.search(text, match.start() + 1)
+
+            end = len(text) if match is None else match.start()
+            self.diagnostics.skippedCharacters += end - position
+            position = end
+            if match is None:
+               break
+
+            self.skipping = False
+
+         invalid = self.kInvalidHexPattern.search(text, position)
+         if invalid is None:
+            decoded += binascii.unhexlify(text[position:])
+            break
+
+         pair = invalid.start() - invalid.start() % 2
+         decoded += binascii.unhexlify(text[position:pair])
+         self.diagnostics.Add(StreamDiagnostics.kInvalidHex,
+                              chr(text[invalid.start()]),
+                              offset + invalid.start())
+         self.skipping = True
+         position = pair
+
+      return bytes(decoded)
+
+   def Close(self):
+      """
+      discards a dangling half byte left at the end of the input, if any
+      :return: number of discarded characters
+      """
+      dangling = len(self.carry)
+      if dangling:
+         logger.warning("Discarded dangling half byte {!r} at the end of the "
+                        "input".format(self.carry.decode('latin-1')))
+
+      self.carry = b''
+      self.skipping = False
+      return dangling
+
 
 class HexStreamReader(object):
    """
@@ -16,6 +137,12 @@ class HexStreamReader(object):
    """
    currentByte = None
 
+   # True for readers handing out raw byte values (ints) instead of hex strings
+   binary = False
+
+   # stream offset of the first byte yielded by ReadBlocks, see Seek
+   blocksOffset = 0
+
    def __init__(self, stream):
       """
       Initializes StreamReader Instance
@@ -36,6 +163,46 @@ class HexStreamReader(object):
    def __iter__(self):
       return self
 
+   def ReadBlocks(self, diagnostics=None, trackPositions=False):
+      """
+      generator yielding the rest of the stream as blocks of raw byte values
+      (bytes-like objects), for consumers that tokenize whole blocks instead
+      of iterating byte by byte. Whitespace is ignored
+      :param diagnostics: StreamDiagnostics collecting invalid hex input,
+                          see HexBlockDecoder
+      :param trackPositions: unused, positions can't be tracked (see
+                             Position)
+      """
+      decoder = HexBlockDecoder(diagnostics)
+      pairs = []
+      for byte in self:
+         pairs.append(byte)
+         if len(pairs) == 4096:
+            yield decoder.Feed(''.join(pairs))
+            pairs = []
+
+      yield decoder.Feed(''.join(pairs))
+      decoder.Close()
+
+   def Position(self, offset):
+      """
+      locates a byte yielded by ReadBlocks in the source, for Seek
+      :param offset: stream offset of the byte
+      :return: JSON serializable dict, or None if the reader can't locate
+               offset
+      """
+      return None
+
+   def Seek(self, position):
+      """
+      positions the reader so that ReadBlocks resumes at a position
+      returned by Position
+      :param position: dict returned by Position
+      :raises ValueError: if the reader can't seek
+      """
+      raise ValueError("{} can't seek to a stream position"
+                       .format(type(self).__name__))
+
    def __next__(self):
       if self.closed:
          raise StopIteration
@@ -46,4 +213,315 @@ class HexStreamReader(object):
          self.close()
          raise StopIteration
 
-      return self.currentByte
\ No newline at end of file
+      return self.currentByte
+
+
+class BufferedHexStreamReader(HexStreamReader):
+   """
+   HexStreamReader that reads the underlying stream in large blocks instead
+   of issuing a read call per byte. Whitespace (spaces, newlines, tabs) is
+   stripped from each block in bulk, and bytes are handed out from the
+   buffered block with the same currentByte/iterator contract as
+   HexStreamReader.
+
+   If the stream exposes its binary layer (e.g. sys.stdin.buffer or a file
+   opened in text mode), blocks are read from it directly. If useMmap is
+   set and the stream is a regular file, the file is memory mapped and
+   blocks are read from the mapping instead.
+   """
+   kDefaultBlockSize = 1 << 20  # 1 MiB
+
+   def __init__(self, stream, blockSize=kDefaultBlockSize, useMmap=False):
+      """
+      Initializes BufferedHexStreamReader Instance
+      :param stream: an open stream of characters or bytes
+      :param blockSize: number of characters to read from stream at a time
+      :param useMmap: memory map the stream if it is a regular file
+      """
+      super(BufferedHexStreamReader, self).__init__(stream)
+
+      if not isinstance(blockSize, int) or blockSize < 2:
+         raise ValueError("blockSize must be an int of at least 2, "
+                          "received {}".format(blockSize))
+
+      self.blockSize = blockSize
+      self.source = ((useMmap and MappedSource.FromStream(stream)) or
+                     getattr(stream, 'buffer', stream))
+      self.pairs = iter(())
+      self.remainder = ''
+
+      # number of characters read from the source, and the anchors of the
+      # blocks read by ReadBlocks when tracking positions: (stream offset,
+      # source offset, carried character, skipping) tuples of the decoder
+      # state before each block. Seek sets resume to the (skip, carry,
+      # skipping) state the next ReadBlocks starts with
+      self.sourceOffset = 0
+      self.anchors = []
+      self.resume = None
+
+   def close(self):
+      if isinstance(self.source, MappedSource):
+         self.source.close()
+
+      super(BufferedHexStreamReader, self).close()
+
+   def __next__(self):
+      try:
+         self.currentByte = next(self.pairs)
+
+      except StopIteration:
+         if self.closed:
+            raise
+
+         self.pairs = self.__ReadPairs()
+         self.currentByte = next(self.pairs, '')
+
+         if not self.currentByte:
+            self.close()
+            raise StopIteration
+
+      return self.currentByte
+
+   def ReadBlocks(self, diagnostics=None, trackPositions=False):
+      """
+      generator yielding the rest of the stream as blocks of raw byte values,
+      decoded from each block read from the source in bulk. Whitespace is
+      ignored and a dangling half byte at the end of the input is discarded
+      :param diagnostics: StreamDiagnostics collecting invalid hex input,
+                          see HexBlockDecoder
+      :param trackPositions: record the anchors Position locates stream
+                             offsets with
+      """
+      decoder = HexBlockDecoder(diagnostics)
+      skip = 0
+      if self.resume is not None:
+         skip, decoder.carry, decoder.skipping = self.resume
+         self.resume = None
+
+      # stream offset of the next decoded byte
+      decoded = self.blocksOffset - skip
+
+      # bytes already buffered by __next__ come first
+      buffered = ''.join(self.pairs) + self.remainder
+      self.pairs = iter(())
+      self.remainder = ''
+      if buffered:
+         block = decoder.Feed(buffered)
+         decoded += len(block)
+         yield block
+
+      while not self.closed:
+         if trackPositions:
+            self.anchors.append((decoded, self.sourceOffset, decoder.carry,
+                                 decoder.skipping))
+
+         data = self.source.read(self.blockSize)
+         if not data:
+            break
+
+         self.sourceOffset += len(data)
+         block = decoder.Feed(data)
+         del data  # may be a slice of a mapping
+
+         decoded += len(block)
+         if skip:
+            block, skip = block[skip:], max(0, skip - len(block))
+         if block:
+            yield block
+
+      decoder.Close()
+      self.currentByte = ''
+
+   def Position(self, offset):
+      """
+      locates a byte yielded by ReadBlocks in the source, from the anchor
+      of the block holding it. Anchors before it are dropped, so offset
+      must not decrease between calls
+      :param offset: stream offset of the byte
+      :return: JSON serializable dict, or None if the reader can't locate
+               offset
+      """
+      index = len(self.anchors) - 1
+      while index >= 0 and self.anchors[index][0] > offset:
+         index -= 1
+
+      if index < 0:
+         return None
+
+      del self.anchors[:index]
+      decoded, source, carry, skipping = self.anchors[0]
+      return {"offset": offset, "source": source, "skip": offset - decoded,
+              "carry": carry.decode('latin-1'), "skipping": skipping}
+
+   def Seek(self, position):
+      """
+      positions the reader so that ReadBlocks resumes at a position
+      returned by Position
+      :param position: dict returned by Position
+      :raises ValueError: if the source can't seek
+      """
+      try:
+         self.source.seek(position["source"])
+      except (AttributeError, OSError) as e:
+         raise ValueError("can't seek the source: {}".format(e))
+
+      self.sourceOffset = position["source"]
+      self.blocksOffset = position["offset"]
+      self.resume = (position["skip"], position["carry"].encode('latin-1'),
+                     position["skipping"])
+      self.anchors = []
+      self.pairs = iter(())
+      self.remainder = ''
+
+   def __ReadPairs(self):
+      """
+      reads the next block from the source and returns an iterator over its
+      2 character bytes. An odd trailing character is carried over to the
+      next block, or returned on its own once the source is exhausted
+      :return: iterator of 2 character strings
+      """
+      block = self.remainder
+      while len(block) < 2:
+         data = self.source.read(self.blockSize)
+         if not data:
+            self.remainder = ''
+            return iter((block,))
+
+         self.sourceOffset += len(data)
+         block += self.__StripWhitespace(data)
+
+      if len(block) % 2:
+         block, self.remainder = block[:-1], block[-1]
+      else:
+         self.remainder = ''
+
+      chars = iter(block)
+      return map(operator.add, chars, chars)
+
+   def __StripWhitespace(self, block):
+      """
+      removes whitespace characters from block
+      :param block: str, bytes or memoryview read from the source
+      :return: str with whitespace removed
+      """
+      if isinstance(block, memoryview):
+         block = str(block, 'latin-1')
+
+      if isinstance(block, str):
+         return ''.join(block.split())
+
+      return block.translate(None, kWhitespace).decode('latin-1')
+
+
+class BinaryStreamReader(HexStreamReader):
+   """
+   Reads raw command bytes (e.g. 0xF0, 0x80) from a binary stream in blocks.
+   Each byte is handed out as an int with the same currentByte/iterator
+   contract as HexStreamReader. currentByte is reset to None once the
+   stream is exhausted.
+
+   If the stream exposes its binary layer (e.g. sys.stdin.buffer), blocks
+   are read from it directly. If useMmap is set and the stream is a regular
+   file, the file is memory mapped and bytes are handed out straight from
+   memoryview slices of the mapping, without being copied.
+   """
+   binary = True
+
+   def __init__(self, stream,
+                blockSize=BufferedHexStreamReader.kDefaultBlockSize,
+                useMmap=False):
+      """
+      Initializes BinaryStreamReader Instance
+      :param stream: an open stream of bytes
+      :param blockSize: number of bytes to read from stream at a time
+      :param useMmap: memory map the stream if it is a regular file
+      """
+      super(BinaryStreamReader, self).__init__(stream)
+
+      if not isinstance(blockSize, int) or blockSize < 1:
+         raise ValueError("blockSize must be a positive int, received {}"
+                          .format(blockSize))
+
+      self.blockSize = blockSize
+      self.source = ((useMmap and MappedSource.FromStream(stream)) or
+                     getattr(stream, 'buffer', stream))
+      self.bytes = iter(())
+
+   def close(self):
+      # drop the iterator first, it may reference a slice of a mapping
+      self.bytes = iter(())
+      if isinstance(self.source, MappedSource):
+         self.source.close()
+
+      super(BinaryStreamReader, self).close()
+
+   def ReadBlocks(self, diagnostics=None, trackPositions=False):
+      """
+      generator yielding the rest of the stream as blocks of raw byte values,
+      as read from the source (memoryview slices when memory mapped)
+      :param diagnostics: unused, binary input has no encoding to be invalid
+      :param trackPositions: unused, stream offsets are source offsets
+      """
+      buffered = bytes(self.bytes)
+      self.bytes = iter(())
+      if buffered:
+         yield buffered
+
+      while not self.closed:
+         block = self.source.read(self.blockSize)
+         if not block:
+            break
+
+         if isinstance(block, str):
+            raise TypeError("Expected a stream of bytes, read {}"
+                            .format(type(block)))
+
+         yield block
+
+      self.currentByte = None
+
+   def Position(self, offset):
+      """
+      :param offset: stream offset of a byte yielded by ReadBlocks
+      :return: JSON serializable dict locating offset, for Seek
+      """
+      return {"offset": offset, "source": offset}
+
+   def Seek(self, position):
+      """
+      positions the reader so that ReadBlocks resumes at a position
+      returned by Position
+      :param position: dict returned by Position
+      :raises ValueError: if the source can't seek
+      """
+      try:
+         self.source.seek(position["source"])
+      except (AttributeError, OSError) as e:
+         raise ValueError("can't seek the source: {}".format(e))
+
+      self.blocksOffset = position["offset"]
+      self.bytes = iter(())
+
+   def __next__(self):
+      try:
+         self.currentByte = next(self.bytes)
+
+      except StopIteration:
+         if self.closed:
+            raise
+
+         block = self.source.read(self.blockSize)
+         if not block:
+            del block  # may be an empty slice of a mapping
+            self.currentByte = None
+            self.close()
+            raise
+
+         if isinstance(block, str):
+            raise TypeError("Expected a stream of bytes, read {}"
+                            .format(type(block)))
+
+         self.bytes = iter(block)
+         self.currentByte = next(self.bytes)
+
+      return self.currentByte
@@ -0,0 +1,376 @@
+"""
+seekable index (.vdi) of the commands of a stream, with keyframes of the
+board state for random access to a window of commands
+"""
+
+import array
+import bisect
+import json
+import logging
+import os
+import struct
+import sys
+
+from vectdraw.tokenizer import CommandTokenizer
+
+logger = logging.getLogger(__name__)
+
+kSidecarExtension = '.vdi'
+
+# magic, flags, size and mtime (ns) of the source file, command count,
+# keyframe interval, size of the keyframes
+kHeader = struct.Struct('<4sB3xQQQQQ')
+kMagic = b'VDI1'
+kBinaryFlag = 0x01
+
+kOffsetSize = 8
+
+# offsets are written to the file in batches of this many
+kOffsetBatch = 1 << 16
+
+
+class CommandIndex(object):
+   """
+   Index of the commands of a stream, numbered from 0 in stream order.
+   Unrecognized commands aren't numbered. The .vdi file holds a header
+   (see kHeader), recording whether the source was read as binary and the
+   size and modification time of the source file, followed by:
+
+   - the stream offset of each command's command byte, followed by the
+     end of the stream, as little endian int64s
+   - the keyframes as JSON: every `every` commands, the position of the
+     command in the input (see HexStreamReader.Position) and the state of
+     the board before it (see Board.GetState)
+
+   Only the header and keyframes are loaded: offsets are read from the
+   file as they are needed, so the cost of a lookup doesn't depend on the
+   length of the stream.
+   """
+
+   kDefaultEvery = 10000
+
+   def __init__(self, path, binary, count, every, keyframes):
+      self.path = path
+      self.binary = binary
+      self.count = count
+      self.every = every
+      self.keyframes = keyframes
+      self.numbers = [keyframe["command"] for keyframe in keyframes]
+
+   def __len__(self):
+      return self.count
+
+   @classmethod
+   def Build(cls, processor, path, every=kDefaultEvery, source=None):
+      """
+      runs processor over its whole stream, writing the index of the
+      stream to path
+      :param processor: VectorCommandStreamProcessor of an unread stream
+      :param path: path of the .vdi file
+      :param every: number of commands between keyframes
+      :param source: path of the source file, identifying it in the index
+      :return: CommandIndex
+      :raises ValueError: if the stream reader can't locate positions
+      """
+      if every < 1:
+         raise ValueError("every must be at least 1, received {}"
+                          .format(every))
+
+      reader = processor.streamreader
+      tokenizer = processor.tokenizer = CommandTokenizer(
+         processor.kMaxChunkArgs)
+      processor.dropping = False
+      processor.heldArgs = b''
+      blocks = reader.ReadBlocks(processor.diagnostics, trackPositions=True)
+
+      temporary = '{}.{}.tmp'.format(path, os.getpid())
+      try:
+         with open(temporary, 'wb') as f:
+            f.write(bytes(kHeader.size))
+
+            # commands with the wrong number of arguments keep their
+            # number, but are skipped as a run skips them
+            writer = IndexWriter(f, reader, processor.vectorBoard, every)
+            for commandByte, args, partial in processor.TokenRecords(
+                  tokenizer.Tokenize(blocks), writer.Add):
+               processor.Dispatch(commandByte, args, partial)
+
+            count, keyframes = writer.count, writer.keyframes
+            writer.Close(reader.blocksOffset + tokenizer.offset)
+
+            keyframeData = json.dumps(keyframes).encode('ascii')
+            f.write(keyframeData)
+
+            size, mtime = SourceStat(source)
+            f.seek(0)
+            f.write(kHeader.pack(
+               kMagic, kBinaryFlag if reader.binary else 0, size, mtime,
+               count, every, len(keyframeData)))
+
+         os.replace(temporary, path)
+      finally:
+         if os.path.exists(temporary):
+            os.remove(temporary)
+
+      processor.diagnostics.Report(processor.logger)
+      return cls(path, reader.binary, count, every, keyframes)
+
+   @classmethod
+   def Load(cls, path):
+      """
+      reads the header and keyframes of a .vdi file
+      :param path: path of the .vdi file
+      :return: CommandIndex
+      :raises ValueError: if path isn't a complete .vdi file
+      """
+      with open(path, 'rb') as f:
+         binary, size, mtime, count, every, keyframeSize = ReadHeader(f)
+         f.seek(kHeader.size + (count + 1) * kOffsetSize)
+         keyframeData = f.read(keyframeSize)
+
+      if len(keyframeData) != keyframeSize:
+         raise ValueError("truncated index {}".format(path))
+
+      return cls(path, binary, count, every, json.loads(keyframeData))
+
+   def Offset(self, number):
+      """
+      :param number: command number, or len(self) for the end of the stream
+      :return: stream offset of the command byte of the command
+      """
+      if not 0 <= number <= self.count:
+         raise IndexError("command {} out of range".format(number))
+
+      with open(self.path, 'rb') as f:
+         f.seek(kHeader.size + number * kOffsetSize)
+         return struct.unpack('<q', f.read(kOffsetSize))[0]
+
+   def Keyframe(self, number):
+      """
+      :param number: command number
+      :return: the last keyframe at or before command number, or None if
+               there is none
+      """
+      index = bisect.bisect_right(self.numbers, number) - 1
+      return self.keyframes[index] if index >= 0 else None
+
+
+class IndexWriter(object):
+   """
+   Writes the offsets of the commands of a stream to a .vdi file as they
+   begin, collecting the keyframes
+   """
+
+   def __init__(self, f, reader, board, every):
+      """
+      :param f: .vdi file, positioned after its header
+      :param reader: stream reader of the stream, tracking positions
+      :param board: board the commands are executed on
+      :param every: number of commands between keyframes
+      """
+      self.f = f
+      self.reader = reader
+      self.board = board
+      self.every = every
+      self.offsets = array.array('q')
+      self.keyframes = []
+      self.count = 0
+
+   def Add(self, token):
+      """
+      numbers the command of token, before it is executed. See
+      VectorCommandStreamProcessor.TokenRecords
+      :param token: first Token of the command
+      :raises ValueError: if the stream reader can't locate positions
+      """
+      offset = self.reader.blocksOffset + token.offset
+      if self.count % self.every == 0:
+         position = self.reader.Position(offset)
+         if position is None:
+            raise ValueError("{} can't locate stream positions"
+                             .format(type(self.reader).__name__))
+
+         self.keyframes.append({"command": self.count, "input": position,
+                                "board": self.board.GetState()})
+
+      self.offsets.append(offset)
+      self.count += 1
+      if len(self.offsets) == kOffsetBatch:
+         WriteOffsets(self.f, self.offsets)
+
+   def Close(self, end):
+      """
+      writes the remaining offsets, followed by the end of the stream
+      :param end: stream offset of the end of the stream
+      """
+      self.offsets.append(end)
+      WriteOffsets(self.f, self.offsets)
+
+
+class BlockWindow(object):
+   """
+   Hands out blocks in consecutive windows of stream offsets, splitting
+   the blocks at the window ends
+   """
+
+   def __init__(self, blocks, offset):
+      """
+      :param blocks: iterable of bytes-like objects of raw byte values
+      :param offset: stream offset of the first byte of blocks
+      """
+      self.blocks = iter(blocks)
+      self.offset = offset
+      self.rest = None
+
+   def Take(self, end):
+      """
+      generator of the next blocks, up to stream offset end
+      :param end: stream offset the window ends at
+      """
+      while self.offset < end:
+         block = self.rest if self.rest is not None else next(self.blocks,
+                                                               None)
+         self.rest = None
+         if block is None:
+            return
+
+         size = end - self.offset
+         if len(block) > size:
+            block, self.rest = block[:size], block[size:]
+
+         self.offset += len(block)
+         yield block
+
+   def Close(self):
+      """
+      closes blocks, dropping any reference to a block
+      """
+      self.rest = None
+      if hasattr(self.blocks, 'close'):
+         self.blocks.close()
+
+
+class NullStream(object):
+   """
+   output stream discarding everything written to it
+   """
+
+   def write(self, message):
+      return len(message)
+
+   def flush(self):
+      pass
+
+
+def RunRange(processor, index, start, end):
+   """
+   executes commands start to end (excluded) of the stream of processor,
+   from the keyframe closest to start. The commands between the keyframe
+   and start are executed without output, to restore the board state
+   :param processor: VectorCommandStreamProcessor of an unread stream
+   :param index: CommandIndex of the stream
+   :param start: number of the first command to execute
+   :param end: number of the command to stop at
+   """
+   start = max(0, min(start, len(index)))
+   end = max(start, min(end, len(index)))
+   keyframe = index.Keyframe(start)
+   if keyframe is None:
+      return
+
+   reader = processor.streamreader
+   board = processor.vectorBoard
+   reader.Seek(keyframe["input"])
+   board.SetState(keyframe["board"])
+
+   window = BlockWindow(reader.ReadBlocks(processor.diagnostics),
+                        keyframe["input"]["offset"])
+   output = board.outputStream
+   try:
+      board.outputStream = NullStream()
+      try:
+         processor.Process(window.Take(index.Offset(start)))
+      finally:
+         board.outputStream = output
+
+      processor.Process(window.Take(index.Offset(end)))
+   finally:
+      window.Close()
+      processor.diagnostics.Report(processor.logger)
+
+
+def WriteOffsets(f, offsets):
+   """
+   writes offsets to f in little endian byte order and empties offsets
+   """
+   if sys.byteorder == 'big':
+      offsets.byteswap()
+   offsets.tofile(f)
+   del offsets[:]
+
+
+def ReadHeader(f):
+   """
+   reads the header of a .vdi file
+   :param f: binary file object positioned at the start of the file
+   :return: tuple of (binary, source size, source mtime, command count,
+            keyframe interval, keyframes size)
+   :raises ValueError: if f doesn't start with a .vdi header
+   """
+   header = f.read(kHeader.size)
+   if len(header) != kHeader.size:
+      raise ValueError("not an index: header is truncated")
+
+   magic, flags, size, mtime, count, every, keyframeSize = \
+      kHeader.unpack(header)
+   if magic != kMagic:
+      raise ValueError("not an index: bad magic number {!r}".format(magic))
+
+   return bool(flags & kBinaryFlag), size, mtime, count, every, keyframeSize
+
+
+def SourceStat(path):
+   """
+   :param path: path of the source file, or None
+   :return: tuple of the size and modification time (ns) of path, zeros if
+            path is None
+   """
+   if path is None:
+      return 0, 0
+
+   stat = os.stat(path)
+   return stat.st_size, stat.st_mtime_ns
+
+
+def SidecarPath(path):
+   """
+   :param path: path of a command stream file
+   :return: path of its .vdi index
+   """
+   return path + kSidecarExtension
+
+
+def LoadIndex(path, binary):
+   """
+   loads the .vdi index of path if it was built from the current content
+   of path, read in the same mode
+   :param path: path of a command stream file
+   :param binary: True if the stream is read as raw binary
+   :return: CommandIndex, or None if there is no valid index
+   """
+   sidecar = SidecarPath(path)
+   if not os.path.isfile(sidecar):
+      return None
+
+   try:
+      with open(sidecar, 'rb') as f:
+         indexBinary, size, mtime = ReadHeader(f)[:3]
+
+      if indexBinary != binary or (size, mtime) != SourceStat(path):
+         logger.info("ignoring stale index {}".format(sidecar))
+         return None
+
+      return CommandIndex.Load(sidecar)
+   except (OSError, ValueError) as e:
+      logger.warning("ignoring index {}: {}".format(sidecar, e))
+      return None
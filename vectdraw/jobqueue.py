@@ -0,0 +1,381 @@
+"""
+durable queue of vectdraw runs in a sqlite database, drained by any number
+of worker processes on hosts sharing the database's filesystem
+"""
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+
+from vectdraw.scripts import main as VectdrawMain
+from vectdraw.settings import kDefaultAttempts, kDefaultLease
+
+logger = logging.getLogger(__name__)
+
+# job states
+kQueued = 'queued'
+kRunning = 'running'
+kDone = 'done'
+kFailed = 'failed'
+kStates = (kQueued, kRunning, kDone, kFailed)
+
+kSchema = """
+CREATE TABLE IF NOT EXISTS jobs (
+   id INTEGER PRIMARY KEY,
+   argv TEXT NOT NULL,
+   input TEXT NOT NULL,
+   output TEXT NOT NULL,
+   state TEXT NOT NULL,
+   attempts INTEGER NOT NULL DEFAULT 0,
+   maxAttempts INTEGER NOT NULL,
+   worker TEXT,
+   leaseExpires REAL,
+   submitted REAL NOT NULL,
+   started REAL,
+   finished REAL,
+   error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobsByState ON jobs (state, id);
+"""
+
+
+def WorkerName():
+   """
+   :return: name identifying this process among the workers of all hosts
+   """
+   return "{}:{}".format(socket.gethostname(), os.getpid())
+
+
+class Job(object):
+   """
+   a job claimed by a worker: the vectdraw arguments of a run, and the
+   input and output paths given in them
+   """
+
+   def __init__(self, id, argv, input, output, attempts, worker):
+      self.id = id
+      self.argv = argv
+      self.input = input
+      self.output = output
+      self.attempts = attempts
+      self.worker = worker
+
+
+class JobQueue(object):
+   """
+   A queue of vectdraw runs in a sqlite database. Every state change is a
+   transaction begun with BEGIN IMMEDIATE, which takes the database's
+   write lock, so two workers never claim the same job.
+
+   A claimed job is leased to its worker until leaseExpires, which the
+   worker pushes back with Heartbeat while it runs the job. A job whose
+   lease expired, because its worker died or lost the database, is
+   claimed again by the next worker, up to maxAttempts claims; after that
+   it fails. Only the worker holding a job's lease can finish it.
+
+   Leases compare the wall clocks of the hosts, which must be roughly in
+   sync, well within the lease. The database is left in sqlite's default
+   rollback journal mode, as WAL doesn't work on network filesystems.
+   """
+
+   kDefaultLease = kDefaultLease
+   kDefaultAttempts = kDefaultAttempts
+
+   # seconds to wait for another worker's transaction to end
+   kBusyTimeout = 60.0
+
+   def __init__(self, path, lease=kDefaultLease):
+      """
+      :param path: path of the database, created if missing
+      :param lease: seconds a worker holds a claimed job without a
+                    heartbeat
+      """
+      self.path = path
+      self.lease = lease
+      self.connection = sqlite3.connect(path, timeout=self.kBusyTimeout,
+                                        isolation_level=None)
+      with self.__Transaction():
+         for statement in kSchema.split(';'):
+            if statement.strip():
+               self.connection.execute(statement)
+
+   def Close(self):
+      self.connection.close()
+
+   def Submit(self, jobs, maxAttempts=kDefaultAttempts):
+      """
+      adds jobs to the queue
+      :param jobs: iterable of (argv, input path, output path) tuples, argv
+                   being the arguments of a vectdraw run
+      :param maxAttempts: number of times a job is claimed before it fails
+      :return: list of the ids of the jobs
+      """
+      now = time.time()
+      ids = []
+      with self.__Transaction():
+         for argv, inputPath, outputPath in jobs:
+            cursor = self.connection.execute(
+               "INSERT INTO jobs (argv, input, output, state, maxAttempts, "
+               "submitted) VALUES (?, ?, ?, ?, ?, ?)",
+               (json.dumps(argv), inputPath, outputPath, kQueued,
+                maxAttempts, now))
+            ids.append(cursor.lastrowid)
+
+      return ids
+
+   def Claim(self, worker):
+      """
+      leases the oldest queued job, or the oldest job whose lease expired,
+      to worker. Expired jobs without attempts left fail
+      :param worker: name of the claiming worker, see WorkerName
+      :return: Job, or None if no job can be claimed
+      """
+      now = time.time()
+      with self.__Transaction():
+         self.connection.execute(
+            "UPDATE jobs SET state = ?, finished = ?, worker = NULL, "
+            "error = 'lease expired after ' || attempts || ' attempts' "
+            "WHERE state = ? AND leaseExpires < ? AND attempts >= "
+            "maxAttempts", (kFailed, now, kRunning, now))
+
+         row = self.connection.execute(
+            "SELECT id, argv, input, output, attempts FROM jobs "
+            "WHERE state = ? OR (state = ? AND leaseExpires < ?) "
+            "ORDER BY id LIMIT 1", (kQueued, kRunning, now)).fetchone()
+         if row is None:
+            return None
+
+         id, argv, inputPath, outputPath, attempts = row
+         self.connection.execute(
+            "UPDATE jobs SET state = ?, worker = ?, attempts = ?, "
+            "leaseExpires = ?, started = ? WHERE id = ?",
+            (kRunning, worker, attempts + 1, now + self.lease, now, id))
+
+      return Job(id, json.loads(argv), inputPath, outputPath, attempts + 1,
+                 worker)
+
+   def Heartbeat(self, job):
+      """
+      extends the lease of job
+      :param job: Job claimed by this worker
+      :return: False if the worker lost the lease
+      """
+      with self.__Transaction():
+         return self.connection.execute(
+            "UPDATE jobs SET leaseExpires = ? WHERE id = ? AND worker = ? "
+            "AND state = ?",
+            (time.time() + self.lease, job.id, job.worker, kRunning)
+         ).rowcount == 1
+
+   def Finish(self, job, error=None, publish=None):
+      """
+      records the end of job
+      :param job: Job claimed by this worker
+      :param error: None if the job succeeded, else the error message
+      :param publish: callable publishing the result of the job, called
+                      within the transaction once the worker is known to
+                      hold the lease, so no other worker publishes the
+                      result of the job. If it raises, the job isn't
+                      finished
+      :return: False if the worker lost the lease, and the result was
+               discarded
+      """
+      with self.__Transaction():
+         finished = self.connection.execute(
+            "UPDATE jobs SET state = ?, finished = ?, error = ?, "
+            "leaseExpires = NULL WHERE id = ? AND worker = ? AND state = ?",
+            (kDone if error is None else kFailed, time.time(), error, job.id,
+             job.worker, kRunning)).rowcount == 1
+
+         if finished and publish is not None:
+            publish()
+         return finished
+
+   def Counts(self):
+      """
+      :return: dict of the number of jobs in each state
+      """
+      counts = dict.fromkeys(kStates, 0)
+      counts.update(self.connection.execute(
+         "SELECT state, COUNT(*) FROM jobs GROUP BY state"))
+      return counts
+
+   def Jobs(self, state=None):
+      """
+      :param state: only list the jobs in this state
+      :return: list of (id, state, attempts, worker, input, output, error)
+               tuples, in order of submission
+      """
+      query = ("SELECT id, state, attempts, worker, input, output, error "
+               "FROM jobs")
+      if state is None:
+         return self.connection.execute(query + " ORDER BY id").fetchall()
+
+      return self.connection.execute(
+         query + " WHERE state = ? ORDER BY id", (state,)).fetchall()
+
+   def __Transaction(self):
+      return _Transaction(self.connection)
+
+
+class _Transaction(object):
+   """
+   context manager of a BEGIN IMMEDIATE transaction, committed unless an
+   exception is raised
+   """
+
+   def __init__(self, connection):
+      self.connection = connection
+
+   def __enter__(self):
+      self.connection.execute("BEGIN IMMEDIATE")
+
+   def __exit__(self, type, value, traceback):
+      self.connection.execute("COMMIT" if type is None else "ROLLBACK")
+      return False
+
+
+class _Heartbeat(threading.Thread):
+   """
+   extends the lease of a job every third of the lease while it runs, on a
+   connection of its own
+   """
+
+   def __init__(self, path, lease, job):
+      super().__init__(daemon=True)
+      self.path = path
+      self.lease = lease
+      self.job = job
+      self.stopped = threading.Event()
+
+   def run(self):
+      queue = JobQueue(self.path, self.lease)
+      try:
+         while not self.stopped.wait(self.lease / 3):
+            try:
+               if not queue.Heartbeat(self.job):
+                  logger.warning("job {} was claimed by another worker"
+                                 .format(self.job.id))
+                  return
+            except sqlite3.Error as e:
+               logger.warning("heartbeat of job {} failed: {}"
+                              .format(self.job.id, e))
+      finally:
+         queue.Close()
+
+   def Stop(self):
+      self.stopped.set()
+      self.join()
+
+
+def Work(queue, run, worker=None, wait=False, poll=1.0):
+   """
+   claims and runs the jobs of queue until none is left. Jobs whose run
+   raises, or exits with a non zero status, fail.
+
+   A job writes its output (the -o argument) to a temporary file next to
+   it, moved in place when the job is finished. So a worker that lost the
+   lease of a job, which another worker claimed since, doesn't overwrite
+   the output of the other worker
+   :param queue: JobQueue
+   :param run: callable running the vectdraw arguments of a job
+   :param worker: name of the worker, see WorkerName
+   :param wait: keep polling for new jobs once the queue is drained
+   :param poll: seconds between polls while no job can be claimed
+   :return: tuple of the number of jobs done and failed by this worker
+   """
+   worker = worker or WorkerName()
+   done = failed = 0
+   while True:
+      job = queue.Claim(worker)
+      if job is None:
+         if not wait and not queue.Counts()[kRunning]:
+            return done, failed
+
+         # running jobs are claimed again if their worker dies
+         time.sleep(poll)
+         continue
+
+      logger.info("{} claimed job {}: {}".format(worker, job.id, job.input))
+      argv, temporary = _TemporaryOutput(job)
+      heartbeat = _Heartbeat(queue.path, queue.lease, job)
+      heartbeat.start()
+      try:
+         error = None
+         try:
+            run(argv)
+         except SystemExit as e:
+            if e.code:
+               error = "exited with status {}".format(e.code)
+         except Exception as e:
+            error = "{}: {}".format(type(e).__name__, e)
+      finally:
+         heartbeat.Stop()
+
+      def Publish():
+         if temporary is not None:
+            os.replace(temporary, job.output)
+
+      try:
+         finished = queue.Finish(job, error,
+                                 Publish if error is None else None)
+      except OSError as e:
+         # the output couldn't be moved in place
+         error = "{}: {}".format(type(e).__name__, e)
+         finished = queue.Finish(job, error)
+      finally:
+         if temporary is not None and os.path.exists(temporary):
+            os.remove(temporary)
+
+      if not finished:
+         logger.warning("discarded the result of job {}: its lease expired"
+                        .format(job.id))
+      elif error is None:
+         done += 1
+      else:
+         failed += 1
+         logger.error("job {} ({}) failed: {}".format(job.id, job.input,
+                                                       error))
+
+
+def _TemporaryOutput(job):
+   """
+   :param job: Job
+   :return: tuple of the arguments of job writing its output to a
+            temporary file in the directory of the output, and the path of
+            the temporary file, or None if the arguments give no output.
+            The temporary file keeps the extension of the output, which
+            selects its compression
+   """
+   argv = list(job.argv)
+   for index, arg in enumerate(argv[:-1]):
+      if arg == '-o' and argv[index + 1] == job.output:
+         directory, name = os.path.split(job.output)
+         temporary = os.path.join(directory, '.job{}-{}.{}'.format(
+            job.id, job.attempts, name))
+         argv[index + 1] = temporary
+         return argv, temporary
+
+   return argv, None
+
+
+def RunVectdraw(argv):
+   """
+   runs vectdraw in process with the arguments argv, as the shell would
+   :param argv: arguments following 'vectdraw'
+   :raises SystemExit: if vectdraw exits with a non zero status
+   """
+   savedArgv = sys.argv
+   sys.argv = [savedArgv[0]] + list(argv)
+   try:
+      status = VectdrawMain()
+   finally:
+      sys.argv = savedArgv
+
+   if status:
+      raise SystemExit(status)
@@ -0,0 +1,83 @@
+"""
+memory mapped input source
+"""
+
+import io
+import mmap
+import os
+import stat
+
+
+class MappedSource(object):
+   """
+   Read only, file like view over a memory mapped regular file.
+
+   read() returns memoryview slices of the mapping, so the file's contents
+   are paged in by the OS and handed to the readers without being copied.
+   """
+
+   def __init__(self, fileno):
+      """
+      Maps the file referred to by fileno
+      :param fileno: file descriptor of an open, non empty regular file
+      """
+      self.map = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+      self.view = memoryview(self.map)
+      self.position = 0
+      self.closed = False
+
+   @classmethod
+   def FromStream(cls, stream):
+      """
+      returns a MappedSource for stream if it is backed by a non empty
+      regular file, else None (e.g. pipes, terminals or in memory streams)
+      :param stream: an open file object
+      :return: MappedSource instance or None
+      """
+      try:
+         fileno = stream.fileno()
+         fileStat = os.fstat(fileno)
+      except (AttributeError, OSError, io.UnsupportedOperation):
+         return None
+
+      if not stat.S_ISREG(fileStat.st_mode) or fileStat.st_size == 0:
+         return None
+
+      try:
+         return cls(fileno)
+      except (OSError, ValueError):
+         return None
+
+   def read(self, size=-1):
+      """
+      returns a memoryview of at most size bytes from the current position
+      :param size: maximum number of bytes to return, all if negative
+      :return: memoryview slice of the mapping (empty at end of file)
+      """
+      start = self.position
+      end = len(self.view) if size < 0 else min(start + size,
+                                                 len(self.view))
+      self.position = max(start, end)
+      return self.view[start:self.position]
+
+   def seek(self, offset, whence=io.SEEK_SET):
+      if whence == io.SEEK_CUR:
+         offset += self.position
+      elif whence == io.SEEK_END:
+         offset += len(self.view)
+
+      self.position = max(0, offset)
+      return self.position
+
+   def tell(self):
+      return self.position
+
+   def close(self):
+      """
+      releases the view and unmaps the file. Slices returned by read() must
+      no longer be referenced
+      """
+      if not self.closed:
+         self.view.release()
+         self.map.close()
+         self.closed = True
@@ -0,0 +1,231 @@
+"""
+parallel processing of a command stream cut into segments at CLR commands,
+which reset the board
+"""
+
+import collections
+import concurrent.futures
+import io
+
+from vectdraw.diagnostics import StreamDiagnostics
+from vectdraw.draw.pen import Pen
+from vectdraw.hexstreamreader import BinaryStreamReader
+
+
+# command byte value of CLR, see ClearCommand
+kClearByte = 0xF0
+
+# minimum number of stream bytes per segment, so segments are worth
+# sending to a worker process
+kSegmentSize = 1 << 20
+
+# maximum number of stream bytes held for a segment. Longer stretches
+# without CLR commands are drawn in process instead
+kMaxSegmentSize = 1 << 24
+
+
+def RunParallel(processor, jobs, segmentSize=kSegmentSize,
+                maxSegmentSize=kMaxSegmentSize):
+   """
+   runs processor like VectorCommandStreamProcessor.run, drawing its
+   stream on jobs worker processes.
+
+   CLR resets the pen's position, colour and location, so the commands
+   from a CLR up to the next one draw the same output whatever came before
+   them. The stream is read and decoded by the calling process and cut
+   before CLR commands into segments of at least segmentSize bytes. Each
+   segment is drawn on a fresh board by a worker process, and the outputs
+   are written in the order of the segments, so the output is the same as
+   run's as long as no command keeps state of its own across a CLR. At
+   most 2 * jobs segments are read ahead.
+
+   A segment reaching maxSegmentSize bytes without a CLR isn't held any
+   longer: the segments before it are written, and it is drawn by the
+   calling process as it is read, up to the next CLR. So a stream without
+   CLR commands is drawn like run, in bounded memory.
+   :param processor: VectorCommandStreamProcessor of an unread stream,
+                     whose class and commands the workers use
+   :param jobs: number of worker processes
+   :param segmentSize: minimum number of stream bytes per segment
+   :param maxSegmentSize: maximum number of stream bytes of a segment
+                          drawn by a worker process
+   """
+   output = processor.vectorBoard.outputStream
+   diagnostics = processor.diagnostics
+   worker = (type(processor), processor.encoding_class,
+             [type(command) for command in
+              processor.registeredCommands.values()],
+             not processor.pluginsLoaded, type(processor.vectorBoard),
+             diagnostics.strict, diagnostics.maxOffsets)
+
+   with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+      segments = collections.deque()
+
+      def Write():
+         """
+         writes the output of the first segment in flight
+         """
+         text, segmentDiagnostics, error = segments.popleft().result()
+         output.write(text)
+         output.flush()
+         diagnostics.Merge(segmentDiagnostics)
+         if error is not None:
+            raise error
+
+      def Submit(segment, offset):
+         segments.append(executor.submit(_DrawSegment, worker,
+                                         bytes(segment), offset))
+         if len(segments) > 2 * jobs:
+            Write()
+
+      failures = []
+      data = bytearray()
+      offset = 0
+      clear = 0
+      blocks = processor.streamreader.ReadBlocks(diagnostics)
+      try:
+         for block in _Guard(blocks, failures):
+            searched = len(data)
+            data += block
+
+            # the last CLR of data, past its first byte
+            found = data.rfind(kClearByte, max(searched, 1))
+            if found > 0:
+               clear = found
+
+            if clear and len(data) >= segmentSize:
+               Submit(data[:clear], offset)
+               del data[:clear]
+               offset += clear
+               clear = 0
+            elif len(data) >= maxSegmentSize:
+               while segments:
+                  Write()
+
+               data, drawn = _DrawStretch(worker, output, diagnostics, data,
+                                          blocks, offset)
+               offset += drawn
+               clear = max(data.rfind(kClearByte, 1), 0)
+
+         if failures:
+            # the stream ended in error: like run, don't execute the
+            # command whose arguments were cut off
+            del data[_LastCommand(data):]
+
+         if data:
+            Submit(data, offset)
+
+         while segments:
+            Write()
+      except BaseException:
+         executor.shutdown(wait=False, cancel_futures=True)
+         raise
+      finally:
+         diagnostics.Report(processor.logger)
+
+   if failures:
+      raise failures[0]
+
+
+def _Guard(blocks, failures):
+   """
+   generator of blocks, ending with the exception raised by blocks, if
+   any, appended to failures
+   """
+   try:
+      yield from blocks
+   except Exception as e:
+      failures.append(e)
+
+
+def _LastCommand(data):
+   """
+   :return: position of the last command byte of data, or 0
+   """
+   for position in range(len(data) - 1, -1, -1):
+      if data[position] & 0x80:
+         return position
+
+   return 0
+
+
+def _SegmentProcessor(worker, segment, offset, output):
+   """
+   :param worker: tuple of the processor class, codec, commands, plugins
+                  flag, board class, strict flag and maximum offsets
+   :param segment: bytes of raw byte values of the segment
+   :param offset: stream offset of the segment
+   :param output: text stream the segment is drawn to
+   :return: processor drawing a segment of a stream on a fresh board, with
+            StreamDiagnostics of its own
+   """
+   (processorClass, encodingClass, commands, plugins, boardClass, strict,
+    maxOffsets) = worker
+
+   return processorClass(
+      BinaryStreamReader(io.BytesIO(segment)), encodingClass,
+      boardClass(Pen(), outputStream=output, autoFlush=False), commands,
+      plugins=plugins,
+      diagnostics=StreamDiagnostics(strict, maxOffsets, baseOffset=offset))
+
+
+def _DrawSegment(worker, segment, offset):
+   """
+   worker process: draws a segment of a stream on a fresh board
+   :param worker: see _SegmentProcessor
+   :param segment: bytes of raw byte values of the segment
+   :param offset: stream offset of the segment
+   :return: tuple of the output text, the StreamDiagnostics of the segment
+            and the exception that stopped drawing, if any
+   """
+   output = io.StringIO()
+   processor = _SegmentProcessor(worker, segment, offset, output)
+
+   error = None
+   try:
+      processor.Process(processor.Blocks())
+   except Exception as e:
+      error = e
+
+   return output.getvalue(), processor.diagnostics, error
+
+
+def _DrawStretch(worker, output, diagnostics, data, blocks, offset):
+   """
+   draws a stretch of a stream without CLR commands in the calling
+   process, as it is read: data, then the blocks read from blocks up to
+   the next CLR. Exceptions raised by blocks are raised, as run does
+   :param worker: see _SegmentProcessor
+   :param output: text stream the stretch is drawn to
+   :param diagnostics: StreamDiagnostics of the stream
+   :param data: bytearray of the start of the stretch
+   :param blocks: iterator of the following blocks of the stream
+   :param offset: stream offset of the stretch
+   :return: tuple of a bytearray of the data read from the next CLR on,
+            and the number of stream bytes drawn
+   """
+   processor = _SegmentProcessor(worker, b'', offset, output)
+   rest = bytearray()
+   drawn = [len(data)]
+
+   def Stretch():
+      yield data
+      for block in blocks:
+         block = bytes(block)
+         found = block.find(kClearByte)
+         if found >= 0:
+            rest.extend(block[found:])
+            block = block[:found]
+
+         drawn[0] += len(block)
+         yield block
+         if found >= 0:
+            return
+
+   try:
+      processor.Process(Stretch())
+   finally:
+      output.flush()
+      diagnostics.Merge(processor.diagnostics)
+
+   return rest, drawn[0]
@@ -0,0 +1,190 @@
+"""
+parallel drawing of the points of very long moves, cut into chunks drawn
+on worker processes
+"""
+
+import collections
+import concurrent.futures
+import io
+
+from vectdraw.draw.pen import Pen
+from vectdraw.draw.plane import Point
+
+
+class ParallelMoveExecutor(object):
+   """
+   Draws the points of moves begun with the pen down on jobs worker
+   processes, for Board.moveExecutor. The output is the same as the
+   board's own.
+
+   Moves are relative, so the position of the pen before each point is a
+   prefix sum of the points before it. Once a move holds minPoints points,
+   it is cut into chunks of chunkPoints points, and each chunk is drawn
+   from its starting position on a fresh board by a worker process, while
+   the next chunks are cut. The chunks are stitched in order on the board:
+
+   - the pen state at the start of a chunk depends on the boundary
+     crossings before it, so the worker assumes the pen is down where the
+     chunk starts within the boundaries. If the chunk actually starts with
+     the other pen state, or its worker failed, the chunk is drawn again
+     on the board itself, which also reproduces any error.
+   - workers begin with no MV line open, so the output of a chunk that
+     continues an open line is written without its leading "MV".
+
+   Moves with fewer points are drawn on the board itself. At most 2 * jobs
+   chunks are in flight.
+   """
+
+   kChunkPoints = 1 << 14
+   kMinPoints = 1 << 16
+
+   def __init__(self, jobs, chunkPoints=kChunkPoints, minPoints=kMinPoints):
+      """
+      :param jobs: number of worker processes
+      :param chunkPoints: number of points per chunk
+      :param minPoints: number of points from which moves are drawn in
+                        parallel
+      """
+      self.jobs = jobs
+      self.chunkPoints = chunkPoints
+      self.minPoints = max(minPoints, chunkPoints)
+
+      self.__executor = None
+      self.__points = []
+      self.__chunks = collections.deque()
+      self.__position = None
+
+   def Begin(self, board):
+      """
+      begins a move of board with the pen down
+      :param board: Board drawing the move
+      """
+      self.__Reset()
+
+   def Continue(self, board, points):
+      """
+      adds the next chunk of points of the move
+      :param board: Board drawing the move
+      :param points: list of Point instances
+      """
+      self.__points.extend(points)
+      if len(self.__points) < self.minPoints:
+         return
+
+      try:
+         chunkPoints = self.chunkPoints
+         while len(self.__points) >= chunkPoints:
+            self.__Submit(board, self.__points[:chunkPoints])
+            del self.__points[:chunkPoints]
+      except BaseException:
+         self.__Reset()
+         raise
+
+   def End(self, board):
+      """
+      draws the rest of the move. The board ends its MV line itself
+      :param board: Board drawing the move
+      """
+      try:
+         while self.__chunks:
+            self.__Stitch(board)
+
+         if self.__points:
+            board.DrawPoints(self.__points)
+      finally:
+         self.__Reset()
+
+   def Close(self):
+      """
+      shuts the worker processes down
+      """
+      self.__Reset()
+      if self.__executor is not None:
+         self.__executor.shutdown()
+         self.__executor = None
+
+   def __Reset(self):
+      for future, _, _ in self.__chunks:
+         future.cancel()
+
+      self.__chunks.clear()
+      self.__points = []
+      self.__position = None
+
+   def __Submit(self, board, points):
+      """
+      sends points to a worker, speculating the pen state at their start
+      unless every chunk before them was stitched
+      """
+      if self.__executor is None:
+         self.__executor = concurrent.futures.ProcessPoolExecutor(self.jobs)
+
+      if self.__chunks:
+         x, y = self.__position
+         penDown = (board.XAxis.lowerBound < x < board.XAxis.upperBound and
+                    board.YAxis.lowerBound < y < board.YAxis.upperBound)
+      else:
+         x = board.currentPenLocation.x
+         y = board.currentPenLocation.y
+         penDown = board.pen.IsPenDown()
+
+      xs = [point.x for point in points]
+      ys = [point.y for point in points]
+      self.__position = (x + sum(xs), y + sum(ys))
+
+      future = self.__executor.submit(
+         _DrawChunk, type(board), board.XAxis, board.YAxis, (x, y), penDown,
+         xs, ys)
+      self.__chunks.append((future, penDown, points))
+      if len(self.__chunks) > 2 * self.jobs:
+         self.__Stitch(board)
+
+   def __Stitch(self, board):
+      """
+      continues the move of board with the first chunk in flight
+      """
+      future, penDown, points = self.__chunks.popleft()
+      try:
+         result = future.result()
+      except Exception:
+         result = None
+
+      if result is None or penDown != board.pen.IsPenDown():
+         board.DrawPoints(points)
+         return
+
+      text, endPenDown, endLineOpen, last, current = result
+      drawing, lineOpen = board.GetMoveState()
+      if text:
+         board.WriteOutput(text[2:] if lineOpen else text)
+         lineOpen = endLineOpen
+
+      board.SetMoveState(drawing, lineOpen)
+      board.lastPenLocation = Point(*last)
+      board.currentPenLocation = Point(*current)
+      if endPenDown:
+         board.pen.down()
+      else:
+         board.pen.lift()
+
+
+def _DrawChunk(boardClass, xAxis, yAxis, start, penDown, xs, ys):
+   """
+   draws a chunk of a move on a fresh board, in a worker process
+   :return: tuple of (output, pen down, MV line open, last pen location,
+            current pen location), the locations as (x, y) tuples
+   """
+   output = io.StringIO()
+   board = boardClass(Pen(), outputStream=output, autoFlush=False,
+                      xAxis=xAxis, yAxis=yAxis)
+   board.currentPenLocation = Point(*start)
+   if penDown:
+      board.pen.down()
+
+   board.SetMoveState(True, False)
+   board.ContinueMove(list(map(Point, xs, ys)))
+
+   last, current = board.lastPenLocation, board.currentPenLocation
+   return (output.getvalue(), board.pen.IsPenDown(),
+           board.GetMoveState()[1], (last.x, last.y),
+           (current.x, current.y))
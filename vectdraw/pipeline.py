@@ -0,0 +1,242 @@
+"""
+pipelined execution of a command stream: the input is read on a reader
+thread and the output written on a writer thread, connected to the thread
+drawing on the board by bounded queues
+"""
+
+import queue
+import threading
+
+from vectdraw.diagnostics import StreamDiagnostics
+
+
+# maximum number of blocks read ahead, and of output chunks not yet written
+kDefaultQueueSize = 8
+
+# seconds between checks of the reader thread for being stopped while
+# the queue is full
+kPollInterval = 0.05
+
+
+class ThreadedBlocks(object):
+   """
+   Iterable of the blocks of a blocks iterable, which is iterated on a
+   reader thread of its own. Blocks are handed over in order by a bounded
+   queue: once queueSize blocks are read ahead, the reader thread waits
+   for the consumer, so a slow consumer doesn't make it buffer the whole
+   input. An exception raised by blocks is raised by the consumer's
+   iteration instead.
+
+   Close must be called once the consumer is done, even if it stops
+   early, to stop the reader thread.
+   """
+
+   # marks the end of the blocks in the queue
+   kEnd = object()
+
+   def __init__(self, blocks, queueSize=kDefaultQueueSize):
+      """
+      :param blocks: iterable of bytes-like objects, e.g. a ReadBlocks
+                     generator
+      :param queueSize: maximum number of blocks read ahead
+      """
+      self.queue = queue.Queue(queueSize)
+      self.stopped = threading.Event()
+      self.thread = threading.Thread(target=self.__Read, args=(blocks,),
+                                     name="vectdraw-reader", daemon=True)
+      self.thread.start()
+
+   def __iter__(self):
+      while True:
+         block, error = self.queue.get()
+         if error is not None:
+            raise error
+         if block is self.kEnd:
+            return
+
+         yield block
+
+   def Close(self):
+      """
+      stops the reader thread and waits for it to end. Blocks read ahead
+      are dropped
+      """
+      self.stopped.set()
+      while self.thread.is_alive():
+         self.__Drain()
+         self.thread.join(kPollInterval)
+
+      self.__Drain()
+
+   def __Drain(self):
+      try:
+         while True:
+            self.queue.get_nowait()
+      except queue.Empty:
+         pass
+
+   def __Read(self, blocks):
+      """
+      reader thread: puts every block of blocks in the queue, followed by
+      kEnd, or the exception raised by blocks
+      """
+      try:
+         for block in blocks:
+            if not self.__Put((block, None)):
+               return
+
+         self.__Put((self.kEnd, None))
+      except BaseException as e:
+         self.__Put((None, e))
+      finally:
+         close = getattr(blocks, 'close', None)
+         if close is not None:
+            close()
+
+   def __Put(self, item):
+      """
+      puts item in the queue, waiting while it is full
+      :return: False if the consumer stopped the reader thread
+      """
+      while not self.stopped.is_set():
+         try:
+            self.queue.put(item, timeout=kPollInterval)
+            return True
+         except queue.Full:
+            pass
+
+      return False
+
+
+class ThreadedOutput(object):
+   """
+   Output stream handing what is written to it to a writer thread, which
+   writes and flushes stream. Text is handed over in chunks of at least
+   kChunkSize characters, in order, by a bounded queue: once queueSize
+   chunks wait to be written, writing blocks until stream catches up.
+
+   flush() doesn't wait for stream, so the board flushing after every
+   command doesn't stall on a slow stream; the text is written by Close.
+   An exception raised by stream is raised by the next write, flush or
+   Close instead.
+   """
+
+   kChunkSize = 1 << 16
+
+   def __init__(self, stream, queueSize=kDefaultQueueSize):
+      """
+      :param stream: text stream to write to
+      :param queueSize: maximum number of chunks not yet written
+      """
+      self.stream = stream
+      self.buffer = []
+      self.size = 0
+      self.error = None
+
+      self.queue = queue.Queue(queueSize)
+      self.thread = threading.Thread(target=self.__Write,
+                                     name="vectdraw-writer", daemon=True)
+      self.thread.start()
+
+   def write(self, text):
+      self.buffer.append(text)
+      self.size += len(text)
+      if self.size >= self.kChunkSize:
+         self.__Send()
+
+      return len(text)
+
+   def flush(self):
+      if self.error is not None:
+         raise self.error
+
+   def Close(self):
+      """
+      hands the rest of the text to the writer thread and waits for
+      everything to be written and flushed
+      :raises: the exception raised by stream, if any
+      """
+      if self.buffer:
+         self.__Send(check=False)
+
+      self.queue.put(None)
+      self.thread.join()
+      if self.error is not None:
+         raise self.error
+
+   def __Send(self, check=True):
+      """
+      hands the buffered text to the writer thread
+      """
+      if check and self.error is not None:
+         raise self.error
+
+      self.queue.put(''.join(self.buffer))
+      self.buffer = []
+      self.size = 0
+
+   def __Write(self):
+      """
+      writer thread: writes the chunks of the queue up to None. Chunks
+      following an exception are dropped
+      """
+      while True:
+         chunk = self.queue.get()
+         if chunk is None:
+            return
+
+         if self.error is None:
+            try:
+               self.stream.write(chunk)
+               self.stream.flush()
+            except BaseException as e:
+               self.error = e
+
+
+def RunPipelined(processor, queueSize=kDefaultQueueSize):
+   """
+   runs processor like VectorCommandStreamProcessor.run, with its stream
+   read (and decompressed and decoded) on a reader thread and its output
+   written on a writer thread, while the calling thread tokenizes the
+   stream and draws. Exceptions of either thread are raised by
+   RunPipelined. If the drawing thread fails, its exception is raised, and
+   an exception of the writer thread is logged
+   :param processor: VectorCommandStreamProcessor of an unread stream
+   :param queueSize: maximum number of blocks read ahead and of output
+                     chunks not yet written
+   """
+   board = processor.vectorBoard
+   output = ThreadedOutput(board.outputStream, queueSize)
+   board.outputStream = output
+
+   # the reader thread collects the malformed input it finds on its own,
+   # merged once it ended, so the threads don't share a StreamDiagnostics
+   diagnostics = processor.diagnostics
+   readerDiagnostics = StreamDiagnostics(
+      diagnostics.strict, diagnostics.maxOffsets, diagnostics.baseOffset)
+
+   blocks = ThreadedBlocks(
+      processor.streamreader.ReadBlocks(readerDiagnostics), queueSize)
+   error = None
+   try:
+      processor.Process(blocks)
+   except BaseException as e:
+      error = e
+      raise
+   finally:
+      blocks.Close()
+      diagnostics.Merge(readerDiagnostics)
+      board.outputStream = output.stream
+      try:
+         output.Close()
+      except BaseException as e:
+         if error is None:
+            raise
+
+         # the exception of the drawing thread isn't replaced by a
+         # failure to write the output it drew so far
+         if e is not error:
+            processor.logger.error("writing the output failed as well: "
+                                   "{}: {}".format(type(e).__name__, e))
+      finally:
+         processor.diagnostics.Report(processor.logger)
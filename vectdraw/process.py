@@ -9,9 +9,12 @@ import collections.abc
 import logging
 
 from vectdraw.hexstreamreader import HexStreamReader
+from vectdraw.tokenizer import CommandTokenizer
 from vectdraw.draw.board import Board
 from vectdraw.commands.default import Command
 from vectdraw.commands.errors import DuplicateCommandCodeError
+from vectdraw.commands.plugins import LoadPluginCommands
+from vectdraw.diagnostics import StreamDiagnostics
 
 
 class VectorCommandStreamProcessor(object):
@@ -19,11 +22,34 @@ class VectorCommandStreamProcessor(object):
    kMaxUnsignedBitVal = 255
    kMostSignificantBitShift = 7
 
+   # argument blocks of at least this many bytes are decoded in bulk
+   kBulkDecodeThreshold = 24
+
+   # commands with more argument bytes are executed in chunks of this many
+   # bytes (see Command.StartChunks). A multiple of 4, so chunks hold whole
+   # points
+   kMaxChunkArgs = 1 << 16
+
    streamreader = None
    encoding_class = None
    vectorBoard = None
 
-   def __init__(self, reader, encodingClass, board, commands):
+   def __init__(self, reader, encodingClass, board, commands, plugins=True,
+                diagnostics=None, checkpointer=None):
+      """
+      :param reader: HexStreamReader of the command stream
+      :param encodingClass: codec decoding the arguments
+      :param board: Board the commands draw on
+      :param commands: sequence of Command classes to register
+      :param plugins: if True, the plugin commands of installed packages
+                      (see vectdraw.commands.plugins) are registered when
+                      an unregistered command byte is first received
+      :param diagnostics: StreamDiagnostics collecting malformed input,
+                          reported at the end of run. Malformed input is
+                          skipped, unless diagnostics is strict
+      :param checkpointer: Checkpointer writing periodic checkpoints of
+                           run, see Checkpoint
+      """
       if not isinstance(reader, HexStreamReader):
          raise TypeError("reader argument must be of type {}"
                          .format(type(HexStreamReader)))
@@ -34,62 +60,503 @@ class VectorCommandStreamProcessor(object):
          raise TypeError("encoding_class argument not a valid type: "
                          "missing attribute method 'decode'")
 
+      if reader.binary and (not hasattr(encodingClass, 'decode_bytes') or
+                            not callable(encodingClass.decode_bytes)):
+
+         raise TypeError("encoding_class argument not a valid type for "
+                         "binary input: missing attribute method "
+                         "'decode_bytes'")
+
       if not isinstance(board, Board):
          raise TypeError("board argument must be of type {}"
                          .format(type(Board)))
 
       self.registeredCommands = {}
+
+      # indexed by command byte value: the registered Command instances
+      # and their callables, pre-bound to board (see Command.Bind)
+      self.commandTable = [None] * 256
+      self.dispatchTable = [None] * 256
+
+      # indexed by command byte value: the number of decoded arguments of
+      # the registered commands, None for any number (see
+      # Command.argCount)
+      self.argCounts = [None] * 256
+
+      # (feed, end) of the command executed in chunks, see Dispatch, its
+      # command byte value and the number of its argument bytes executed
+      # so far
+      self.openCommand = None
+      self.openCommandByte = None
+      self.openArgs = 0
+
+      # tokenizer of the running Records, see PendingOffset, whether the
+      # rest of a split unrecognized or skipped command is being dropped,
+      # and the argument bytes held for a split command, see FixedArgs
+      self.tokenizer = None
+      self.dropping = False
+      self.heldArgs = b''
+
+      # whether commands taking a fixed number of arguments are executed
+      # as soon as their arguments are read, see ArgsComplete. Set for
+      # streams being appended to, whose last command would otherwise wait
+      # for the next one
+      self.eagerCommands = False
+
+      self.pluginsLoaded = not plugins
+      self.diagnostics = (diagnostics if diagnostics is not None
+                          else StreamDiagnostics())
+      self.checkpointer = checkpointer
       self.streamreader = reader
       self.encoding_class = encodingClass
       self.vectorBoard = board
-      self.__RegisterCommands(commands)
-
       self.logger = logging.getLogger(self.__class__.__name__)
+      self.__RegisterCommands(commands)
+      self.__decodeArgs = self.__SelectArgDecoder(encodingClass)
 
    def run(self):
       """
-      Iterates over streamreader, executing methods specified by reeived
-      command bytes. Unrecognized bytes are logged and discarded.
+      Tokenizes the stream read by streamreader into commands in a single
+      forward pass (see vectdraw.tokenizer), executing the board methods
+      specified by each received command byte. Unrecognized command bytes
+      are discarded, along with their arguments, and invalid hex input is
+      skipped up to the next command byte. Malformed input is collected by
+      diagnostics and summarized at the end of the run.
+      With a checkpointer, checkpoints are written as the stream is read
+      and once it is complete.
       All runtime exceptions are propagated upwards and should be handled
       by the caller
+      """
+      try:
+         self.Process(self.Blocks())
+         if self.checkpointer is not None:
+            self.Checkpoint(force=True)
+      finally:
+         self.diagnostics.Report(self.logger)
+
+   def Process(self, blocks):
+      """
+      executes the board methods specified by the commands of blocks
+      :param blocks: iterable of bytes-like objects of raw byte values
+      """
+      dispatchTable = self.dispatchTable
+
+      # a resumed run may continue a command executed in chunks
+      chunked = self.openCommand is not None
+      for commandByte, args, partial in self.Records(blocks):
+         if partial or chunked:
+            self.Dispatch(commandByte, args, partial)
+            chunked = partial
+         else:
+            dispatchTable[commandByte](*args)
+
+   def Blocks(self):
+      """
+      :return: iterable of the blocks of raw byte values read by
+               streamreader, checkpointed before each block is read if
+               there is a checkpointer
+      """
+      if self.checkpointer is None:
+         return self.streamreader.ReadBlocks(self.diagnostics)
+
+      return self.__CheckpointBlocks(
+         self.streamreader.ReadBlocks(self.diagnostics, trackPositions=True))
+
+   def __CheckpointBlocks(self, blocks):
+      """
+      generator of blocks, checkpointing before each one is read. Records
+      reads a block once every record of the previous ones was executed
+      """
+      for block in blocks:
+         yield block
+         self.Checkpoint()
+
+   def PendingOffset(self):
+      """
+      :return: offset, within the blocks given to Records, of the first
+               byte whose command wasn't executed yet
+      """
+      return 0 if self.tokenizer is None else self.tokenizer.PendingOffset()
+
+   def Checkpoint(self, force=False):
+      """
+      writes a checkpoint with checkpointer if one is due: the position of
+      the pending command in the input, the offset of the output and the
+      state of the board, from which Resume continues the run. While a
+      command is executed in chunks, the position is that of its first
+      argument byte not executed yet, and the state of its move is kept,
+      if the command can be resumed (see Command.resumableChunks)
+      :param force: write a checkpoint even if none is due
+      :return: True if a checkpoint was written
+      """
+      offset = self.streamreader.blocksOffset + self.PendingOffset()
+      command = None
+      if self.openCommand is not None:
+         command = self.__OpenCommandState()
+         if command is None:
+            return False
 
-      Note that Iteration also happens in get_args().
+         offset += 1 + self.openArgs
 
-      NOTE: This is definitely not the best way to do this. A better method is
-      needed
+      if not force and not self.checkpointer.Due(offset):
+         return False
+
+      position = self.streamreader.Position(offset)
+      if position is None:
+         return False
+
+      output = self.vectorBoard.outputStream
+      output.flush()
+      self.checkpointer.Write({"binary": self.streamreader.binary,
+                               "input": position,
+                               "output": output.tell(),
+                               "board": self.vectorBoard.GetState(),
+                               "command": command})
+      return True
+
+   def __OpenCommandState(self):
+      """
+      :return: JSON serializable dict of the command executed in chunks,
+               from which Resume continues it, or None if it can't be
+               resumed
       """
+      board = self.vectorBoard
+      drawing, lineOpen = board.GetMoveState()
+
+      # the points of a move drawn by a move executor may still be in
+      # flight, see Board.moveExecutor
+      if (not self.commandTable[self.openCommandByte].resumableChunks or
+            (drawing and board.moveExecutor is not None)):
+         return None
+
+      return {"byte": self.openCommandByte, "args": self.openArgs,
+              "move": [drawing, lineOpen]}
 
+   def Resume(self, state):
+      """
+      continues the run from a checkpoint: the input and output are
+      seeked to the checkpoint, discarding any output written after it,
+      and the state of the board is restored
+      :param state: dict of a checkpoint, see Checkpointer.Load
+      :raises ValueError: if the checkpoint was written in another mode,
+                          the input or output can't seek, or the checkpoint
+                          continues an unregistered command
+      """
+      if state["binary"] != self.streamreader.binary:
+         raise ValueError("the checkpoint was written reading {} input"
+                          .format("binary" if state["binary"] else "hex"))
+
+      self.streamreader.Seek(state["input"])
+
+      output = self.vectorBoard.outputStream
       try:
-         while self.streamreader.currentByte or next(self.streamreader):
-            byte = self.streamreader.currentByte
-
-            if self.IsCommandByte(byte):
-               command = self.registeredCommands.get(byte, None)
-               if command is None:
-                  self.logger.warning("Received unrecognized command byte {}"
-                                      .format(byte))
-                  next(self.streamreader)
-
-               else:
-                  args = self.GetArgs()
-                  prepped_args = command.PrepareParameters(*args)
-                  getattr(self.vectorBoard, command.method)(*prepped_args)
-            else:
-               next(self.streamreader)
-
-      except StopIteration:
+         output.seek(state["output"])
+         output.truncate()
+      except (AttributeError, OSError) as e:
+         raise ValueError("can't seek the output: {}".format(e))
+
+      self.vectorBoard.SetState(state["board"])
+
+      command = state["command"]
+      if command is not None:
+         self.ContinueCommand(command)
+
+   def ContinueCommand(self, state):
+      """
+      continues the command executed in chunks of a checkpoint: its move
+      is begun again, and Records continues its arguments
+      :param state: dict of the command, see Checkpoint
+      :raises ValueError: if the command isn't registered
+      """
+      command = self.GetCommand(state["byte"])
+      if command is None or not command.resumableChunks:
+         raise ValueError("the checkpoint continues command {:02X}, which "
+                          "can't be resumed".format(state["byte"]))
+
+      self.openCommand = command.StartChunks(self.vectorBoard)
+      self.openCommandByte = state["byte"]
+      self.openArgs = state["args"]
+      self.vectorBoard.SetMoveState(*state["move"])
+
+   def Records(self, blocks):
+      """
+      tokenizes blocks of raw command bytes into records of registered
+      commands. Commands with more than kMaxChunkArgs argument bytes are
+      split into several records
+      :param blocks: iterable of bytes-like objects of raw byte values
+      :return: generator of (command byte value, args, partial) tuples,
+               where args is the list of decoded arguments, or the raw
+               argument bytes for rawArgs commands, and partial is True if
+               the next record continues the arguments of the command
+      """
+      tokenizer = self.tokenizer = CommandTokenizer(
+         self.kMaxChunkArgs, self.ArgsComplete if self.eagerCommands else None)
+      if self.openCommand is not None:
+         # the blocks begin in the arguments of the continued command
+         tokenizer.ContinueCommand(self.openCommandByte, -1 - self.openArgs)
+
+      self.dropping = False
+      self.heldArgs = b''
+      return self.TokenRecords(tokenizer.Tokenize(blocks))
+
+   def TokenRecords(self, tokens, onCommand=None):
+      """
+      generator of the records of registered commands of tokens, for
+      consumers feeding the tokenizer themselves. See Records
+      :param tokens: iterable of Tokens of the tokenizer of the stream
+      :param onCommand: function called with the first Token of each
+                        registered command, before any of its records,
+                        including commands dropped for their number of
+                        arguments
+      :return: generator of (command byte value, args, partial) tuples
+      """
+      commandTable = self.commandTable
+      argCounts = self.argCounts
+      continued = self.openCommand is not None
+      for token in tokens:
+         first = not continued
+         continued = token.partial
+
+         # skipped commands are reported once, not per chunk
+         if self.dropping:
+            self.dropping = token.partial
+            continue
+
+         command = commandTable[token.command]
+         if command is None:
+            command = self.GetCommand(token.command, token.offset)
+            if command is None:
+               self.dropping = token.partial
+               continue
+
+         if first and onCommand is not None:
+            onCommand(token)
+
+         if command.rawArgs:
+            yield token.command, token.args, token.partial
+            continue
+
+         argCount = argCounts[token.command]
+         if argCount is None:
+            yield (token.command, self.DecodeArgs(token.args, token.offset),
+                   token.partial)
+            continue
+
+         args = self.FixedArgs(token, argCount)
+         if args is not None:
+            yield token.command, args, False
+
+   def Execute(self, commandByte, args):
+      """
+      executes the board method of the command registered for commandByte
+      :param commandByte: command byte value (0-255)
+      :param args: raw argument bytes of the command
+      """
+      command = self.GetCommand(commandByte)
+      if command is None:
          return
 
+      if not command.rawArgs:
+         args = self.DecodeArgs(args)
+         if not self.CheckArgCount(commandByte, args):
+            return
+
+      self.dispatchTable[commandByte](*args)
+
+   def GetCommand(self, commandByte, offset=None):
+      """
+      looks up the command registered for commandByte. The first
+      unregistered command byte loads the plugin commands, then
+      unrecognized command bytes are added to diagnostics
+      :param commandByte: command byte value (0-255)
+      :param offset: offset of the command byte in the stream, if known
+      :return: registered Command instance, or None
+      """
+      command = self.commandTable[commandByte]
+      if command is None and not self.pluginsLoaded:
+         self.LoadPlugins()
+         command = self.commandTable[commandByte]
+
+      if command is None:
+         self.diagnostics.Add(StreamDiagnostics.kUnrecognizedCommand,
+                              commandByte, offset)
+      return command
+
+   def FixedArgs(self, token, argCount):
+      """
+      collects the arguments of a command taking argCount arguments (see
+      Command.argCount) from its tokens, so it is executed as one record.
+      The argument bytes of a split command are held while they can still
+      hold argCount arguments. Commands with another number of arguments
+      are added to diagnostics and dropped
+      :param token: Token of the command
+      :param argCount: number of arguments the command takes
+      :return: list of the decoded arguments once the last token of the
+               command was received, or None
+      """
+      if self.dropping:
+         self.dropping = token.partial
+         return None
+
+      args = token.args
+      if self.heldArgs:
+         args = self.heldArgs + args
+         self.heldArgs = b''
+
+      if token.partial and len(args) <= 2 * argCount + 1:
+         self.heldArgs = bytes(args)
+         return None
+
+      if not token.partial:
+         args = self.DecodeArgs(args, token.offset)
+         if len(args) == argCount:
+            return args
+
+      self.diagnostics.Add(StreamDiagnostics.kArgumentCount, token.command,
+                           token.offset)
+      self.dropping = token.partial
+      return None
+
+   def ArgsComplete(self, commandByte, size):
+      """
+      :param commandByte: command byte value
+      :param size: number of argument bytes of the command read so far
+      :return: True if the command takes a fixed number of arguments (see
+               Command.argCount) and size bytes hold all of them
+      """
+      argCount = self.argCounts[commandByte]
+      return argCount is not None and size == 2 * argCount
+
+   def CheckArgCount(self, commandByte, args):
+      """
+      checks that args holds the number of arguments the command of
+      commandByte takes (see Command.argCount), adding it to diagnostics
+      if it doesn't
+      :param commandByte: command byte value of a registered command
+      :param args: decoded arguments of the command
+      :return: True if the command can be executed
+      """
+      argCount = self.argCounts[commandByte]
+      if argCount is None or len(args) == argCount:
+         return True
+
+      self.diagnostics.Add(StreamDiagnostics.kArgumentCount, commandByte)
+      return False
+
+   def Dispatch(self, commandByte, args, partial=False):
+      """
+      executes the board method of the command registered for commandByte.
+      Commands split into several records are executed in chunks
+      :param commandByte: command byte value of a registered command
+      :param args: decoded arguments, or raw argument bytes for rawArgs
+                   commands
+      :param partial: True if the next record continues the arguments of
+                      the command
+      """
+      if self.openCommand is None:
+         if not partial:
+            self.dispatchTable[commandByte](*args)
+            return
+
+         self.openCommand = self.commandTable[commandByte].StartChunks(
+            self.vectorBoard)
+         self.openCommandByte = commandByte
+         self.openArgs = 0
+
+      feed, end = self.openCommand
+      feed(*args)
+      if not partial:
+         self.openCommand = None
+         end()
+      elif self.commandTable[commandByte].rawArgs:
+         self.openArgs += len(args)
+      else:
+         self.openArgs += 2 * len(args)
+
+   def RegisterCommand(self, command):
+      """
+      registers command, binding it to the board
+      :param command: Command class
+      :return: command byte value of command, or None if it isn't valid
+      :raises DuplicateCommandCodeError: if command's command byte is
+                                         already registered
+      """
+      if not isinstance(command, type) or not issubclass(command, Command):
+         raise TypeError("commands argument must be a non string sequence "
+                         "containing instances of {}".format(type(Command)))
+
+      if self.registeredCommands.get(command.commandByte, None) is not None:
+         raise DuplicateCommandCodeError(
+            "attempted to register {com_byte} to {comm}, "
+            "which is already registered by {reg_comm}"
+            .format(com_byte=command.commandByte, comm=command,
+                    reg_comm=self.registeredCommands[command.commandByte]))
+
+      instance = command()
+      instance.diagnostics = self.diagnostics
+      self.registeredCommands[command.commandByte] = instance
+
+      # command lookup by byte value, shared by hex and binary input
+      try:
+         value = int(command.commandByte, 16)
+      except ValueError:
+         value = None
+
+      if value is None or not 0x80 <= value <= 0xFF:
+         self.logger.warning("Command {} has an invalid command byte {!r}"
+                             .format(instance, command.commandByte))
+         return None
+
+      self.commandTable[value] = instance
+      self.dispatchTable[value] = instance.Bind(self.vectorBoard)
+      self.argCounts[value] = None if command.rawArgs else command.argCount
+      return value
+
+   def LoadPlugins(self):
+      """
+      registers the plugin commands of installed packages (see
+      vectdraw.commands.plugins), once. Plugin commands whose command byte
+      is already registered are logged and skipped
+      """
+      self.pluginsLoaded = True
+      for command in LoadPluginCommands():
+         try:
+            self.RegisterCommand(command)
+         except DuplicateCommandCodeError as e:
+            self.logger.warning("Skipped plugin command: {}".format(e))
+
+   def DecodeArgs(self, args, offset=None):
+      """
+      decodes raw argument bytes into a list of ints with encoding_class.
+      Arguments are encoded in pairs of bytes: an odd trailing byte can't
+      be decoded, so it is added to diagnostics and discarded
+      :param args: raw argument bytes
+      :param offset: offset of the command byte in the stream, if known
+      :return: list of decoded arguments
+      """
+      if len(args) % 2:
+         self.diagnostics.Add(StreamDiagnostics.kOddArgument, args[-1],
+                              offset)
+         args = args[:-1]
+
+      if not args:
+         return []
+
+      return self.__decodeArgs(args)
+
    def IsCommandByte(self, byte):
       """
       shifts byte to the right by 7 to get the value of the 8th bit
-      :param byte: hexadecimal string representation of a byte
+      :param byte: hexadecimal string representation of a byte, or the byte
+                   value as an int
       :return: True if byte is command byte (MSB set), else false
       """
-      if not byte.strip():
-         return False
+      if isinstance(byte, str):
+         if not byte.strip():
+            return False
+
+         byte = int(byte, 16)
 
-      byte = int(byte, 16)
       if byte > self.kMaxUnsignedBitVal:
          raise ValueError("expected single unsigned byte for byte "
                           "argument (0-255), received {}".format(byte))
@@ -99,9 +566,13 @@ class VectorCommandStreamProcessor(object):
    def GetArgs(self):
       """
       iterate over streamreader, extracting and decoding encoded argument
-      values until command byte is read
+      values until command byte is read. Used when iterating streamreader
+      byte by byte; run() tokenizes whole blocks instead
       :return: list of decoded byte arguments
       """
+      if self.streamreader.binary:
+         return self.__GetBinaryArgs()
+
       byte_pair = list()
       decodedArgs = []
       for arg in self.streamreader:
@@ -119,6 +590,57 @@ class VectorCommandStreamProcessor(object):
 
       return decodedArgs
 
+   def __GetBinaryArgs(self):
+      """
+      GetArgs implementation for readers handing out raw byte values. Bytes
+      are classified as ints, without any hex parsing, and the collected
+      argument block is decoded with DecodeArgs
+      :return: list of decoded byte arguments
+      """
+      shift = self.kMostSignificantBitShift
+      args = bytearray()
+      for arg in self.streamreader:
+         if arg >> shift:
+            break
+
+         args.append(arg)
+
+      return self.DecodeArgs(args)
+
+   @staticmethod
+   def __SelectArgDecoder(encodingClass):
+      """
+      returns the fastest function decoding an even number of raw argument
+      bytes that encodingClass supports. Short argument lists (e.g. CO, PEN)
+      are decoded pair by pair, as the setup cost of decode_many outweighs
+      its per word gain below kBulkDecodeThreshold bytes
+      """
+      decodeMany = getattr(encodingClass, 'decode_many', None)
+      decodeBytes = getattr(encodingClass, 'decode_bytes', None)
+      threshold = VectorCommandStreamProcessor.kBulkDecodeThreshold
+
+      def DecodePairs(args):
+         return [decodeBytes(args[i], args[i + 1])
+                 for i in range(0, len(args), 2)]
+
+      def DecodeMixed(args):
+         if len(args) < threshold:
+            return DecodePairs(args)
+
+         return decodeMany(args).tolist()
+
+      if decodeMany is not None and decodeBytes is not None:
+         return DecodeMixed
+
+      if decodeMany is not None:
+         return lambda args: decodeMany(args).tolist()
+
+      if decodeBytes is not None:
+         return DecodePairs
+
+      return lambda args: [encodingClass.decode(args[i:i + 2].hex())
+                           for i in range(0, len(args), 2)]
+
    def __RegisterCommands(self, commands):
 
       if (not isinstance(commands, collections.abc.Sequence) or
@@ -128,16 +650,4 @@ class VectorCommandStreamProcessor(object):
                          "containing instances of {}".format(type(Command)))
 
       for command in commands:
-         if not issubclass(command, Command):
-            raise TypeError("commands argument must be a non string sequence "
-                         "containing instances of {}".format(type(Command)))
-
-         if self.registeredCommands.get(command.commandByte, None) is None:
-            self.registeredCommands[command.commandByte] = command()
-
-         else:
-            raise DuplicateCommandCodeError(
-               "attempted to register {com_byte} to {comm}, "
-               "which is already registered by {reg_comm}"
-               .format(com_byte=command.commandByte, comm=command,
-                       reg_comm=self.registeredCommands[command.commandByte]))
+         self.RegisterCommand(command)
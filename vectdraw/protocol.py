@@ -0,0 +1,72 @@
+"""
+wire protocol between the vectdraw daemon (vectdraw --serve) and its
+client. Kept free of vectdraw imports so the client starts quickly
+"""
+
+import json
+import os
+import struct
+
+
+# environment variable overriding the socket path of the daemon
+kSocketVariable = 'VECTDRAW_SOCKET'
+
+# a request is a header line of JSON options (see kOptions), followed by
+# the command stream up to the end of the client's side of the connection
+kOptions = ('binary', 'strict')
+
+# the reply is a sequence of frames: a kind byte and a payload size,
+# followed by the payload. Output frames hold output text, log frames a
+# warning line, and the exit frame, always last, JSON {"status", "error"}
+kFrameHeader = struct.Struct('>cI')
+kOutputFrame = b'O'
+kLogFrame = b'L'
+kExitFrame = b'X'
+
+
+def DefaultSocketPath():
+   """
+   :return: path of the daemon's Unix domain socket: $VECTDRAW_SOCKET, else
+            a per user socket in the temporary directory
+   """
+   path = os.environ.get(kSocketVariable)
+   if path:
+      return path
+
+   return os.path.join(os.environ.get('TMPDIR', '/tmp'),
+                       'vectdraw-{}.sock'.format(os.getuid()))
+
+
+def EncodeHeader(options):
+   """
+   :param options: dict of request options, see kOptions
+   :return: bytes of the request header line
+   """
+   return json.dumps({key: bool(options.get(key)) for key in kOptions}
+                     ).encode('ascii') + b'\n'
+
+
+def DecodeHeader(line):
+   """
+   :param line: bytes of the request header line
+   :return: dict of request options
+   :raises ValueError: if line isn't a request header
+   """
+   try:
+      options = json.loads(line.decode('ascii'))
+   except (UnicodeDecodeError, ValueError):
+      raise ValueError("malformed request header {!r}".format(line[:80]))
+
+   if not isinstance(options, dict):
+      raise ValueError("malformed request header {!r}".format(line[:80]))
+
+   return {key: bool(options.get(key)) for key in kOptions}
+
+
+def Frame(kind, payload):
+   """
+   :param kind: one of the k*Frame kinds
+   :param payload: bytes of the frame's payload
+   :return: bytes of the frame
+   """
+   return kFrameHeader.pack(kind, len(payload)) + payload
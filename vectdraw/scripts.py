@@ -2,14 +2,23 @@
 
 """
 
+import os
 import sys
 
 from sixteen14encoding.codec.sixteen14hex import Sixteen14Codec
-from vectdraw.cli import ParseArgs
+from vectdraw.checkpoint import Checkpointer
+from vectdraw.cli import ParseArgs, ParseIndexArgs, ParseQueueArgs
+from vectdraw.compiled import CompiledStream, HashFile, LoadSidecar
+from vectdraw.compiled import SidecarPath
+from vectdraw.compression import OpenDecompressedStream, IsCompressedStream
+from vectdraw.diagnostics import StreamDiagnostics
+from vectdraw.index import CommandIndex, LoadIndex, NullStream, RunRange
+from vectdraw.index import SidecarPath as IndexPath
 from vectdraw.process import VectorCommandStreamProcessor
 from vectdraw.draw.board import Board, Pen
-from vectdraw.hexstreamreader import HexStreamReader
-from vectdraw.settings import REGISTERED_COMMANDS
+from vectdraw.hexstreamreader import BufferedHexStreamReader
+from vectdraw.hexstreamreader import BinaryStreamReader
+from vectdraw.settings import REGISTERED_COMMANDS, READ_BLOCK_SIZE
 
 
 def main(debug=False):
@@ -18,18 +27,244 @@ def main(debug=False):
    if debug is given, cleanup is left for handling by the caller
    :param debug: performs cleanup if False
    """
+   if sys.argv[1:2] == ['index']:
+      IndexMain(sys.argv[2:], debug)
+      return
+
+   if sys.argv[1:2] == ['queue']:
+      return QueueMain(sys.argv[2:])
+
    cliParams = ParseArgs()
-   streamReader = HexStreamReader(cliParams.get('f', sys.stdin))
+   if cliParams.get('serve'):
+      # imported here so runs don't pay for importing asyncio
+      from vectdraw.daemon import RunDaemon
+      RunDaemon(cliParams['serve'], Sixteen14Codec(), REGISTERED_COMMANDS)
+      return
+
+   if cliParams.get('batch'):
+      # imported here so runs don't pay for importing concurrent.futures
+      from vectdraw.batch import BatchFiles, RunBatch
+      failed = RunBatch(
+         BatchFiles(cliParams['batch'], cliParams['batch_output']),
+         cliParams.get('jobs', 1), binary=bool(cliParams.get('binary')),
+         strict=bool(cliParams.get('strict')),
+         engine=cliParams.get('engine', 'stream'))
+      return 1 if failed else 0
+
+   inputFile = cliParams.get('f', sys.stdin)
+   binary = bool(cliParams.get('binary'))
+
+   # flushing a compressed stream per command would defeat the compression
    output = cliParams.get('o', sys.stdout)
-   board = Board(Pen(), outputStream=output)
+   moveExecutor = None
+   if cliParams.get('move_jobs', 1) > 1:
+      # imported here so runs don't pay for importing concurrent.futures
+      from vectdraw.parallelmove import ParallelMoveExecutor
+      moveExecutor = ParallelMoveExecutor(cliParams['move_jobs'])
 
-   processor = VectorCommandStreamProcessor(
-      streamReader, Sixteen14Codec(), board, REGISTERED_COMMANDS)
+   board = Board(Pen(), outputStream=output,
+                 autoFlush=not IsCompressedStream(output),
+                 moveExecutor=moveExecutor)
 
-   processor.run()
+   compiled = None
+   if (inputFile is not sys.stdin and not cliParams.get('compile') and
+         not cliParams.get('checkpoint') and not cliParams.get('range') and
+         not cliParams.get('follow')):
+      compiled = LoadSidecar(inputFile.name, binary,
+                             strict=bool(cliParams.get('strict')))
+
+   streamReader = None
+   try:
+      if compiled is not None:
+         compiled.Replay(board, REGISTERED_COMMANDS)
+      else:
+         streamReader = RunProcessor(cliParams, inputFile, binary, board)
+   finally:
+      if moveExecutor is not None:
+         moveExecutor.Close()
 
    if not debug:
-      if not streamReader.closed:
+      if streamReader is not None and not streamReader.closed:
          streamReader.close()
+      if inputFile is not sys.stdin and not inputFile.closed:
+         inputFile.close()
       if output is not sys.stdout and not output.closed:
          output.close()
+
+
+def IndexMain(argv, debug=False):
+   """
+   'vectdraw index': writes the .vdi index of the input file
+   :param argv: arguments following 'index'
+   :param debug: performs cleanup if False
+   """
+   indexParams = ParseIndexArgs(argv)
+   inputFile = indexParams['f']
+   BuildIndex(inputFile, bool(indexParams.get('binary')),
+              indexParams.get('every', CommandIndex.kDefaultEvery))
+
+   if not debug and not inputFile.closed:
+      inputFile.close()
+
+
+def QueueMain(argv):
+   """
+   'vectdraw queue': submits jobs to the queue database, runs them as a
+   worker, or prints its status
+   :param argv: arguments following 'queue'
+   :return: exit status, 1 if a job failed
+   """
+   # imported here so runs don't pay for importing sqlite3
+   from vectdraw.jobqueue import JobQueue, RunVectdraw, Work, kFailed
+
+   queueParams = ParseQueueArgs(argv)
+   queue = (JobQueue(queueParams['db'], queueParams['lease'])
+            if queueParams['action'] == 'work'
+            else JobQueue(queueParams['db']))
+
+   try:
+      if queueParams['action'] == 'submit':
+         from vectdraw.batch import BatchFiles
+
+         options = []
+         for flag in ('binary', 'strict'):
+            if queueParams[flag]:
+               options.append('--' + flag)
+         options += ['--engine', queueParams['engine']]
+
+         jobs = []
+         for inputPath, outputPath in BatchFiles(queueParams['source'],
+                                                 queueParams['output']):
+            inputPath = os.path.abspath(inputPath)
+            outputPath = os.path.abspath(outputPath)
+            os.makedirs(os.path.dirname(outputPath), exist_ok=True)
+            jobs.append((['-f', inputPath, '-o', outputPath] + options,
+                         inputPath, outputPath))
+
+         ids = queue.Submit(jobs, queueParams['attempts'])
+         print("submitted {} jobs to {}".format(len(ids), queueParams['db']))
+         return 0
+
+      if queueParams['action'] == 'work':
+         done, failed = Work(queue, RunVectdraw, wait=queueParams['wait'],
+                             poll=queueParams['poll'])
+         print("{} jobs done, {} failed".format(done, failed))
+         return 1 if failed else 0
+
+      counts = queue.Counts()
+      print(", ".join("{} {}".format(count, state)
+                      for state, count in counts.items()))
+      for jobId, state, attempts, worker, inputPath, outputPath, error in (
+            queue.Jobs(None if queueParams['list'] else kFailed)):
+         print("{:>6} {:<7} {} {} -> {}{}".format(
+            jobId, state, attempts, inputPath, outputPath,
+            ": " + error if error else
+            " ({})".format(worker) if state == 'running' else ""))
+
+      return 1 if counts[kFailed] else 0
+   finally:
+      queue.Close()
+
+
+def BuildIndex(inputFile, binary, every=CommandIndex.kDefaultEvery):
+   """
+   writes the .vdi index of inputFile next to it, executing its commands
+   without output. inputFile is read to its end and closed
+   :return: CommandIndex
+   """
+   streamReader = OpenReader(inputFile, binary)
+   processor = VectorCommandStreamProcessor(
+      streamReader, Sixteen14Codec(),
+      Board(Pen(), outputStream=NullStream(), autoFlush=False),
+      REGISTERED_COMMANDS)
+
+   try:
+      return CommandIndex.Build(processor, IndexPath(inputFile.name), every,
+                                source=inputFile.name)
+   finally:
+      streamReader.close()
+
+
+def OpenReader(inputFile, binary, follow=False, followTimeout=None):
+   """
+   :return: stream reader of inputFile, decompressing it if needed. Followed
+            files are read as is, see FollowedStream
+   """
+   readerClass = BinaryStreamReader if binary else BufferedHexStreamReader
+   if follow:
+      # imported here so runs that don't follow their input don't import it
+      from vectdraw.follow import FollowedStream
+      return readerClass(FollowedStream(inputFile, timeout=followTimeout),
+                         blockSize=READ_BLOCK_SIZE)
+
+   decompressed = OpenDecompressedStream(inputFile)
+   return readerClass(
+      decompressed or inputFile, blockSize=READ_BLOCK_SIZE,
+      useMmap=decompressed is None)
+
+
+def RunProcessor(cliParams, inputFile, binary, board):
+   """
+   parses inputFile with the engine selected by cliParams, drawing on
+   board, and compiles it to its .vdc sidecar if requested. With a
+   checkpoint, the run is checkpointed and resumed if requested. With a
+   range, only the range is drawn, using the .vdi index of inputFile.
+   Pipelined runs read and write on threads of their own, runs with
+   several jobs draw segments of the stream on worker processes, and
+   followed files are drawn as they grow
+   :return: the stream reader of inputFile, for cleanup by the caller
+   """
+   streamReader = OpenReader(inputFile, binary,
+                             follow=bool(cliParams.get('follow')),
+                             followTimeout=cliParams.get('follow_timeout'))
+
+   processorClass = VectorCommandStreamProcessor
+   if cliParams.get('engine') == 'vectorized':
+      # imported here so the stream engine doesn't pay for importing numpy
+      from vectdraw.vectorprocess import VectorizedCommandStreamProcessor
+      processorClass = VectorizedCommandStreamProcessor
+
+   checkpointer = None
+   if cliParams.get('checkpoint'):
+      checkpointer = Checkpointer(
+         cliParams['checkpoint'],
+         everyBytes=cliParams.get('checkpoint_bytes'),
+         everySeconds=cliParams.get('checkpoint_seconds'),
+         source=os.path.abspath(inputFile.name))
+
+   processor = processorClass(
+      streamReader, Sixteen14Codec(), board, REGISTERED_COMMANDS,
+      diagnostics=StreamDiagnostics(strict=bool(cliParams.get('strict'))),
+      checkpointer=checkpointer)
+   processor.eagerCommands = bool(cliParams.get('follow'))
+
+   if cliParams.get('resume'):
+      try:
+         processor.Resume(checkpointer.Load())
+      except ValueError as e:
+         raise SystemExit("vectdraw: error: {}".format(e))
+
+   if cliParams.get('range'):
+      index = LoadIndex(inputFile.name, binary)
+      if index is None:
+         with open(inputFile.name) as indexedFile:
+            index = BuildIndex(indexedFile, binary)
+
+      start, end = cliParams['range']
+      RunRange(processor, index, start, len(index) if end is None else end)
+   elif cliParams.get('compile'):
+      compiled = CompiledStream.Compile(
+         processor, sourceHash=HashFile(inputFile.name))
+      compiled.Save(SidecarPath(inputFile.name))
+   elif cliParams.get('pipeline'):
+      # imported here so runs don't pay for importing queue
+      from vectdraw.pipeline import RunPipelined
+      RunPipelined(processor)
+   elif cliParams.get('jobs', 1) > 1:
+      # imported here so runs don't pay for importing concurrent.futures
+      from vectdraw.parallel import RunParallel
+      RunParallel(processor, cliParams['jobs'])
+   else:
+      processor.run()
+
+   return streamReader
@@ -9,13 +9,46 @@
    of Board and a PrepareParameters method
 
    see vectdraw.commands.default.Command
+
+   READ_BLOCK_SIZE is the number of characters read from the input stream at
+   a time by the buffered stream readers
+
+   The defaults of batch runs and of the job queue are kept here, so the
+   command line parser doesn't import vectdraw.batch and vectdraw.jobqueue
 """
 
+import os
+
 from vectdraw.commands import *
 
 REGISTERED_COMMANDS = [
    ClearCommand,
    PenUpDownCommand,
    SetColourCommand,
-   MovePen
-]
\ No newline at end of file
+   MovePen,
+   CompactMovePen
+]
+
+READ_BLOCK_SIZE = 1 << 20  # 1 MiB
+
+# output path of batch inputs without one, see vectdraw.batch.OutputPath.
+# The extension is kept, so inputs differing only by extension get
+# different outputs
+kDefaultOutputTemplate = '{dir}/{name}{ext}.out'
+
+# queue database, see DefaultQueuePath
+kQueueVariable = 'VECTDRAW_QUEUE'
+kDefaultQueuePath = 'vectdraw-queue.db'
+
+# seconds a worker holds a claimed job without a heartbeat, and number of
+# times a job is claimed before it fails, see vectdraw.jobqueue.JobQueue
+kDefaultLease = 60.0
+kDefaultAttempts = 3
+
+
+def DefaultQueuePath():
+   """
+   :return: path of the queue database, from $VECTDRAW_QUEUE or in the
+            current directory
+   """
+   return os.environ.get(kQueueVariable) or kDefaultQueuePath
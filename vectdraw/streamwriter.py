@@ -0,0 +1,177 @@
+"""
+writer for generating vector command streams
+"""
+
+import binascii
+import io
+
+from sixteen14encoding.codec.sixteen14hex import Sixteen14Codec
+from vectdraw.commands.default import ClearCommand, PenUpDownCommand
+from vectdraw.commands.default import SetColourCommand, MovePen
+from vectdraw.commands.default import CompactMovePen
+from vectdraw.compact import EncodeMoves
+
+
+class CommandStreamWriter(object):
+   """
+   Generates command streams understood by vectdraw, in the hex text format
+   or in the raw binary format (see --binary).
+
+   Commands are encoded straight into a byte buffer, which is written to
+   the output in bulk once it grows past bufferSize (or on flush/close).
+   The output can be a bytearray, a binary stream or a text stream.
+   Relative moves can be given as a sequence of points ((x, y) pairs or
+   Point instances) or, for large paths, as a numpy array of shape (n, 2)
+   which is encoded in one vectorized call.
+   """
+   kDefaultBufferSize = 1 << 20  # 1 MiB
+
+   def __init__(self, output, binary=False, encodingClass=Sixteen14Codec,
+                bufferSize=kDefaultBufferSize):
+      """
+      :param output: bytearray or writable stream receiving the commands
+      :param binary: write raw bytes instead of hex encoded text
+      :param encodingClass: codec with encode_bytes and encode_many methods
+      :param bufferSize: number of encoded bytes buffered before writing
+      """
+      if not isinstance(output, bytearray) and not hasattr(output, 'write'):
+         raise TypeError("Expected bytearray or object with method 'write', "
+                         "got {}".format(type(output)))
+
+      self.output = output
+      self.binary = binary
+      self.encoding_class = encodingClass
+      self.bufferSize = bufferSize
+      self.buffer = bytearray()
+      self.closed = False
+
+      self.__textOutput = isinstance(output, io.TextIOBase)
+
+   def clear(self):
+      """
+      writes a clear command
+      """
+      self.__WriteCommand(ClearCommand)
+      self.__FlushIfFull()
+
+   def pen(self, down):
+      """
+      writes a pen up/down command
+      :param down: True to place the pen down, False to lift it
+      """
+      self.__WriteCommand(PenUpDownCommand)
+      self.buffer += self.encoding_class.encode_bytes(1 if down else 0)
+      self.__FlushIfFull()
+
+   def colour(self, r, g, b, a):
+      """
+      writes a set colour command
+      :param r: int between 0-255 representing red hue
+      :param g: int between 0-255 representing green hue
+      :param b: int between 0-255 representing blue hue
+      :param a: int between 0-255 representing alpha
+      """
+      self.__WriteCommand(SetColourCommand)
+      self.__Append(self.encoding_class.encode_many([r, g, b, a]))
+      self.__FlushIfFull()
+
+   def move(self, points):
+      """
+      writes a move pen command for points, each relative to the previous
+      location of the pen
+      :param points: sequence of (x, y) pairs or Point instances, or a
+                     numpy array of shape (n, 2)
+      """
+      self.__WriteCommand(MovePen)
+      self.__Append(self.encoding_class.encode_many(
+         self.__FlattenPoints(points)))
+      self.__FlushIfFull()
+
+   def compactMove(self, points):
+      """
+      writes a compact move pen command for points, each relative to the
+      previous location of the pen. Small moves and runs of identical moves
+      take far fewer bytes than with move (see vectdraw.compact)
+      :param points: sequence of (x, y) pairs or Point instances, or a
+                     numpy array of shape (n, 2)
+      """
+      if hasattr(points, 'tolist'):
+         points = points.tolist()
+
+      self.__WriteCommand(CompactMovePen)
+      self.__Append(EncodeMoves(points))
+      self.__FlushIfFull()
+
+   def write(self, data):
+      """
+      writes already encoded command bytes as they are
+      :param data: bytes-like object of raw command bytes
+      """
+      self.__Append(data)
+      self.__FlushIfFull()
+
+   def flush(self):
+      """
+      converts the buffered bytes to the output format and writes them out
+      """
+      if self.buffer:
+         data = bytes(self.buffer) if self.binary else \
+            binascii.hexlify(self.buffer).upper()
+         self.buffer = bytearray()
+
+         if isinstance(self.output, bytearray):
+            self.output += data
+         elif self.__textOutput:
+            self.output.write(data.decode('latin-1'))
+         else:
+            self.output.write(data)
+
+      if hasattr(self.output, 'flush'):
+         self.output.flush()
+
+   def close(self):
+      """
+      flushes the buffered commands. The output itself is left open
+      """
+      if not self.closed:
+         self.flush()
+         self.closed = True
+
+   def __enter__(self):
+      return self
+
+   def __exit__(self, *exc):
+      self.close()
+
+   def __WriteCommand(self, command):
+      if self.closed:
+         raise ValueError("write to a closed CommandStreamWriter")
+
+      self.buffer += bytes.fromhex(command.commandByte)
+
+   def __Append(self, data):
+      # through a memoryview so numpy arrays are appended as raw bytes
+      # instead of being broadcast by ndarray.__radd__
+      self.buffer += memoryview(data)
+
+   def __FlushIfFull(self):
+      if len(self.buffer) >= self.bufferSize:
+         self.flush()
+
+   @staticmethod
+   def __FlattenPoints(points):
+      """
+      returns points as a flat sequence of ints (x0, y0, x1, y1, ...)
+      """
+      if hasattr(points, 'reshape'):
+         return points.reshape(-1)
+
+      flat = []
+      for point in points:
+         if hasattr(point, 'x'):
+            flat.append(point.x)
+            flat.append(point.y)
+         else:
+            flat.extend(point)
+
+      return flat
@@ -0,0 +1,186 @@
+"""
+single pass tokenizer splitting blocks of raw command stream bytes into
+commands and their argument bytes
+"""
+
+import collections
+import re
+
+
+# command byte value, its raw argument bytes and the offset of the command
+# byte within the (decoded) stream. partial is True if more argument bytes
+# of the same command follow in the next token
+Token = collections.namedtuple('Token', ['command', 'args', 'offset',
+                                         'partial'], defaults=(False,))
+
+
+kArgumentByte = 0
+kCommandByte = 1
+
+# class of every byte value: command bytes have their MSB set
+kByteClass = bytes(kCommandByte if value >> 7 else kArgumentByte
+                   for value in range(256))
+
+
+class CommandTokenizer(object):
+   """
+   Splits a stream of raw bytes, fed block by block, into Tokens in one
+   forward pass.
+
+   Each byte is classified once, by the kByteClass table: the table is
+   compiled into a regular expression character class, so the scan for the
+   next command byte runs in C over the whole block (bytes, bytearray or
+   memoryview) and the argument bytes between two commands are sliced out
+   in one piece.
+
+   A command's token is produced once the next command byte (or the end of
+   the stream) is seen, so a command's arguments may span any number of
+   blocks. If maxArgs is given, the arguments of a command are instead
+   handed out in tokens of at most maxArgs bytes: every token but the last
+   one of a command is partial, so memory use doesn't depend on the length
+   of a command. If complete is given, a command whose arguments are
+   complete at the end of a block is handed out at once, instead of at the
+   next command byte, so the end of a stream being appended to isn't held
+   back. Argument bytes before the first command byte, or after a command
+   handed out this way, belong to no command and are counted in
+   skippedBytes. Argument bytes are handed out as they are: the policy for
+   odd or malformed arguments belongs to the consumer, which knows how
+   each command decodes them.
+   """
+
+   kCommandPattern = re.compile(b'[' + b''.join(
+      re.escape(bytes((value,))) for value in range(256)
+      if kByteClass[value] == kCommandByte) + b']')
+
+   def __init__(self, maxArgs=None, complete=None):
+      """
+      :param maxArgs: maximum number of argument bytes per token, or None
+      :param complete: function of a command byte value and a number of
+                       argument bytes, returning True if the command takes
+                       no more arguments, or None
+      """
+      if maxArgs is not None and maxArgs < 1:
+         raise ValueError("maxArgs must be at least 1, received {}"
+                          .format(maxArgs))
+
+      self.maxArgs = maxArgs
+      self.complete = complete
+      self.command = None
+      self.commandOffset = 0
+      self.args = bytearray()
+      self.offset = 0
+      self.skippedBytes = 0
+
+   def Feed(self, block):
+      """
+      tokenizes the next block of the stream
+      :param block: bytes-like object of raw byte values
+      :return: list of Tokens completed by this block
+      """
+      tokens = []
+      view = memoryview(block)
+      position = 0
+
+      for match in self.kCommandPattern.finditer(view):
+         start = match.start()
+
+         if self.command is None:
+            self.skippedBytes += start - position
+         elif self.args:
+            self.args += view[position:start]
+            self.__Complete(tokens, self.args)
+            self.args = bytearray()
+         else:
+            self.__Complete(tokens, view[position:start])
+
+         self.command = view[start]
+         self.commandOffset = self.offset + start
+         position = start + 1
+
+      # the rest belongs to a command continuing in the next block; it is
+      # copied so no reference to block is kept
+      if self.command is None:
+         self.skippedBytes += len(view) - position
+      else:
+         self.args += view[position:]
+         if (self.complete is not None and
+               self.complete(self.command, len(self.args))):
+            self.__Complete(tokens, self.args)
+            self.command = None
+            self.args = bytearray()
+         elif self.maxArgs is not None and len(self.args) > self.maxArgs:
+            self.__Split(tokens, self.args)
+
+      self.offset += len(view)
+      view.release()
+      return tokens
+
+   def ContinueCommand(self, command, commandOffset):
+      """
+      begins the stream in the arguments of a command, e.g. the rest of a
+      command a resumed run continues
+      :param command: command byte value
+      :param commandOffset: offset of the command byte, before the stream
+      """
+      self.command = command
+      self.commandOffset = commandOffset
+
+   def PendingOffset(self):
+      """
+      :return: offset of the first byte not yet handed out in a complete
+               token: the byte of the command continuing in the next block,
+               or the end of the bytes fed so far
+      """
+      return self.offset if self.command is None else self.commandOffset
+
+   def Close(self):
+      """
+      ends the stream, completing the last command if any
+      :return: list containing the last Token, if any
+      """
+      tokens = []
+      if self.command is not None:
+         self.__Complete(tokens, self.args)
+
+      self.command = None
+      self.args = bytearray()
+      return tokens
+
+   def __Complete(self, tokens, args):
+      """
+      appends the tokens of the current command, whose last argument bytes
+      are args
+      """
+      if self.maxArgs is not None and len(args) > self.maxArgs:
+         args = self.__Split(tokens, args)
+
+      tokens.append(Token(self.command, bytes(args), self.commandOffset))
+
+   def __Split(self, tokens, args):
+      """
+      appends partial tokens of maxArgs bytes of args for the current
+      command, leaving at least one byte
+      :return: the remaining bytes of args
+      """
+      maxArgs = self.maxArgs
+      end = (len(args) - 1) // maxArgs * maxArgs
+      for start in range(0, end, maxArgs):
+         tokens.append(Token(self.command, bytes(args[start:start + maxArgs]),
+                             self.commandOffset, True))
+
+      if isinstance(args, bytearray):
+         del args[:end]
+         return args
+
+      return args[end:]
+
+   def Tokenize(self, blocks):
+      """
+      generator tokenizing every block of blocks, then closing the stream
+      :param blocks: iterable of bytes-like objects of raw byte values
+      :return: generator of Tokens
+      """
+      for block in blocks:
+         yield from self.Feed(block)
+
+      yield from self.Close()
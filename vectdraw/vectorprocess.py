@@ -0,0 +1,281 @@
+"""
+Segments whole blocks of vector command bytes with numpy and executes the
+respective board methods. Requires numpy; VectorCommandStreamProcessor
+remains the reference engine
+"""
+
+try:
+   import numpy
+except ImportError:
+   numpy = None
+
+from vectdraw.diagnostics import StreamDiagnostics
+from vectdraw.process import VectorCommandStreamProcessor
+
+
+class VectorizedCommandStreamProcessor(VectorCommandStreamProcessor):
+   """
+   Processes the same streams as VectorCommandStreamProcessor, with the
+   per byte work done by array operations.
+
+   Blocks read by the streamreader are viewed as uint8 arrays. The MSB test
+   IsCommandByte performs on one byte is applied to the whole block at
+   once to find every command position. Commands whose arguments are
+   complete (followed by another command byte) are segmented together:
+   the argument words of all their commands are gathered and decoded with
+   a single encoding_class.decode_many call, and each command receives a
+   slice of the decoded int16 array. The last command of a block is
+   carried over, as its arguments may continue in the next block, unless
+   eagerCommands is set and it takes no more arguments.
+   """
+
+   # kinds of command byte values, see __Segment
+   kUnknownCommand = 0
+   kDecodedArgsCommand = 1
+   kRawArgsCommand = 2
+
+   def __init__(self, reader, encodingClass, board, commands, plugins=True,
+                diagnostics=None, checkpointer=None):
+      if numpy is None:
+         raise ImportError("the vectorized engine requires numpy")
+
+      if (not hasattr(encodingClass, 'decode_many') or
+          not callable(encodingClass.decode_many)):
+
+         raise TypeError("encoding_class argument not a valid type: "
+                         "missing attribute method 'decode_many'")
+
+      self.commandKinds = numpy.zeros(256, dtype=numpy.uint8)
+
+      # offset of the first byte whose command wasn't executed yet, as of
+      # the last block segmented by Records
+      self.pendingOffset = 0
+
+      super().__init__(reader, encodingClass, board, commands, plugins,
+                       diagnostics, checkpointer)
+
+   def Process(self, blocks):
+      """
+      segments blocks into commands, executing the board methods specified
+      by each received command byte
+      :param blocks: iterable of bytes-like objects of raw byte values
+      """
+      for commandByte, args, partial in self.Records(blocks):
+         self.Dispatch(commandByte, args, partial)
+
+   def Dispatch(self, commandByte, args, partial=False):
+      """
+      executes the board method of the command registered for commandByte.
+      Commands split into several records are executed in chunks
+      :param commandByte: command byte value of a registered command
+      :param args: int16 array of decoded arguments, or raw argument bytes
+                   for rawArgs commands
+      :param partial: True if the next record continues the arguments of
+                      the command
+      """
+      if not isinstance(args, bytes):
+         args = args.tolist()
+
+      super().Dispatch(commandByte, args, partial)
+
+   def PendingOffset(self):
+      return self.pendingOffset
+
+   def RegisterCommand(self, command):
+      value = super().RegisterCommand(command)
+      if value is not None:
+         self.commandKinds[value] = (self.kRawArgsCommand if command.rawArgs
+                                     else self.kDecodedArgsCommand)
+      return value
+
+   def Records(self, blocks):
+      """
+      generator segmenting blocks of raw command bytes into records.
+      Commands whose arguments span more than kMaxChunkArgs bytes of
+      blocks are split into several records
+      :param blocks: iterable of bytes-like objects of raw byte values
+      :return: generator of (command byte value, args, partial) tuples,
+               where args is an int16 array of the decoded arguments, or
+               the raw argument bytes for rawArgs commands, and partial is
+               True if the next record continues the arguments of the
+               command
+      """
+      # command free blocks, since the last command byte seen
+      pending = []
+      pendingSize = 0
+
+      # stream offsets of the next block and of data[0], and the number of
+      # argument bytes split off after data[0] (see __SplitPending)
+      offset = 0
+      base = 0
+      dropped = 0
+      if self.openCommand is not None:
+         # the blocks begin in the arguments of the continued command
+         pending = [numpy.array([self.openCommandByte], dtype=numpy.uint8)]
+         pendingSize = 1
+         base = -1 - self.openArgs
+         dropped = self.openArgs
+
+      self.pendingOffset = base
+
+      for block in blocks:
+         data = numpy.frombuffer(block, dtype=numpy.uint8)
+         blockOffset = offset
+         offset += len(data)
+
+         positions = numpy.flatnonzero(data & 0x80)
+         if not len(positions):
+            if not pending:
+               base, dropped = blockOffset, 0
+
+            pending.append(data)
+            pendingSize += len(data)
+            if pendingSize > self.kMaxChunkArgs + 1:
+               pending, split = yield from self.__SplitPending(pending)
+               pendingSize = sum(len(part) for part in pending)
+               dropped += split
+         else:
+            if pending:
+               positions += pendingSize
+               pending.append(data)
+               data = numpy.concatenate(pending)
+               if data[0] & 0x80:
+                  # the command carried over from the previous blocks
+                  positions = numpy.concatenate(([0], positions))
+            else:
+               base, dropped = blockOffset, 0
+
+            last = positions[-1]
+            yield from self.__Segment(data, positions[:-1], last, base,
+                                      dropped)
+            pending = [data[last:]]
+            pendingSize = len(pending[0])
+            base += int(last) + (dropped if last else 0)
+            dropped = 0
+
+         # the carried command is executed now if it takes no more
+         # arguments; the argument bytes following it belong to no command
+         if (self.eagerCommands and pending and pending[0][0] & 0x80 and
+               self.ArgsComplete(int(pending[0][0]), pendingSize - 1)):
+            data = (numpy.concatenate(pending) if len(pending) > 1
+                    else pending[0])
+            yield from self.__Segment(
+               data, numpy.flatnonzero(data[:1] & 0x80), len(data), base,
+               dropped)
+            pending = []
+            pendingSize = 0
+
+         self.pendingOffset = base if pending else offset
+
+      if pending:
+         data = numpy.concatenate(pending) if len(pending) > 1 else pending[0]
+         yield from self.__Segment(
+            data, numpy.flatnonzero(data[:1] & 0x80), len(data), base,
+            dropped)
+
+      self.pendingOffset = offset
+
+   def __SplitPending(self, pending):
+      """
+      generator of a partial record of the arguments of the command carried
+      in pending, holding whole chunks of kMaxChunkArgs bytes
+      :param pending: list of command free blocks, the first one starting
+                      with the carried command byte, if any
+      :return: tuple of the list of the remaining pending blocks, and the
+               number of bytes split off after the command byte
+      """
+      data = numpy.concatenate(pending)
+      if not data[0] & 0x80:
+         # argument bytes before the first command byte
+         return [], 0
+
+      code = int(data[0])
+      kind = self.commandKinds[code]
+      if kind == self.kUnknownCommand and not self.pluginsLoaded:
+         self.LoadPlugins()
+         kind = self.commandKinds[code]
+
+      # commands taking a fixed number of arguments are executed as one
+      # record: they are held while their arguments can still fit, and
+      # skipped with their last record once they can't (see __Segment)
+      argCount = self.argCounts[code]
+      if argCount is not None and len(data) <= 2 * argCount + 2:
+         return [data], 0
+
+      # leave at least one argument byte for the last record
+      end = 1 + (len(data) - 2) // self.kMaxChunkArgs * self.kMaxChunkArgs
+      if kind == self.kDecodedArgsCommand and argCount is None:
+         yield code, self.encoding_class.decode_many(data[1:end]), True
+      elif kind == self.kRawArgsCommand:
+         yield code, data[1:end].tobytes(), True
+
+      return [data[:1], data[end:]], end - 1
+
+   def __Segment(self, data, positions, end, base, dropped):
+      """
+      generator of the records of the commands at positions in data, the
+      arguments of the last one ending at end. data[0] is at stream offset
+      base, and dropped bytes were split off after it
+      """
+      if not len(positions):
+         return
+
+      starts = positions + 1
+      lengths = numpy.diff(positions, append=end) - 1
+      codes = data[positions]
+      kinds = self.commandKinds[codes]
+      if not self.pluginsLoaded and (kinds == self.kUnknownCommand).any():
+         self.LoadPlugins()
+         kinds = self.commandKinds[codes]
+
+      def Offset(index):
+         position = int(positions[index])
+         return base + position + (dropped if position else 0)
+
+      decoded = kinds == self.kDecodedArgsCommand
+      for index in numpy.flatnonzero(decoded & (lengths & 1 == 1)).tolist():
+         self.diagnostics.Add(StreamDiagnostics.kOddArgument,
+                              int(data[starts[index] + lengths[index] - 1]),
+                              Offset(index))
+
+      # gather the high and low bytes of every argument word of the
+      # decoded commands: word k of a command is at start + 2k
+      words = numpy.where(decoded, lengths >> 1, 0)
+      firstWords = numpy.cumsum(words) - words
+      total = int(words.sum())
+      high = (numpy.repeat(starts - 2 * firstWords, words) +
+              2 * numpy.arange(total))
+
+      pairs = numpy.empty(2 * total, dtype=numpy.uint8)
+      pairs[0::2] = data[high]
+      pairs[1::2] = data[high + 1]
+      pool = self.encoding_class.decode_many(pairs)
+
+      starts = starts.tolist()
+      lengths = lengths.tolist()
+      firstWords = firstWords.tolist()
+      words = words.tolist()
+
+      commandTable = self.commandTable
+      argCounts = self.argCounts
+      for index, code in enumerate(codes.tolist()):
+         command = commandTable[code]
+         if command is None:
+            self.GetCommand(code, Offset(index))
+            continue
+
+         if command.rawArgs:
+            start = starts[index]
+            yield code, data[start:start + lengths[index]].tobytes(), False
+            continue
+
+         # the first command continues a split one if bytes were split off
+         argCount = argCounts[code]
+         split = dropped and not index and not positions[0]
+         if argCount is not None and (split or words[index] != argCount):
+            self.diagnostics.Add(StreamDiagnostics.kArgumentCount, code,
+                                 Offset(index))
+            continue
+
+         first = firstWords[index]
+         yield code, pool[first:first + words[index]], False